@@ -48,6 +48,11 @@ LOCALE_PATHS = [str(BASE_DIR / "locale")]
 # https://docs.djangoproject.com/en/dev/ref/settings/#databases
 DATABASES = {"default": env.db("DATABASE_URL")}
 DATABASES["default"]["ATOMIC_REQUESTS"] = True
+# Реплика для чтения каталога (shop.db)
+if env("DATABASE_REPLICA_URL", default=""):
+    DATABASES["replica"] = env.db("DATABASE_REPLICA_URL")
+# https://docs.djangoproject.com/en/dev/topics/db/multi-db/#automatic-database-routing
+DATABASE_ROUTERS = ["shop.db.ReplicaRouter"]
 # https://docs.djangoproject.com/en/stable/ref/settings/#std:setting-DEFAULT_AUTO_FIELD
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -138,9 +143,13 @@ AUTH_PASSWORD_VALIDATORS = [
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
+    "shop.instrumentation.InstrumentationMiddleware",
+    "shop.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "shop.middleware.CompressionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "shop.db.ReplicaPinMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -149,6 +158,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
+    "shop.ratelimit.RateLimitMiddleware",
 ]
 
 # STATIC
@@ -212,6 +222,14 @@ CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 # https://docs.djangoproject.com/en/dev/ref/settings/#fixture-dirs
 FIXTURE_DIRS = (str(APPS_DIR / "fixtures"),)
 
+# SESSIONS
+# ------------------------------------------------------------------------------
+# https://docs.djangoproject.com/en/dev/ref/settings/#session-engine
+# Сессии в кэше, в базу записываются только сессии пользователей (shop.sessions)
+SESSION_ENGINE = "shop.sessions"
+# https://docs.djangoproject.com/en/dev/ref/settings/#session-serializer
+SESSION_SERIALIZER = "shop.sessions.SessionSerializer"
+
 # SECURITY
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#session-cookie-httponly
@@ -303,6 +321,17 @@ CELERY_TASK_TIME_LIMIT = 5 * 60
 CELERY_TASK_SOFT_TIME_LIMIT = 60
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#beat-scheduler
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# https://docs.celeryq.dev/en/stable/userguide/periodic-tasks.html#beat-entries
+CELERY_BEAT_SCHEDULE = {
+    "shop-cancel-expired-orders": {
+        "task": "shop.tasks.cancel_expired_orders",
+        "schedule": env.int("DJANGO_ORDER_SWEEP_INTERVAL", default=60),
+    },
+    "shop-clear-expired-sessions": {
+        "task": "shop.tasks.clear_expired_sessions",
+        "schedule": env.int("DJANGO_SESSION_CLEANUP_INTERVAL", default=60 * 60),
+    },
+}
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#worker-send-task-events
 CELERY_WORKER_SEND_TASK_EVENTS = True
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#std-setting-task_send_sent_event
@@ -342,11 +371,11 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_RENDERER_CLASSES": (
-        "djangorestframework_camel_case.render.CamelCaseJSONRenderer",
+        "shop.renderers.CamelCaseORJSONRenderer",
         "djangorestframework_camel_case.render.CamelCaseBrowsableAPIRenderer",
     ),
     "DEFAULT_PARSER_CLASSES": (
-        "djangorestframework_camel_case.parser.CamelCaseJSONParser",
+        "shop.renderers.CamelCaseORJSONParser",
         "djangorestframework_camel_case.parser.CamelCaseFormParser",
         "djangorestframework_camel_case.parser.CamelCaseMultiPartParser",
     ),
@@ -371,3 +400,60 @@ SPECTACULAR_SETTINGS = {
 # ------------------------------------------------------------------------------
 # ID для хранения корзины в сессии
 BASKET_SESSION_ID = "basket"
+# Сжатие ответов API (shop.middleware.CompressionMiddleware)
+COMPRESSION_URLS_REGEX = r"^(/shop)?/api/.*$"
+COMPRESSION_MIN_SIZE = env.int("DJANGO_COMPRESSION_MIN_SIZE", default=1024)
+COMPRESSION_BROTLI_QUALITY = env.int("DJANGO_COMPRESSION_BROTLI_QUALITY", default=4)
+# Метрики запросов (shop.instrumentation)
+INSTRUMENTATION_ENABLED = env.bool("DJANGO_INSTRUMENTATION_ENABLED", default=True)
+# Server-Timing только для персонала и запросов с токеном
+INSTRUMENTATION_SERVER_TIMING = env.bool(
+    "DJANGO_INSTRUMENTATION_SERVER_TIMING", default=False
+)
+# Токен для Authorization: Bearer (метрики для Prometheus), пустой - только персонал.
+# Адрес клиента не проверяется: за прокси все запросы приходят с локального
+INSTRUMENTATION_TOKEN = env("DJANGO_INSTRUMENTATION_TOKEN", default="")
+# Семплирующий профайлер (shop.profiling)
+PROFILING_ENABLED = env.bool("DJANGO_PROFILING_ENABLED", default=False)
+PROFILING_DIR = env("DJANGO_PROFILING_DIR", default=str(BASE_DIR / "profiles"))
+PROFILING_INTERVAL = env.float("DJANGO_PROFILING_INTERVAL", default=0.005)
+PROFILING_POLL_INTERVAL = env.float("DJANGO_PROFILING_POLL_INTERVAL", default=1.0)
+PROFILING_TOKEN_MAX_AGE = env.int("DJANGO_PROFILING_TOKEN_MAX_AGE", default=60 * 60)
+PROFILING_MAX_SECONDS = 10 * 60
+# Повторная отправка запросов с Idempotency-Key (shop.idempotency)
+IDEMPOTENCY_TTL = env.int("DJANGO_IDEMPOTENCY_TTL", default=24 * 60 * 60)
+IDEMPOTENCY_LOCK_TIMEOUT = env.int("DJANGO_IDEMPOTENCY_LOCK_TIMEOUT", default=60)
+IDEMPOTENCY_WAIT_TIMEOUT = env.float("DJANGO_IDEMPOTENCY_WAIT_TIMEOUT", default=10.0)
+# Отмена неоплаченных заказов (shop.tasks.cancel_expired_orders)
+ORDER_PAYMENT_TTL = env.int("DJANGO_ORDER_PAYMENT_TTL", default=30 * 60)
+ORDER_SWEEP_BATCH_SIZE = env.int("DJANGO_ORDER_SWEEP_BATCH_SIZE", default=500)
+ORDER_SWEEP_MAX_BATCHES = env.int("DJANGO_ORDER_SWEEP_MAX_BATCHES", default=20)
+# Кэш ответов API и фрагментов шаблонов каталога (shop.views_api, shop.views)
+CATALOG_CACHE_TIMEOUT = env.int("DJANGO_CATALOG_CACHE_TIMEOUT", default=60 * 60)
+# Прогрев кэшей (shop.warming): адреса по умолчанию и сколько самых частых
+# адресов брать из журналов доступа
+CACHE_WARMING_URLS = [
+    "/shop/api/categories/",
+    "/shop/api/catalog/",
+    "/shop/categories/",
+]
+CACHE_WARMING_TOP = env.int("DJANGO_CACHE_WARMING_TOP", default=50)
+# Статистика комбинаций фильтров каталога (shop.hotqueries)
+HOT_QUERIES_SAMPLE_RATE = env.float("DJANGO_HOT_QUERIES_SAMPLE_RATE", default=0.1)
+HOT_QUERIES_WINDOW_HOURS = env.int("DJANGO_HOT_QUERIES_WINDOW_HOURS", default=7 * 24)
+HOT_QUERIES_DIR = env("DJANGO_HOT_QUERIES_DIR", default=str(BASE_DIR / "hot_queries"))
+# Чтение с реплики (shop.db): псевдоним базы и сколько секунд после записи
+# чтение идет с основной базы (должно покрывать отставание реплики)
+REPLICA_DATABASE = "replica"
+REPLICA_PIN_SECONDS = env.int("DJANGO_REPLICA_PIN_SECONDS", default=5)
+# Лимиты запросов по именам маршрутов (shop.ratelimit):
+# (емкость корзины токенов, секунд на ее полное заполнение)
+RATE_LIMITS = {
+    "shop:add_to_basket": (30, 60),
+    "shop:update_basket_item": (60, 60),
+    "shop:remove_from_basket": (30, 60),
+    "shop:basket_batch": (30, 60),
+}
+# Сколько доверенных прокси перед приложением добавляют адрес клиента
+# в X-Forwarded-For, 0 - заголовок не учитывается (shop.ratelimit)
+RATE_LIMIT_PROXY_HOPS = env.int("DJANGO_RATE_LIMIT_PROXY_HOPS", default=0)
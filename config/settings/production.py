@@ -15,7 +15,29 @@ ALLOWED_HOSTS = env.list("DJANGO_ALLOWED_HOSTS", default=["example.com"])
 
 # DATABASES
 # ------------------------------------------------------------------------------
-DATABASES["default"]["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)
+# Пул соединений: "psycopg" - пул psycopg_pool в каждом процессе воркера,
+# "pgbouncer" - внешний пул в режиме transaction, соединение на запрос,
+# "" - постоянные соединения на CONN_MAX_AGE секунд.
+# Под UvicornWorker у каждого запроса свое соединение, и постоянные соединения
+# не переиспользуются, а копятся, поэтому по умолчанию включен пул.
+DATABASE_POOL = env("DJANGO_DATABASE_POOL", default="psycopg")
+for database in DATABASES.values():
+    if DATABASE_POOL == "psycopg":
+        # Пул не совместим с постоянными соединениями
+        database["CONN_MAX_AGE"] = 0
+        database.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": env.int("DJANGO_DATABASE_POOL_MIN_SIZE", default=2),
+            "max_size": env.int("DJANGO_DATABASE_POOL_MAX_SIZE", default=10),
+            # Секунды ожидания свободного соединения до ошибки
+            "timeout": env.float("DJANGO_DATABASE_POOL_TIMEOUT", default=10),
+            "max_idle": env.float("DJANGO_DATABASE_POOL_MAX_IDLE", default=600),
+        }
+    elif DATABASE_POOL == "pgbouncer":
+        database["CONN_MAX_AGE"] = 0
+        # Серверные курсоры не переживают смену соединения между транзакциями
+        database["DISABLE_SERVER_SIDE_CURSORS"] = True
+    else:
+        database["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)
 
 # CACHES
 # ------------------------------------------------------------------------------
@@ -36,6 +58,8 @@ CACHES = {
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#secure-proxy-ssl-header
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
+# Адрес клиента для лимитов запросов берется из X-Forwarded-For от Traefik
+RATE_LIMIT_PROXY_HOPS = env.int("DJANGO_RATE_LIMIT_PROXY_HOPS", default=1)
 # https://docs.djangoproject.com/en/dev/ref/settings/#secure-ssl-redirect
 SECURE_SSL_REDIRECT = env.bool("DJANGO_SECURE_SSL_REDIRECT", default=True)
 # https://docs.djangoproject.com/en/dev/ref/settings/#session-cookie-secure
@@ -3,6 +3,7 @@ With these settings, tests run faster.
 """
 
 from .base import *  # noqa: F403
+from .base import DATABASES
 from .base import TEMPLATES
 from .base import env
 
@@ -36,3 +37,9 @@ TEMPLATES[0]["OPTIONS"]["debug"] = True  # type: ignore[index]
 MEDIA_URL = "http://media.testserver/"
 # Your stuff...
 # ------------------------------------------------------------------------------
+# Статистика фильтров каталога в тестах не собирается (shop.hotqueries)
+HOT_QUERIES_SAMPLE_RATE = 0
+# Вторая SQLite в памяти вместо реплики (shop.db), данные в нее не копируются,
+# поэтому чтение с реплики включают только тесты маршрутизации
+DATABASES["replica"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
+REPLICA_DATABASE = None
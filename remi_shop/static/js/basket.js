@@ -22,43 +22,45 @@ function decreaseQuantity(productId) {
     updateBasketItem(productId, newCount, input);
 }
 
-function removeBasketItem(productId) {
-    fetch(`/shop/basket/remove/${productId}/`, {
-        method: 'POST',
-        headers: {
-            'X-CSRFToken': getCSRFToken(),
-            'Content-Type': 'application/x-www-form-urlencoded',
-        }
-    })
-    .then(response => response.json())
-    .then(data => {
-        if (data.success) {
-            const itemRow = document.querySelector(`[data-item-id='${productId}']`);
-            if (itemRow) itemRow.remove();
-            // Обновляем summary корзины с актуальной суммой
-            updateBasketSummary(data.basket_count, data.total_cost);
-        } else {
-            alert(data.message);
-        }
-    });
+// Изменения количества копятся и отправляются одним запросом на /basket/batch/
+const BATCH_DELAY = 300;
+const pendingOperations = new Map();
+let batchTimer = null;
+
+function queueBasketOperation(productId, operation) {
+    pendingOperations.set(String(productId), {product_id: Number(productId), ...operation});
+    clearTimeout(batchTimer);
+    batchTimer = setTimeout(flushBasketOperations, BATCH_DELAY);
 }
 
-function updateBasketItem(productId, count, inputElement) {
-    fetch(`/shop/basket/update/${productId}/`, {
+function flushBasketOperations() {
+    clearTimeout(batchTimer);
+    if (pendingOperations.size === 0) return;
+    const operations = Array.from(pendingOperations.values());
+    pendingOperations.clear();
+
+    fetch('/shop/basket/batch/', {
         method: 'POST',
         headers: {
             'X-CSRFToken': getCSRFToken(),
-            'Content-Type': 'application/x-www-form-urlencoded',
+            'Content-Type': 'application/json',
         },
-        body: `count=${count}`
+        body: JSON.stringify({operations}),
     })
     .then(response => response.json())
     .then(data => {
         if (data.success) {
-            inputElement.value = count;
-
-            const itemRow = document.querySelector(`[data-item-id='${productId}']`);
-            if (itemRow) itemRow.querySelector('.item-total').textContent = parseFloat(data.total_price).toFixed(2) + ' руб.';
+            data.items.forEach(item => {
+                const itemRow = document.querySelector(`[data-item-id='${item.product_id}']`);
+                if (!itemRow) return;
+                if (item.removed) {
+                    itemRow.remove();
+                    return;
+                }
+                const input = itemRow.querySelector('.quantity-input');
+                if (input) input.value = item.count;
+                itemRow.querySelector('.item-total').textContent = parseFloat(item.total_price).toFixed(2) + ' руб.';
+            });
 
             // Обновляем summary корзины с актуальной суммой
             updateBasketSummary(data.basket_count, data.total_cost);
@@ -68,6 +70,16 @@ function updateBasketItem(productId, count, inputElement) {
     });
 }
 
+function removeBasketItem(productId) {
+    queueBasketOperation(productId, {op: 'remove'});
+    flushBasketOperations();
+}
+
+function updateBasketItem(productId, count, inputElement) {
+    inputElement.value = count;
+    queueBasketOperation(productId, {op: 'update', count: count});
+}
+
 // ========================
 // Update basket summary totals
 // ========================
@@ -95,12 +107,14 @@ function updateBasketSummary(basketCount, totalCost) {
 // ========================
 // Create order
 // ========================
+// getOrderIdempotencyKey() объявлена в shop.js
 function createOrder() {
     fetch('/shop/orders/create/', {
         method: 'POST',
         headers: {
             'X-CSRFToken': getCSRFToken(),
             'Content-Type': 'application/x-www-form-urlencoded',
+            'Idempotency-Key': getOrderIdempotencyKey(),
         },
     })
     .then(response => response.json())
@@ -110,8 +110,12 @@ function updateBasketItem(itemId, count) {
         if(data.success){
             // Обновляем визуально сумму
             const itemElement = document.querySelector(`[data-item-id="${itemId}"]`);
-            const totalEl = itemElement.querySelector('.item-total');
-            totalEl.textContent = data.total_price + ' руб.';
+            if (data.removed) {
+                itemElement.remove();
+            } else {
+                const totalEl = itemElement.querySelector('.item-total');
+                totalEl.textContent = data.total_price + ' руб.';
+            }
             document.querySelectorAll('.basket-count').forEach(el => el.textContent = data.basket_count);
         } else {
             alert(data.message || 'Ошибка при обновлении корзины');
@@ -143,6 +147,19 @@ function removeFromBasket(itemId) {
 }
 
 
+// Ключ повторной отправки заказа: сохраняется между повторами
+// после сетевых ошибок, чтобы сервер не создал второй заказ
+let orderIdempotencyKey = null;
+
+function getOrderIdempotencyKey() {
+    if (!orderIdempotencyKey) {
+        orderIdempotencyKey = window.crypto && crypto.randomUUID
+            ? crypto.randomUUID()
+            : `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+    }
+    return orderIdempotencyKey;
+}
+
 // Create order function
 function createOrder(button) {
     if (!confirm('Создать заказ из корзины?')) {
@@ -158,6 +175,7 @@ function createOrder(button) {
         headers: {
             'X-CSRFToken': getCSRFToken(),
             'Content-Type': 'application/x-www-form-urlencoded',
+            'Idempotency-Key': getOrderIdempotencyKey(),
         },
     })
     .then(response => response.json())
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.contrib import messages
 
 from shop.admin_filter import MaxPriceFilter
 from shop.admin_filter import MinPriceFilter
@@ -9,6 +10,8 @@ from shop.models import ImageCategory
 from shop.models import ImageProduct
 from shop.models import Order
 from shop.models import OrderItem
+from shop.models import OrderStatus
+from shop.models import OrderStatusHistory
 from shop.models import Product
 from shop.models import Promotion
 from shop.models import PromotionProduct
@@ -22,13 +25,51 @@ class OrderItemInline(admin.TabularInline):
     readonly_fields = ("total_price",)
 
 
+class OrderStatusHistoryInline(admin.TabularInline):
+    model = OrderStatusHistory
+    extra = 0
+    fields = ("from_status", "to_status", "changed_by", "changed_at")
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ("id", "user", "status", "total_cost")
+    list_display = ("id", "user", "status", "total_cost", "processed_at")
     list_display_links = "id", "user"
+    list_filter = ("status",)
     ordering = "user", "id", "status"
     search_fields = ("user",)
-    inlines = [OrderItemInline]
+    # Статус меняется только действиями списка через OrderQuerySet.transition()
+    readonly_fields = ("status", "processed_at", "notified_at")
+    inlines = [OrderItemInline, OrderStatusHistoryInline]
+    actions = ("mark_paid", "mark_completed", "mark_cancelled")
+
+    def transition(self, request, queryset, status):
+        total = queryset.count()
+        changed = queryset.transition(status, user=request.user)
+        self.message_user(request, f"Заказов переведено в «{status.label}»: {changed}")
+        if skipped := total - changed:
+            self.message_user(
+                request,
+                f"Пропущено заказов с недопустимым переходом: {skipped}",
+                messages.WARNING,
+            )
+
+    @admin.action(description="Отметить оплаченными")
+    def mark_paid(self, request, queryset):
+        self.transition(request, queryset, OrderStatus.PAID)
+
+    @admin.action(description="Отметить завершенными")
+    def mark_completed(self, request, queryset):
+        self.transition(request, queryset, OrderStatus.COMPLETED)
+
+    @admin.action(description="Отменить")
+    def mark_cancelled(self, request, queryset):
+        self.transition(request, queryset, OrderStatus.CANCELLED)
 
 
 class BasketItemInline(admin.TabularInline):
@@ -95,6 +136,7 @@ class TagProductInline(admin.TabularInline):
 class ProductAdmin(admin.ModelAdmin):
     list_display = (
         "id",
+        "article",
         "title",
         "price",
         "count",
@@ -110,6 +152,7 @@ class ProductAdmin(admin.ModelAdmin):
         "price",
     )
     search_fields = (
+        "article",
         "title",
         "get_short_description",
     )
@@ -145,6 +188,7 @@ class PromotionProductInline(admin.StackedInline):
         "product",
         "limit",
         "quantity_sold",
+        "price_override",
         "price_with_discount",
     )
     readonly_fields = ("price_with_discount",)
@@ -157,6 +201,8 @@ class PromotionAdmin(admin.ModelAdmin):
         "title",
         "get_short_description",
         "discount_percent",
+        "fixed_price",
+        "is_stackable",
         "start_date",
         "end_date",
         "is_active",
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ShopConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "shop"
+
+    def ready(self):
+        import shop.profiling  # noqa: PLC0415
+        import shop.signals  # noqa: F401, PLC0415
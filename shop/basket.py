@@ -1,68 +1,328 @@
+import uuid
 from decimal import Decimal
+from typing import NamedTuple
 
 from django.conf import settings
 from django.contrib.auth.signals import user_logged_in
 from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
 from django.db.models.query import Prefetch
 from django.http import HttpRequest
 from rest_framework.request import Request
 
+from shop.cache import get_resource_state
+from shop.instrumentation import record_cache
 from shop.models import Basket
 from shop.models import BasketItem
+from shop.models import ImageProduct
 from shop.models import Product
+from shop.pricing import PricingEngine
+
+OFFER_KEY = "shop:offer:{}:{}"
+OFFER_TIMEOUT = 60 * 60
+LINES_KEY = "shop:basket:lines:{}:{}"
+LINES_TIMEOUT = 60 * 60
+
+
+class Offer(NamedTuple):
+    """Цена товара с учетом акций и доступность к продаже"""
+
+    title: str
+    price: Decimal
+    available: bool
+
+
+class BasketLine(NamedTuple):
+    """Строка корзины для отображения, не ссылается на объекты моделей"""
+
+    pk: int
+    title: str
+    category: str
+    image_url: str
+    image_alt: str
+    price: Decimal
+    count: int
+    total_price: Decimal
+
+
+class BasketError(ValueError):
+    pass
+
+
+class BasketOperation(NamedTuple):
+    op: str
+    product_id: int
+    count: int
+
+
+BASKET_OPERATIONS = ("add", "update", "remove")
+MAX_BASKET_OPERATIONS = 100
+
+
+def get_offers(product_ids) -> dict[int, Offer]:
+    """
+    Предложения по товарам из кэша, промахи загружаются одним запросом.
+    Ключ строится по версиям товаров и акций, поэтому любое их изменение
+    делает закэшированные предложения неактуальными.
+    Отсутствующих товаров в результате нет.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    token, _ = get_resource_state("products", "promotions")
+    keys = {
+        OFFER_KEY.format(token, product_id): product_id for product_id in product_ids
+    }
+    offers = {keys[key]: offer for key, offer in cache.get_many(keys).items()}
+    missing = product_ids - offers.keys()
+    record_cache(hits=len(offers), misses=len(missing))
+    if missing:
+        products = list(
+            Product.objects.filter(pk__in=missing)
+            .only("id", "title", "price", "available")
+            .order_by()
+        )
+        quotes = PricingEngine().quote_many(products)
+        loaded = {
+            product.pk: Offer(
+                product.title, quotes[product.pk].price, product.available
+            )
+            for product in products
+        }
+        cache.set_many(
+            {OFFER_KEY.format(token, pk): offer for pk, offer in loaded.items()},
+            OFFER_TIMEOUT,
+        )
+        offers.update(loaded)
+    return offers
+
+
+def get_offer(product_id: int) -> Offer | None:
+    """Предложение по одному товару, None - если товара нет"""
+    return get_offers([product_id]).get(product_id)
+
+
+def parse_operations(payload) -> list[BasketOperation]:
+    """
+    Разбирает операции пакетного изменения корзины вида
+    {"op": "add" | "update" | "remove", "product_id": 1, "count": 2}.
+    Для add count - на сколько увеличить количество (по умолчанию 1),
+    для update - новое количество, для remove не используется.
+    """
+    if not isinstance(payload, list) or not payload:
+        msg = "Ожидается непустой список операций"
+        raise BasketError(msg)
+    if len(payload) > MAX_BASKET_OPERATIONS:
+        msg = f"Не больше {MAX_BASKET_OPERATIONS} операций за запрос"
+        raise BasketError(msg)
+
+    operations = []
+    for number, item in enumerate(payload, 1):
+        try:
+            op = item["op"]
+            product_id = int(item["product_id"])
+            count = int(item.get("count", 1 if op == "add" else 0))
+        except (TypeError, KeyError, ValueError, AttributeError) as error:
+            msg = f"Некорректная операция №{number}"
+            raise BasketError(msg) from error
+        if op not in BASKET_OPERATIONS or (op == "update" and "count" not in item):
+            msg = f"Некорректная операция №{number}"
+            raise BasketError(msg)
+        if op == "update" and count <= 0:
+            op = "remove"
+        operations.append(BasketOperation(op, product_id, count))
+    return operations
 
 
 class SessionBasket:
-    def __init__(self, request: Request | HttpRequest):
+    def __init__(self, request: Request | HttpRequest, user=None):
         self.session = request.session
         basket = self.session.get(settings.BASKET_SESSION_ID)
         if not basket:
             basket = self.session[settings.BASKET_SESSION_ID] = {}
         self.basket = basket
-        self.user = request.user if request.user.is_authenticated else None
+        # Итоги корзины поддерживаются при каждом изменении, а не суммируются
+        self.totals_id = f"{settings.BASKET_SESSION_ID}_totals"
+        self.totals = self.session.get(self.totals_id)
+        if self.totals is None:
+            self.recount()
+        # Сигналы входа и выхода передают пользователя явно: у запроса из
+        # Client.force_login() атрибута user нет
+        user = user or getattr(request, "user", None)
+        self.user = user if user is not None and user.is_authenticated else None
 
     def __iter__(self):
         """
-        Итерации по продуктам в корзине
+        Итерации по продуктам в корзине, удаленные товары пропускаются
         """
-        products = Product.objects.filter(id__in=self.basket.keys())
-        basket = self.basket.copy()
-        for product in products:
-            basket[str(product.id)]["product"] = product
-
-        for item in basket.values():
-            item["price"] = Decimal(item["price"])
+        products = Product.objects.in_bulk(self.get_product_id())
+        for pid, stored in self.basket.items():
+            product = products.get(int(pid))
+            if product is None:
+                continue
+            # Копируем элементы, чтобы не записать товары и Decimal в сессию
+            item = dict(stored, product=product, price=Decimal(stored["price"]))
             item["total_price"] = item["price"] * item["count"]
             yield item
 
     def __len__(self):
-        return sum(item["count"] for item in self.basket.values())
+        return self.totals["count"]
 
     def add(self, product: Product, count=1, *, update_count=False):
         """
         Добавляет или обновляет товар в корзине
         """
-        price = product.get_price_with_promotions
-
-        product_id = str(product.id)
-        if product_id not in self.basket:
-            self.basket[product_id] = {
-                "count": 0,
-                "price": str(price),
-            }
-        if update_count:
-            self.basket[product_id]["count"] = count
-        else:
-            self.basket[product_id]["count"] += count
+        item = self.basket.get(str(product.id))
+        if not update_count and item is not None:
+            count += item["count"]
+        self.set_count(product.id, count, product.get_price_with_promotions)
+
+    def set_count(
+        self, product_id: int, count: int, price: Decimal | None = None
+    ) -> dict | None:
+        """
+        Устанавливает количество товара в корзине, count <= 0 удаляет товар.
+        price обязательна для нового товара, для имеющегося - обновляет цену.
+        Возвращает строку корзины или None, если товар удален.
+        """
+        product_id = str(product_id)
+        old = self.basket.get(product_id)
+        if old is not None:
+            self.update_totals(-old["count"], -Decimal(old["price"]) * old["count"])
+        if count <= 0:
+            self.basket.pop(product_id, None)
+            self.save()
+            return None
+
+        price = Decimal(old["price"]) if price is None else price
+        item = self.basket[product_id] = {"count": count, "price": str(price)}
+        self.update_totals(count, price * count)
         self.save()
+        return item
 
-    def get_total_price(self):
-        return sum(
-            Decimal(item["price"]) * item["count"] for item in self.basket.values()
+    def apply(self, operations: list[BasketOperation]) -> dict[int, dict | None]:
+        """
+        Применяет операции пакетно: товары загружаются одним запросом или
+        из кэша, корзина меняется, только если все операции допустимы.
+        Возвращает итоговые строки затронутых товаров (None - товар удален).
+        """
+        offers = get_offers(
+            operation.product_id for operation in operations if operation.op != "remove"
         )
+        for operation in operations:
+            if operation.op == "remove":
+                continue
+            offer = offers.get(operation.product_id)
+            if offer is None:
+                msg = f"Товар {operation.product_id} не найден"
+                raise BasketError(msg)
+            if not offer.available:
+                msg = f'Товар "{offer.title}" недоступен'
+                raise BasketError(msg)
+
+        lines = {}
+        for operation in operations:
+            product_id, count = operation.product_id, operation.count
+            if operation.op == "remove":
+                count = 0
+            elif operation.op == "add":
+                item = self.basket.get(str(product_id))
+                count += item["count"] if item else 0
+            offer = offers.get(product_id)
+            lines[product_id] = self.set_count(
+                product_id, count, offer.price if offer else None
+            )
+        return lines
+
+    def update_totals(self, count: int, cost: Decimal) -> None:
+        self.totals["count"] += count
+        self.totals["total"] = str(Decimal(self.totals["total"]) + cost)
+
+    def recount(self) -> None:
+        """Пересчитывает итоги корзины по всем товарам"""
+        self.totals = self.session[self.totals_id] = {
+            "count": sum(item["count"] for item in self.basket.values()),
+            "total": str(
+                sum(
+                    (
+                        Decimal(item["price"]) * item["count"]
+                        for item in self.basket.values()
+                    ),
+                    Decimal(0),
+                )
+            ),
+            "version": uuid.uuid4().hex,
+        }
+
+    def get_lines(self) -> list[BasketLine]:
+        """
+        Строки корзины с актуальными ценами. Кэшируются по версии корзины
+        и версиям товаров и акций, поэтому повторная загрузка страницы
+        корзины не обращается к базе.
+
+        При промахе кэша метод меняет корзину в сессии даже при GET:
+        load_lines() удаляет строки удаленных товаров и сохраняет новые цены,
+        итоги пересчитываются, а версия корзины (totals["version"]) меняется.
+        Это запись в сессию, а не в базу, поэтому BasketView выполняется
+        без транзакции; сессия сохраняется SessionMiddleware.
+        """
+        token, _ = get_resource_state("products", "promotions")
+        lines = cache.get(LINES_KEY.format(self.totals["version"], token))
+        record_cache(hits=lines is not None, misses=lines is None)
+        if lines is None:
+            lines = self.load_lines()
+            # Версия могла измениться при обновлении цен и удалении строк
+            cache.set(
+                LINES_KEY.format(self.totals["version"], token), lines, LINES_TIMEOUT
+            )
+        return lines
+
+    def load_lines(self) -> list[BasketLine]:
+        """
+        Загружает товары корзины одним запросом (изображения - предвыборкой),
+        удаляет строки с удаленными товарами и обновляет цены с учетом акций.
+        """
+        products = {
+            product.pk: product
+            for product in Product.objects.filter(pk__in=self.get_product_id())
+            .select_related("category")
+            .prefetch_related(
+                Prefetch("images", queryset=ImageProduct.objects.order_by("id"))
+            )
+            .order_by()
+        }
+        quotes = PricingEngine().quote_many(products.values())
+
+        lines = []
+        for pid, item in list(self.basket.items()):
+            product = products.get(int(pid))
+            if product is None:
+                self.set_count(pid, 0)
+                continue
+            price = quotes[product.pk].price
+            if Decimal(item["price"]) != price:
+                self.set_count(pid, item["count"], price)
+            image = next(iter(product.images.all()), None)
+            lines.append(
+                BasketLine(
+                    pk=product.pk,
+                    title=product.title,
+                    category=product.category.title,
+                    image_url=image.src.url if image else "",
+                    image_alt=image.alt if image else "",
+                    price=price,
+                    count=item["count"],
+                    total_price=price * item["count"],
+                )
+            )
+        return lines
+
+    def get_total_price(self) -> Decimal:
+        return Decimal(self.totals["total"])
 
     def clear(self):
         del self.session[settings.BASKET_SESSION_ID]
+        self.session.pop(self.totals_id, None)
         self.save()
 
     def get_product_id(self):
@@ -72,20 +332,18 @@ class SessionBasket:
         """
         Пересчитывает цены всех товаров в корзине с учётом текущих акций.
         """
-        product_ids = self.get_product_id()
-        products = Product.objects.filter(id__in=product_ids).prefetch_related(
-            "promotions"
+        products = Product.objects.filter(id__in=self.get_product_id()).only(
+            "id", "price"
         )
-
-        product_map = {str(p.id): p for p in products}
+        quotes = PricingEngine().quote_many(products)
 
         for pid, item in self.basket.items():
-            product = product_map.get(pid)
-            if not product:
+            quote = quotes.get(int(pid))
+            if quote is None:
                 continue
-            new_price = product.get_price_with_promotions()
-            item["price"] = str(new_price)
+            item["price"] = str(quote.price)
 
+        self.recount()
         self.save()
 
     def sync_to_db(self):
@@ -137,29 +395,25 @@ class SessionBasket:
                 }
 
         self.refresh_prices()
-        self.save()
 
     def save(self):
         """
         Сохраняет корзину
         """
+        self.totals["version"] = uuid.uuid4().hex
         self.session.modified = True
 
     def remove(self, product_id: int, count=1):
         """
         Удаляет продукт из корзины
         """
-        s_product_id = str(product_id)
-        if s_product_id in self.basket:
-            if count == self.basket[s_product_id]["count"]:
-                del self.basket[s_product_id]
-            else:
-                self.basket[s_product_id]["count"] -= count
-            self.save()
+        item = self.basket.get(str(product_id))
+        if item is not None:
+            self.set_count(product_id, item["count"] - count)
 
 
 def load_basket_on_login(sender, request, user, **kwargs):
-    basket = SessionBasket(request)
+    basket = SessionBasket(request, user)
     basket.sync_from_db()
 
 
@@ -167,7 +421,7 @@ user_logged_in.connect(load_basket_on_login)
 
 
 def save_basket_on_logout(sender, request, user, **kwargs):
-    basket = SessionBasket(request)
+    basket = SessionBasket(request, user)
     basket.sync_to_db()
 
 
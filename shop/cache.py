@@ -0,0 +1,122 @@
+"""
+Версии ресурсов магазина.
+
+Каждому ресурсу (categories, products, promotions) соответствует счетчик в кэше,
+который увеличивается после коммита любого изменения связанных моделей.
+По версиям строятся ETag и ключи кэша, поэтому для проверки актуальности
+данных не нужно обращаться к базе.
+"""
+
+import time
+from bisect import bisect_right
+
+from django.core.cache import cache
+from django.db.models import Max
+
+from shop.instrumentation import record_cache
+from shop.models import Category
+from shop.models import ImageCategory
+from shop.models import ImageProduct
+from shop.models import Product
+from shop.models import Promotion
+from shop.models import PromotionProduct
+from shop.models import Tag
+
+VERSION_KEY = "shop:version:{}"
+MODIFIED_KEY = "shop:modified:{}"
+BOUNDARIES_KEY = "shop:promotions:boundaries:{}"
+BOUNDARIES_TIMEOUT = 60 * 60 * 24
+
+RESOURCE_MODELS = {
+    "categories": (Category, ImageCategory),
+    "products": (Product, ImageProduct, Tag, PromotionProduct),
+    "promotions": (Promotion, PromotionProduct),
+}
+
+
+def _init_resource(resource: str) -> tuple[int, float]:
+    """
+    Заполняет версию ресурса после очистки кэша. Новая версия берется
+    из текущего времени, поэтому ранее выданные ETag становятся недействительными.
+    """
+    modified = [
+        model.objects.aggregate(value=Max("updated_at"))["value"]
+        for model in RESOURCE_MODELS[resource]
+    ]
+    modified = [value.timestamp() for value in modified if value is not None]
+
+    cache.add(VERSION_KEY.format(resource), time.time_ns(), None)
+    cache.add(MODIFIED_KEY.format(resource), max(modified, default=time.time()), None)
+    return (
+        cache.get(VERSION_KEY.format(resource)),
+        cache.get(MODIFIED_KEY.format(resource)),
+    )
+
+
+def get_versions(*resources: str) -> dict[str, tuple[int, float]]:
+    """Возвращает {ресурс: (версия, время последнего изменения)}"""
+    keys = {
+        resource: (VERSION_KEY.format(resource), MODIFIED_KEY.format(resource))
+        for resource in resources
+    }
+    values = cache.get_many([key for pair in keys.values() for key in pair])
+
+    versions = {}
+    misses = 0
+    for resource, (version_key, modified_key) in keys.items():
+        if version_key in values and modified_key in values:
+            versions[resource] = (values[version_key], values[modified_key])
+        else:
+            versions[resource] = _init_resource(resource)
+            misses += 1
+    record_cache(hits=len(keys) - misses, misses=misses)
+    return versions
+
+
+def bump_version(*resources: str) -> None:
+    """Отмечает ресурсы измененными"""
+    now = time.time()
+    for resource in resources:
+        try:
+            cache.incr(VERSION_KEY.format(resource))
+        except ValueError:
+            cache.set(VERSION_KEY.format(resource), time.time_ns(), None)
+    cache.set_many({MODIFIED_KEY.format(resource): now for resource in resources}, None)
+
+
+def _promotion_boundaries(version: int) -> list[float]:
+    key = BOUNDARIES_KEY.format(version)
+    boundaries = cache.get(key)
+    record_cache(hits=boundaries is not None, misses=boundaries is None)
+    if boundaries is None:
+        boundaries = sorted(
+            moment.timestamp()
+            for dates in Promotion.objects.filter(is_active=True).values_list(
+                "start_date", "end_date"
+            )
+            for moment in dates
+        )
+        cache.set(key, boundaries, BOUNDARIES_TIMEOUT)
+    return boundaries
+
+
+def get_resource_state(*resources: str) -> tuple[str, float]:
+    """
+    Возвращает токен состояния ресурсов и время их последнего изменения.
+
+    Для акций в токен входит число уже наступивших дат начала и окончания,
+    так как набор активных акций меняется со временем без записи в базу.
+    """
+    versions = get_versions(*resources)
+    token = ".".join(str(versions[resource][0]) for resource in resources)
+    last_modified = max(modified for _, modified in versions.values())
+
+    if "promotions" in versions:
+        now = time.time()
+        boundaries = _promotion_boundaries(versions["promotions"][0])
+        passed = bisect_right(boundaries, now)
+        token = f"{token}.{passed}"
+        if passed:
+            last_modified = max(last_modified, boundaries[passed - 1])
+
+    return token, last_modified
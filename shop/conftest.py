@@ -0,0 +1,9 @@
+import pytest
+
+from remi_shop.users.models import User
+from remi_shop.users.tests.factories import UserFactory
+
+
+@pytest.fixture
+def user(db) -> User:
+    return UserFactory()
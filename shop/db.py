@@ -0,0 +1,166 @@
+"""
+Чтение каталога с реплики базы данных.
+
+Представления, которые только читают данные, отмечаются ReplicaReadMixin,
+и ReplicaRouter направляет их чтения в базу REPLICA_DATABASE. Остальные
+чтения и все записи идут в default. Без настроенной реплики (REPLICA_DATABASE
+не задан или его нет в DATABASES) маршрутизация не меняет поведение.
+
+Реплика отстает от основной базы, поэтому чтение возвращается в default:
+    - до конца запроса после любой записи в нем;
+    - на REPLICA_PIN_SECONDS после записи в той же сессии браузера
+      (ReplicaPinMiddleware ставит cookie);
+    - если ресурсы ответа изменились менее REPLICA_PIN_SECONDS назад:
+      иначе устаревший ответ попал бы в кэш под новой версией ресурсов.
+
+Состояние хранится в ContextVar и существует только внутри запроса,
+обработанного ReplicaPinMiddleware; задачи Celery и команды читают default.
+
+Представления, отмеченные ReadOnlyMixin (его наследует ReplicaReadMixin),
+выполняются без транзакции ATOMIC_REQUESTS. Команда atomic_views показывает,
+какие адреса все еще обрабатываются в транзакции.
+"""
+
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db import transaction
+
+PIN_COOKIE = "db_primary"
+
+
+@dataclass(slots=True)
+class RoutingState:
+    # Представление разрешило чтение с реплики
+    replica: bool = False
+    # Чтение только с основной базы
+    pinned: bool = False
+    # В запросе была запись
+    written: bool = False
+
+
+_state: ContextVar[RoutingState | None] = ContextVar("shop_db_routing", default=None)
+
+
+def replica_alias() -> str | None:
+    alias = settings.REPLICA_DATABASE
+    return alias if alias and alias in settings.DATABASES else None
+
+
+def read_from_replica() -> None:
+    """
+    Разрешает чтение с реплики до конца текущего запроса, включая рендеринг
+    TemplateResponse после выхода из представления.
+    """
+    state = _state.get()
+    if state is not None:
+        state.replica = True
+
+
+def pin_to_primary() -> None:
+    state = _state.get()
+    if state is not None:
+        state.pinned = True
+
+
+def pin_if_modified_since(last_modified: float) -> None:
+    """Читает с основной базы, если реплика могла еще не получить изменения"""
+    if time.time() - last_modified < settings.REPLICA_PIN_SECONDS:
+        pin_to_primary()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replica or state.pinned:
+            return None
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = state.written = True
+        # Явно, иначе объект, прочитанный с реплики, сохранился бы в нее
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if {obj1._state.db, obj2._state.db} <= databases:  # noqa: SLF001
+            return True
+        return None
+
+
+def atomic_databases(view) -> list[str]:
+    """Базы, в транзакции которых ATOMIC_REQUESTS выполняется представление"""
+    non_atomic = getattr(view, "_non_atomic_requests", set())
+    return [
+        alias
+        for alias, database in settings.DATABASES.items()
+        if database.get("ATOMIC_REQUESTS") and alias not in non_atomic
+    ]
+
+
+class ReadOnlyMixin:
+    """
+    Представление не меняет данные и выполняется без транзакции
+    ATOMIC_REQUESTS: без лишних BEGIN/COMMIT и без снимка базы,
+    удерживаемого до конца обработки запроса.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        for alias in settings.DATABASES:
+            view = transaction.non_atomic_requests(using=alias)(view)
+        return view
+
+
+class ReplicaReadMixin(ReadOnlyMixin):
+    """Представление только читает данные и может читать их с реплики"""
+
+    def dispatch(self, request, *args, **kwargs):
+        read_from_replica()
+        return super().dispatch(request, *args, **kwargs)
+
+
+class ReplicaPinMiddleware:
+    """
+    Создает состояние маршрутизации запроса и закрепляет сессию за основной
+    базой после записи. Должен стоять до SessionMiddleware, чтобы учесть
+    запись сессии в базу.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if replica_alias() is None:
+            return self.get_response(request)
+
+        state = RoutingState(pinned=self.is_pinned(request))
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if state.written:
+            response.set_cookie(
+                PIN_COOKIE,
+                str(time.time() + settings.REPLICA_PIN_SECONDS),
+                max_age=settings.REPLICA_PIN_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    @staticmethod
+    def is_pinned(request) -> bool:
+        try:
+            return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
@@ -45,7 +45,7 @@ class ProductForm(forms.ModelForm):
 
     class Meta:
         model = Product
-        fields = ["title", "description", "category", "price", "count", "available"]
+        fields = ["title", "description", "category", "price", "count"]
         widgets = {
             "title": forms.TextInput(
                 attrs={
@@ -72,7 +72,6 @@ class ProductForm(forms.ModelForm):
             "count": forms.NumberInput(
                 attrs={"class": "form-control", "min": "0", "placeholder": "0"}
             ),
-            "available": forms.CheckboxInput(attrs={"class": "form-check-input"}),
         }
         labels = {
             "title": "Название товара",
@@ -80,7 +79,6 @@ class ProductForm(forms.ModelForm):
             "category": "Категория",
             "price": "Цена (руб.)",
             "count": "Количество на складе",
-            "available": "Доступно к продаже",
         }
 
 
@@ -157,6 +155,8 @@ class PromotionForm(forms.ModelForm):
             "title",
             "description",
             "discount_percent",
+            "fixed_price",
+            "is_stackable",
             "start_date",
             "end_date",
             "is_active",
@@ -180,6 +180,15 @@ class PromotionForm(forms.ModelForm):
                     "placeholder": "0",
                 }
             ),
+            "fixed_price": forms.NumberInput(
+                attrs={
+                    "class": "form-control",
+                    "step": "0.01",
+                    "min": "0",
+                    "placeholder": "0.00",
+                }
+            ),
+            "is_stackable": forms.CheckboxInput(attrs={"class": "form-check-input"}),
             "start_date": forms.DateTimeInput(
                 attrs={"class": "form-control", "type": "datetime-local"}
             ),
@@ -192,6 +201,8 @@ class PromotionForm(forms.ModelForm):
             "title": "Название акции",
             "description": "Описание",
             "discount_percent": "Скидка (%)",
+            "fixed_price": "Фиксированная цена",
+            "is_stackable": "Суммируется с другими акциями",
             "start_date": "Дата начала",
             "end_date": "Дата окончания",
             "is_active": "Активна",
@@ -214,7 +225,7 @@ class PromotionProductForm(forms.ModelForm):
 
     class Meta:
         model = PromotionProduct
-        fields = ["product", "limit", "price_with_discount"]
+        fields = ["product", "limit", "price_override"]
         widgets = {
             "product": forms.Select(attrs={"class": "form-control"}),
             "limit": forms.NumberInput(
@@ -224,19 +235,19 @@ class PromotionProductForm(forms.ModelForm):
                     "placeholder": "Без ограничений",
                 }
             ),
-            "price_with_discount": forms.NumberInput(
+            "price_override": forms.NumberInput(
                 attrs={
                     "class": "form-control",
                     "step": "0.01",
                     "min": "0",
-                    "placeholder": "0.00",
+                    "placeholder": "По условиям акции",
                 }
             ),
         }
         labels = {
             "product": "Товар",
             "limit": "Лимит продаж",
-            "price_with_discount": "Цена со скидкой",
+            "price_override": "Цена со скидкой",
         }
 
 
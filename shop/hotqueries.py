@@ -0,0 +1,247 @@
+"""
+Статистика комбинаций фильтров каталога для планирования кэшей и индексов.
+
+CatalogAPIView передает сюда параметры каждого запроса, из них в выборку
+попадает доля HOT_QUERIES_SAMPLE_RATE. Параметры приводятся к каноническому
+виду: имена - через camel_to_snake, как их видит ProductFilter, сортировка
+sort/sortType - к одному списку полей с "-" для убывания, номер страницы
+и неизвестные параметры отбрасываются, а значения текстовых фильтров
+заменяются на "*", чтобы поисковые строки не размножали комбинации.
+
+Для каждой комбинации за час копятся число запросов, их суммарное время
+и последний исходный вид параметров (по нему прогреваются кэши).
+Данные хранятся в Redis в сортированных множествах по часам с истечением
+через HOT_QUERIES_WINDOW_HOURS, а если кэш не Redis - в файлах по часам
+в HOT_QUERIES_DIR. Отчет строит команда hot_queries.
+"""
+
+import json
+import random
+import threading
+import time
+from contextlib import suppress
+from functools import cache
+from itertools import batched
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import QueryDict
+from django.urls import reverse
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from shop.filters import ProductFilter
+from shop.filters import camel_to_snake
+
+KEY = "shop:hotqueries:{}:{}"
+IGNORED_PARAMS = frozenset({"page"})
+TEXT_PARAMS = frozenset({"title", "description"})
+TRACKED_PARAMS = frozenset(ProductFilter.base_filters) | {"limit"}
+MASK = "*"
+
+
+class HotQuery(NamedTuple):
+    combination: str
+    count: int
+    seconds: float
+    raw: str
+
+    @property
+    def average(self) -> float:
+        return self.seconds / self.count
+
+
+def current_hour() -> int:
+    return int(time.time() // 3600)
+
+
+def normalize_ordering(sort: str, sort_type: str | None) -> str:
+    """sort и sortType в виде списка полей через запятую, как в CustomOrderingFilter"""
+    fields = [field.strip() for field in sort.split(",") if field.strip()]
+    types = [value.strip() for value in (sort_type or "").split(",")]
+    if types == ["des"]:
+        types *= len(fields)
+    if len(types) != len(fields):
+        types = [""] * len(fields)
+    return ",".join(
+        f"-{field}" if kind == "des" else field
+        for field, kind in zip(fields, types, strict=True)
+    )
+
+
+def normalize(params: QueryDict) -> str:
+    """Каноническая комбинация параметров запроса к каталогу"""
+    items = []
+    for name, values in params.lists():
+        snake = camel_to_snake(name)
+        if snake in TRACKED_PARAMS:
+            value = MASK if snake in TEXT_PARAMS else ",".join(sorted(values))
+            items.append((snake, value))
+    if params.get("sort"):
+        items.append(
+            ("sort", normalize_ordering(params["sort"], params.get("sortType")))
+        )
+    return urlencode(sorted(items), safe=f"{MASK},-")
+
+
+def raw_query(params: QueryDict) -> str:
+    """Исходные параметры без номера страницы"""
+    params = params.copy()
+    for name in IGNORED_PARAMS:
+        params.pop(name, None)
+    return params.urlencode()
+
+
+def shape(combination: str) -> str:
+    """Только имена параметров комбинации - то, что важно для индексов"""
+    return "&".join(item.split("=", 1)[0] for item in combination.split("&") if item)
+
+
+def aggregate(rows) -> dict[str, HotQuery]:
+    """Суммирует строки (комбинация, число, время, исходный вид) по комбинациям"""
+    queries: dict[str, HotQuery] = {}
+    for combination, count, seconds, raw in rows:
+        known = queries.get(combination)
+        if known is None:
+            queries[combination] = HotQuery(combination, count, seconds, raw)
+        else:
+            queries[combination] = HotQuery(
+                combination,
+                known.count + count,
+                known.seconds + seconds,
+                known.raw or raw,
+            )
+    return queries
+
+
+class RedisStore:
+    def __init__(self, client):
+        self.client = client
+
+    def record(self, combination: str, raw: str, seconds: float) -> None:
+        hour = current_hour()
+        keys = [KEY.format(kind, hour) for kind in ("count", "seconds", "raw")]
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zincrby(keys[0], 1, combination)
+        pipe.zincrby(keys[1], seconds, combination)
+        pipe.hset(keys[2], combination, raw)
+        for key in keys:
+            pipe.expire(key, settings.HOT_QUERIES_WINDOW_HOURS * 3600)
+        pipe.execute()
+
+    def load(self, hours: int) -> dict[str, HotQuery]:
+        last = current_hour()
+        pipe = self.client.pipeline(transaction=False)
+        for hour in range(last - hours + 1, last + 1):
+            pipe.zrange(KEY.format("count", hour), 0, -1, withscores=True)
+            pipe.zrange(KEY.format("seconds", hour), 0, -1, withscores=True)
+            pipe.hgetall(KEY.format("raw", hour))
+        results = pipe.execute()
+
+        rows = []
+        # Часы идут по возрастанию, а исходный вид нужен из последнего часа,
+        # поэтому строки передаются в aggregate в обратном порядке
+        for counts, hour_seconds, hour_raws in batched(results, 3):
+            seconds = {member.decode(): value for member, value in hour_seconds}
+            raws = {member.decode(): raw.decode() for member, raw in hour_raws.items()}
+            for member, count in counts:
+                combination = member.decode()
+                rows.append(
+                    (
+                        combination,
+                        int(count),
+                        seconds.get(combination, 0.0),
+                        raws.get(combination, ""),
+                    )
+                )
+        return aggregate(reversed(rows))
+
+
+class FileStore:
+    """Файлы JSON Lines по часам, устаревшие удаляются при смене часа"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.lock = threading.Lock()
+
+    def path(self, hour: int) -> Path:
+        return self.directory / f"{hour}.jsonl"
+
+    def record(self, combination: str, raw: str, seconds: float) -> None:
+        hour = current_hour()
+        path = self.path(hour)
+        line = json.dumps([combination, raw, seconds], ensure_ascii=False)
+        with self.lock:
+            if not path.exists():
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self.purge(hour)
+            with path.open("a", encoding="utf-8") as file:
+                file.write(line + "\n")
+
+    def purge(self, hour: int) -> None:
+        for path in self.directory.glob("*.jsonl"):
+            if path.stem.isdigit() and int(path.stem) <= (
+                hour - settings.HOT_QUERIES_WINDOW_HOURS
+            ):
+                path.unlink(missing_ok=True)
+
+    def load(self, hours: int) -> dict[str, HotQuery]:
+        last = current_hour()
+        rows = []
+        for hour in range(last, last - hours, -1):
+            path = self.path(hour)
+            if not path.exists():
+                continue
+            lines = path.read_text(encoding="utf-8").splitlines()
+            # Новые записи первыми: исходный вид берется из последней
+            for line in reversed(lines):
+                try:
+                    combination, raw, seconds = json.loads(line)
+                except ValueError:
+                    # Строка, недописанная при остановке процесса
+                    continue
+                rows.append((combination, 1, seconds, raw))
+        return aggregate(rows)
+
+
+@cache
+def get_store() -> RedisStore | FileStore:
+    try:
+        return RedisStore(get_redis_connection("default"))
+    except NotImplementedError:
+        # Кэш по умолчанию не django-redis
+        return FileStore(settings.HOT_QUERIES_DIR)
+
+
+def record_query(params: QueryDict, seconds: float) -> None:
+    """Учитывает запрос к каталогу с вероятностью HOT_QUERIES_SAMPLE_RATE"""
+    if random.random() >= settings.HOT_QUERIES_SAMPLE_RATE:  # noqa: S311
+        return
+    # Статистика не должна ломать ответ каталога
+    with suppress(RedisError, OSError):
+        get_store().record(normalize(params), raw_query(params), seconds)
+
+
+def top_queries(hours: int | None = None, order: str = "count") -> list[HotQuery]:
+    """Комбинации за последние hours часов по убыванию order (count, seconds)"""
+    queries = get_store().load(hours or settings.HOT_QUERIES_WINDOW_HOURS)
+    return sorted(
+        queries.values(), key=lambda query: getattr(query, order), reverse=True
+    )
+
+
+def hot_urls(limit: int) -> list[str]:
+    """Адреса самых частых комбинаций для прогрева кэшей"""
+    try:
+        queries = top_queries()
+    except (RedisError, OSError):
+        return []
+    path = reverse("shop:api_catalog")
+    urls = [
+        f"{path}?{query.raw}" if query.raw else path
+        for query in queries
+        if MASK not in query.combination
+    ]
+    return urls[:limit]
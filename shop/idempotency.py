@@ -0,0 +1,138 @@
+"""
+Идемпотентность POST-запросов по заголовку Idempotency-Key.
+
+Первый запрос с ключом захватывает его в кэше (cache.add), выполняет
+представление в собственной транзакции и после коммита сохраняет ответ
+на IDEMPOTENCY_TTL секунд. Повторы с тем же ключом:
+    - пока первый запрос выполняется - ждут его результата;
+    - после завершения - получают сохраненный ответ без повторного выполнения;
+    - с другим телом запроса - получают 422.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.http import JsonResponse
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+KEY = "shop:idempotency:{}"
+PENDING = "pending"
+MAX_KEY_LENGTH = 255
+SERVER_ERROR = 500
+POLL_INTERVAL = 0.05
+
+
+def cache_key(request, key: str) -> str:
+    if request.user.is_authenticated:
+        owner = f"user:{request.user.pk}"
+    else:
+        owner = f"session:{request.session.session_key}"
+    digest = hashlib.blake2b(
+        f"{owner}|{request.path}|{key}".encode(), digest_size=16
+    ).hexdigest()
+    return KEY.format(digest)
+
+
+def fingerprint(request) -> str:
+    return hashlib.blake2b(request.body, digest_size=16).hexdigest()
+
+
+class IdempotentViewMixin:
+    """
+    Подключается к представлениям с POST. ATOMIC_REQUESTS для представления
+    отключается: транзакция открывается внутри mixin, чтобы ответ сохранялся
+    только после успешного коммита.
+    """
+
+    idempotent_methods = ("POST",)
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Отметка на самой функции представления: as_view() копирует атрибуты
+        # только с первого dispatch по MRO, а им может быть dispatch другого mixin
+        view = super().as_view(**initkwargs)
+        for alias in settings.DATABASES:
+            view = transaction.non_atomic_requests(using=alias)(view)
+        return view
+
+    def dispatch(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if request.method not in self.idempotent_methods or not key:
+            with transaction.atomic():
+                return super().dispatch(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse(
+                {"success": False, "message": f"Слишком длинный {HEADER}"},
+                status=400,
+            )
+
+        storage_key = cache_key(request, key)
+        request_fingerprint = fingerprint(request)
+        if not cache.add(
+            storage_key,
+            {"state": PENDING, "fingerprint": request_fingerprint},
+            settings.IDEMPOTENCY_LOCK_TIMEOUT,
+        ):
+            return self.replay(storage_key, request_fingerprint)
+
+        try:
+            with transaction.atomic():
+                response = super().dispatch(request, *args, **kwargs)
+        except Exception:
+            cache.delete(storage_key)
+            raise
+
+        if response.status_code >= SERVER_ERROR or response.streaming:
+            cache.delete(storage_key)
+            return response
+
+        cache.set(
+            storage_key,
+            {
+                "state": "done",
+                "fingerprint": request_fingerprint,
+                "status": response.status_code,
+                "content": response.content,
+                "content_type": response["Content-Type"],
+            },
+            settings.IDEMPOTENCY_TTL,
+        )
+        return response
+
+    @staticmethod
+    def replay(storage_key: str, request_fingerprint: str) -> HttpResponse:
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+        stored = cache.get(storage_key)
+        while stored is not None and stored["state"] == PENDING:
+            if time.monotonic() >= deadline:
+                return JsonResponse(
+                    {"success": False, "message": "Запрос еще выполняется"},
+                    status=409,
+                )
+            time.sleep(POLL_INTERVAL)
+            stored = cache.get(storage_key)
+
+        if stored is None:
+            # Первый запрос завершился ошибкой, ключ освобожден
+            return JsonResponse(
+                {"success": False, "message": "Предыдущий запрос не выполнен"},
+                status=409,
+            )
+        if stored["fingerprint"] != request_fingerprint:
+            return JsonResponse(
+                {"success": False, "message": f"{HEADER} уже использован"},
+                status=422,
+            )
+
+        response = HttpResponse(
+            stored["content"],
+            status=stored["status"],
+            content_type=stored["content_type"],
+        )
+        response[REPLAYED_HEADER] = "true"
+        return response
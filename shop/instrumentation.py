@@ -0,0 +1,416 @@
+"""
+Метрики обработки запросов по именам представлений.
+
+InstrumentationMiddleware для каждого запроса собирает:
+    - общее время обработки;
+    - время и число SQL-запросов (через execute_wrappers соединений);
+    - попадания и промахи кэша магазина (record_cache);
+    - время сериализации (TimedListSerializer);
+    - время рендеринга шаблона или ответа DRF.
+
+Результаты агрегируются в памяти процесса по view_name (например
+shop:api_catalog) и отдаются в формате Prometheus через MetricsView, а для
+текущего запроса - в заголовке Server-Timing. Вместе с ними экспортируются
+число подключений к базам (показывает пересоздание соединений) и статистика
+пулов psycopg (export_pools). Метрики собираются в каждом
+процессе отдельно, поэтому Prometheus должен опрашивать каждый воркер.
+"""
+
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from dataclasses import replace
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.serializers import ListSerializer
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNRESOLVED_VIEW = "<unresolved>"
+
+
+@dataclass(slots=True)
+class RequestMetrics:
+    sql_time: float = 0.0
+    sql_count: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    serializer_time: float = 0.0
+    template_time: float = 0.0
+    # Замеряемый сейчас компонент, вложенные замеры того же компонента не учитываются
+    timing: str = ""
+
+
+_current: ContextVar[RequestMetrics | None] = ContextVar(
+    "shop_request_metrics", default=None
+)
+
+
+def current() -> RequestMetrics | None:
+    """Метрики текущего запроса, None - если сбор отключен"""
+    return _current.get()
+
+
+def record_cache(hits: int = 0, misses: int = 0) -> None:
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+@contextmanager
+def timed(component: str):
+    """
+    Замеряет время блока в поле {component}_time метрик запроса.
+    Время SQL-запросов внутри блока не учитывается, оно входит в sql_time.
+    """
+    metrics = _current.get()
+    if metrics is None or metrics.timing == component:
+        yield
+        return
+    outer, metrics.timing = metrics.timing, component
+    sql_before = metrics.sql_time
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started - (metrics.sql_time - sql_before)
+        field = f"{component}_time"
+        setattr(metrics, field, getattr(metrics, field) + elapsed)
+        metrics.timing = outer
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_time += time.perf_counter() - started
+        metrics.sql_count += 1
+
+
+def install_sql_wrapper(sender, connection, **kwargs):
+    """
+    Подключает sql_wrapper к соединению один раз при его открытии,
+    а не на каждый запрос - это заметно дешевле execute_wrapper() в middleware.
+    """
+    if sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_wrapper)
+
+
+def count_connection(sender, connection, **kwargs):
+    registry.connected(connection.alias)
+
+
+def install_sql_wrappers() -> None:
+    connection_created.connect(install_sql_wrapper)
+    connection_created.connect(count_connection)
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is not None:
+            install_sql_wrapper(None, connection)
+
+
+@dataclass(slots=True)
+class ViewStats:
+    requests: int = 0
+    duration: float = 0.0
+    sql_time: float = 0.0
+    sql_count: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    serializer_time: float = 0.0
+    template_time: float = 0.0
+    buckets: list[int] | None = None
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Registry:
+    """Агрегированные метрики процесса по именам представлений"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views: dict[str, ViewStats] = {}
+        # Подключения по алиасам баз, с пулом - выдачи соединений из пула
+        self.connects: dict[str, int] = {}
+
+    def observe(self, view: str, duration: float, metrics: RequestMetrics) -> None:
+        with self.lock:
+            stats = self.views.get(view)
+            if stats is None:
+                stats = self.views[view] = ViewStats(
+                    buckets=[0] * len(DURATION_BUCKETS)
+                )
+            stats.requests += 1
+            stats.duration += duration
+            stats.sql_time += metrics.sql_time
+            stats.sql_count += metrics.sql_count
+            stats.cache_hits += metrics.cache_hits
+            stats.cache_misses += metrics.cache_misses
+            stats.serializer_time += metrics.serializer_time
+            stats.template_time += metrics.template_time
+            index = bisect_left(DURATION_BUCKETS, duration)
+            if index < len(DURATION_BUCKETS):
+                stats.buckets[index] += 1
+
+    def connected(self, alias: str) -> None:
+        with self.lock:
+            self.connects[alias] = self.connects.get(alias, 0) + 1
+
+    def reset(self) -> None:
+        with self.lock:
+            self.views.clear()
+            self.connects.clear()
+
+    def export(self) -> str:
+        """Метрики в текстовом формате Prometheus"""
+        with self.lock:
+            views = {
+                view: replace(stats, buckets=list(stats.buckets))
+                for view, stats in sorted(self.views.items())
+            }
+            connects = sorted(self.connects.items())
+
+        lines = [
+            "# HELP shop_view_duration_seconds Время обработки запроса.",
+            "# TYPE shop_view_duration_seconds histogram",
+        ]
+        for view, stats in views.items():
+            label = f'view="{escape_label(view)}"'
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, stats.buckets, strict=True):
+                cumulative += count
+                lines.append(
+                    f'shop_view_duration_seconds_bucket{{{label},le="{bound}"}} '
+                    f"{cumulative}"
+                )
+            lines.extend(
+                [
+                    f'shop_view_duration_seconds_bucket{{{label},le="+Inf"}} '
+                    f"{stats.requests}",
+                    f"shop_view_duration_seconds_sum{{{label}}} {stats.duration}",
+                    f"shop_view_duration_seconds_count{{{label}}} {stats.requests}",
+                ]
+            )
+
+        counters = (
+            ("shop_view_sql_seconds_total", "Время SQL-запросов.", "sql_time"),
+            ("shop_view_sql_queries_total", "Число SQL-запросов.", "sql_count"),
+            (
+                "shop_view_serializer_seconds_total",
+                "Время сериализации.",
+                "serializer_time",
+            ),
+            (
+                "shop_view_template_seconds_total",
+                "Время рендеринга шаблона или ответа.",
+                "template_time",
+            ),
+        )
+        for name, help_text, field in counters:
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} counter"])
+            lines.extend(
+                f'{name}{{view="{escape_label(view)}"}} {getattr(stats, field)}'
+                for view, stats in views.items()
+            )
+
+        lines.extend(
+            [
+                "# HELP shop_view_cache_requests_total Обращения к кэшу магазина.",
+                "# TYPE shop_view_cache_requests_total counter",
+            ]
+        )
+        for view, stats in views.items():
+            label = f'view="{escape_label(view)}"'
+            lines.append(
+                f'shop_view_cache_requests_total{{{label},result="hit"}} '
+                f"{stats.cache_hits}"
+            )
+            lines.append(
+                f'shop_view_cache_requests_total{{{label},result="miss"}} '
+                f"{stats.cache_misses}"
+            )
+
+        lines.extend(
+            [
+                "# HELP shop_db_connects_total Подключения к базе данных.",
+                "# TYPE shop_db_connects_total counter",
+            ]
+        )
+        lines.extend(
+            f'shop_db_connects_total{{database="{escape_label(alias)}"}} {count}'
+            for alias, count in connects
+        )
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Метрика, тип, описание, ключ get_stats() psycopg_pool, множитель
+POOL_METRICS = (
+    ("shop_db_pool_min_size", "gauge", "Минимальный размер пула.", "pool_min", 1),
+    ("shop_db_pool_max_size", "gauge", "Максимальный размер пула.", "pool_max", 1),
+    ("shop_db_pool_size", "gauge", "Соединения пула.", "pool_size", 1),
+    ("shop_db_pool_available", "gauge", "Свободные соединения.", "pool_available", 1),
+    ("shop_db_pool_waiting", "gauge", "Ждут соединения сейчас.", "requests_waiting", 1),
+    (
+        "shop_db_pool_checkouts_total",
+        "counter",
+        "Выдачи соединений.",
+        "requests_num",
+        1,
+    ),
+    (
+        "shop_db_pool_waits_total",
+        "counter",
+        "Выдачи с ожиданием свободного соединения.",
+        "requests_queued",
+        1,
+    ),
+    (
+        "shop_db_pool_wait_seconds_total",
+        "counter",
+        "Время ожидания соединений.",
+        "requests_wait_ms",
+        0.001,
+    ),
+    (
+        "shop_db_pool_timeouts_total",
+        "counter",
+        "Отказы в соединении по таймауту.",
+        "requests_errors",
+        1,
+    ),
+    (
+        "shop_db_pool_connections_total",
+        "counter",
+        "Соединения, открытые пулом.",
+        "connections_num",
+        1,
+    ),
+    (
+        "shop_db_pool_connections_lost_total",
+        "counter",
+        "Соединения, потерянные пулом.",
+        "connections_lost",
+        1,
+    ),
+)
+
+
+def pool_stats() -> dict[str, dict[str, int]]:
+    """Статистика пулов psycopg процесса по алиасам баз с OPTIONS["pool"]"""
+    stats = {}
+    for alias in connections:
+        # Пул общий для всех потоков процесса; свойство pool создает его
+        # без открытия соединений, у баз без пула и не PostgreSQL - None
+        pool = getattr(connections[alias], "pool", None)
+        if pool is not None:
+            stats[alias] = pool.get_stats()
+    return stats
+
+
+def export_pools() -> str:
+    """Статистика пулов в текстовом формате Prometheus"""
+    pools = pool_stats()
+    if not pools:
+        return ""
+    lines = []
+    for name, kind, help_text, key, scale in POOL_METRICS:
+        lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"])
+        # Счетчики psycopg_pool появляются после первого события
+        lines.extend(
+            f'{name}{{database="{escape_label(alias)}"}} {stats.get(key, 0) * scale}'
+            for alias, stats in pools.items()
+        )
+    return "\n".join(lines) + "\n"
+
+
+def server_timing(duration: float, metrics: RequestMetrics) -> str:
+    return ", ".join(
+        [
+            f"total;dur={duration * 1000:.1f}",
+            f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.sql_count} queries"',
+            f'cache;desc="hit={metrics.cache_hits} miss={metrics.cache_misses}"',
+            f"serializer;dur={metrics.serializer_time * 1000:.1f}",
+            f"template;dur={metrics.template_time * 1000:.1f}",
+        ]
+    )
+
+
+def is_trusted(request) -> bool:
+    """
+    Запрос персонала или с токеном INSTRUMENTATION_TOKEN в заголовке
+    Authorization: Bearer. Только таким запросам доступны метрики.
+    """
+    token = settings.INSTRUMENTATION_TOKEN
+    if token and hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return True
+    user = getattr(request, "user", None)
+    return bool(user and user.is_staff)
+
+
+class InstrumentationMiddleware:
+    """
+    Сбор метрик запроса. Должен стоять первым в MIDDLEWARE,
+    чтобы общее время включало остальные middleware.
+    """
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = settings.INSTRUMENTATION_SERVER_TIMING
+        install_sql_wrappers()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        duration = time.perf_counter() - started
+        view = getattr(request.resolver_match, "view_name", None) or UNRESOLVED_VIEW
+        registry.observe(view, duration, metrics)
+        # Время SQL и кэша не раскрывается посторонним
+        if self.server_timing and is_trusted(request):
+            response["Server-Timing"] = server_timing(duration, metrics)
+        return response
+
+    def process_template_response(self, request, response):
+        render = response.render
+
+        def timed_render():
+            with timed("template"):
+                return render()
+
+        response.render = timed_render
+        return response
+
+
+class TimedListSerializer(ListSerializer):
+    """
+    Списочный сериализатор с замером времени сериализации.
+    Подключается через Meta.list_serializer_class.
+    """
+
+    @property
+    def data(self):
+        with timed("serializer"):
+            return super().data
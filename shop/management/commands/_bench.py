@@ -0,0 +1,97 @@
+"""
+Общие помощники для команд бенчмарков (bench_*).
+
+Данные для замеров создаются внутри транзакции, которая откатывается
+по завершении, поэтому команды можно запускать на рабочей базе разработчика.
+"""
+
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from shop.models import Category
+from shop.models import ImageProduct
+from shop.models import Product
+from shop.models import Promotion
+from shop.models import PromotionProduct
+from shop.models import Tag
+
+
+@contextmanager
+def rollback():
+    """Выполняет блок в транзакции и откатывает все изменения"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def measure(func, repeat: int) -> float:
+    """Лучшее время выполнения func из repeat запусков, в секундах"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def create_catalog(products: int, categories: int = 20) -> None:
+    """Создает каталог с изображениями, тегами и акциями для замеров"""
+    now = timezone.now()
+    roots = [Category.objects.create(title=f"Бенчмарк {i}") for i in range(categories)]
+    tags = Tag.objects.bulk_create([Tag(name=f"тег {i}") for i in range(10)])
+    promotions = [
+        Promotion.objects.create(
+            title=f"Акция {i}",
+            description="Описание акции " * 10,
+            discount_percent=5 * (i + 1),
+            start_date=now - timedelta(days=1),
+            end_date=now + timedelta(days=i - 1),
+        )
+        for i in range(3)
+    ]
+
+    items = Product.objects.bulk_create(
+        [
+            Product(
+                category=roots[i % categories],
+                title=f"Товар {i}",
+                description="Подробное описание товара " * 20,
+                price=Decimal(100 + i % 900),
+                count=i % 25,
+            )
+            for i in range(products)
+        ]
+    )
+    ImageProduct.objects.bulk_create(
+        [
+            ImageProduct(product=product, src=f"bench/{product.pk}_{n}.jpg")
+            for product in items
+            for n in range(2)
+        ]
+    )
+    Tag.products.through.objects.bulk_create(
+        [
+            Tag.products.through(
+                tag=tags[(product.pk + n) % len(tags)], product=product
+            )
+            for product in items
+            for n in range(3)
+        ]
+    )
+    PromotionProduct.objects.bulk_create(
+        [
+            PromotionProduct(
+                promotion=promotions[product.pk % len(promotions)],
+                product=product,
+                limit=product.pk % 4 or None,
+                price_with_discount=product.price * Decimal("0.9"),
+            )
+            for product in items
+            if product.pk % 2
+        ]
+    )
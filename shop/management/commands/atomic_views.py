@@ -0,0 +1,67 @@
+"""
+Адреса, представления которых выполняются в транзакции ATOMIC_REQUESTS.
+
+Представления, которые только читают данные, отмечаются ReadOnlyMixin
+(shop.db) и выполняются без транзакции.
+
+Примеры:
+    python manage.py atomic_views
+    python manage.py atomic_views --namespace shop --all
+"""
+
+from django.core.management.base import BaseCommand
+from django.urls import URLResolver
+from django.urls import get_resolver
+
+from shop.db import atomic_databases
+
+
+def iter_views(patterns, prefix: str = "", namespace: str = ""):
+    """(адрес, полное имя, представление) для всех адресов без вложенности"""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            nested = namespace
+            if pattern.namespace:
+                nested = f"{namespace}:{pattern.namespace}".lstrip(":")
+            yield from iter_views(
+                pattern.url_patterns, prefix + str(pattern.pattern), nested
+            )
+        else:
+            name = pattern.name or ""
+            if name and namespace:
+                name = f"{namespace}:{name}"
+            yield prefix + str(pattern.pattern), name, pattern.callback
+
+
+def view_path(view) -> str:
+    view = getattr(view, "view_class", None) or getattr(view, "cls", None) or view
+    return f"{view.__module__}.{view.__qualname__}"
+
+
+class Command(BaseCommand):
+    help = "Показывает представления, которые выполняются в транзакции"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--namespace", help="Только адреса пространства имен, например shop"
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Показать и представления без транзакции",
+        )
+
+    def handle(self, *args, **options):
+        namespace = options["namespace"]
+        atomic = 0
+        for route, name, view in iter_views(get_resolver().url_patterns):
+            if namespace and not name.startswith(f"{namespace}:"):
+                continue
+            databases = atomic_databases(view)
+            atomic += bool(databases)
+            if databases or options["all"]:
+                self.stdout.write(
+                    f"{','.join(databases) or '-':<10} {route:<48} "
+                    f"{name or '-':<32} {view_path(view)}"
+                )
+        self.stderr.write(f"В транзакции: {atomic}")
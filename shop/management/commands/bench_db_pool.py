@@ -0,0 +1,97 @@
+"""
+Пересоздание соединений с PostgreSQL без пула и с пулом psycopg.
+
+Каждый запрос выполняется в новом потоке, как под UvicornWorker, где у
+запроса свой контекст и свое соединение. Число соединений считается по
+различным pg_backend_pid(). Нужна база PostgreSQL и пакет psycopg[pool].
+
+Пример:
+    python manage.py bench_db_pool --requests 500 --workers 8
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db.utils import ConnectionHandler
+
+MODES = ("persistent", "per-request", "pool")
+
+
+def database_settings(database: dict, mode: str, max_size: int) -> dict:
+    options = {
+        name: value
+        for name, value in database.get("OPTIONS", {}).items()
+        if name != "pool"
+    }
+    if mode == "pool":
+        options["pool"] = {"min_size": 2, "max_size": max_size, "timeout": 30}
+    return {
+        **database,
+        "OPTIONS": options,
+        "CONN_MAX_AGE": 60 if mode == "persistent" else 0,
+    }
+
+
+def request(connections: ConnectionHandler, alias: str, pids: set[int]) -> None:
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_backend_pid()")
+        pids.add(cursor.fetchone()[0])
+    # Как по сигналу request_finished в конце запроса
+    connection.close_if_unusable_or_obsolete()
+
+
+class Command(BaseCommand):
+    help = "Бенчмарк пересоздания соединений с базой без пула и с пулом"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES[options["database"]]
+        if database["ENGINE"] != "django.db.backends.postgresql":
+            msg = "Бенчмарк требует PostgreSQL"
+            raise CommandError(msg)
+
+        workers = options["workers"]
+        batches = -(-options["requests"] // workers)
+        requests = batches * workers
+        for mode in MODES:
+            # Отдельный алиас: пулы хранятся в классе соединения по алиасу
+            alias = f"bench_{mode}"
+            connections = ConnectionHandler(
+                {alias: database_settings(database, mode, workers)}
+            )
+            pids: set[int] = set()
+            started = time.perf_counter()
+            for _ in range(batches):
+                threads = [
+                    threading.Thread(target=request, args=(connections, alias, pids))
+                    for _ in range(workers)
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            elapsed = time.perf_counter() - started
+
+            stats = ""
+            pool = connections[alias].pool
+            if pool is not None:
+                pool_stats = pool.get_stats()
+                stats = (
+                    f"  ожиданий {pool_stats.get('requests_queued', 0)}"
+                    f"  таймаутов {pool_stats.get('requests_errors', 0)}"
+                )
+                connections[alias].close_pool()
+            connections.close_all()
+
+            self.stdout.write(
+                f"{mode:<12} запросов {requests}  соединений {len(pids):>5}  "
+                f"{elapsed / requests * 1000:6.2f} мс на запрос{stats}"
+            )
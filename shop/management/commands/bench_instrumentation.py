@@ -0,0 +1,67 @@
+"""
+Накладные расходы InstrumentationMiddleware на обработку запросов.
+
+Пример:
+    python manage.py bench_instrumentation --products 500 --requests 200
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from shop.management.commands._bench import create_catalog
+from shop.management.commands._bench import measure
+from shop.management.commands._bench import rollback
+
+URLS = ("shop:api_catalog", "shop:api_categories", "shop:product_list")
+
+
+class Command(BaseCommand):
+    help = "Бенчмарк накладных расходов сбора метрик запросов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=500)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--host", default="localhost")
+
+    def handle(self, *args, **options):
+        requests = options["requests"]
+        with rollback():
+            create_catalog(options["products"])
+            user = get_user_model().objects.create_user(username="bench")
+
+            clients = {}
+            for enabled in (False, True):
+                # Цепочка middleware собирается при первом запросе клиента
+                with override_settings(INSTRUMENTATION_ENABLED=enabled):
+                    clients[enabled] = APIClient(SERVER_NAME=options["host"])
+                    clients[enabled].force_authenticate(user)
+                    for name in URLS:
+                        clients[enabled].get(reverse(name))
+
+            # Замеры с метриками и без чередуются, чтобы уравнять условия
+            results = dict.fromkeys(
+                [(name, enabled) for name in URLS for enabled in clients],
+                float("inf"),
+            )
+            for _ in range(options["repeat"]):
+                for name, enabled in results:
+                    client, url = clients[enabled], reverse(name)
+                    seconds = measure(
+                        lambda client=client, url=url: [
+                            client.get(url) for _ in range(requests)
+                        ],
+                        1,
+                    )
+                    results[name, enabled] = min(results[name, enabled], seconds)
+
+        for name in URLS:
+            disabled, enabled = results[name, False], results[name, True]
+            self.stdout.write(
+                f"{name:<24} без метрик {disabled / requests * 1000:7.2f} мс  "
+                f"с метриками {enabled / requests * 1000:7.2f} мс  "
+                f"накладные расходы {(enabled / disabled - 1) * 100:+.2f}%"
+            )
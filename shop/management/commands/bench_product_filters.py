@@ -0,0 +1,121 @@
+"""
+Планы запросов и время основных фильтров каталога с индексами и без них.
+
+Замер "без индексов" выполняется после удаления индексов из Product.Meta
+и Promotion.Meta (с восстановлением обычного индекса по category_id)
+внутри той же откатываемой транзакции.
+
+Пример:
+    python manage.py bench_product_filters --products 50000 --output plans.txt
+"""
+
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from shop.filters import ProductFilter
+from shop.management.commands._bench import create_catalog
+from shop.management.commands._bench import measure
+from shop.management.commands._bench import rollback
+from shop.models import Category
+from shop.models import Product
+from shop.models import Promotion
+
+PAGE_SIZE = 20
+
+
+def filter_cases() -> dict:
+    """Наиболее частые комбинации параметров ProductFilter"""
+    category_id = Category.objects.filter(title__startswith="Бенчмарк").first().pk
+    products = Product.objects.all()
+    return {
+        "каталог по умолчанию": lambda: ProductFilter({}, products).qs,
+        "доступные по названию": lambda: ProductFilter(
+            {"available": "true"}, products
+        ).qs,
+        "доступные по цене": lambda: ProductFilter(
+            {"available": "true", "min_price": "200", "max_price": "300"}, products
+        ).qs.order_by("price"),
+        "категория + доступность + цена": lambda: ProductFilter(
+            {
+                "category_id": category_id,
+                "available": "true",
+                "min_price": "200",
+                "max_price": "500",
+            },
+            products,
+        ).qs,
+        "диапазон количества": lambda: ProductFilter(
+            {"min_count": "5", "max_count": "10"}, products
+        ).qs,
+        "товары в акциях": lambda: ProductFilter({"promotion": "true"}, products).qs,
+        "активные акции": lambda: Promotion.objects.active(),
+    }
+
+
+class Command(BaseCommand):
+    help = "Бенчмарк фильтров каталога с EXPLAIN до и после индексов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=20000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--output", type=Path, help="Файл для сохранения планов запросов"
+        )
+
+    def handle(self, *args, **options):
+        with rollback():
+            create_catalog(options["products"])
+            cases = filter_cases()
+
+            after = self.run_cases(cases, options["repeat"])
+            self.drop_indexes()
+            before = self.run_cases(cases, options["repeat"])
+
+        report = []
+        for name in cases:
+            (before_time, before_plan), (after_time, after_plan) = (
+                before[name],
+                after[name],
+            )
+            self.stdout.write(
+                f"{name:<32} без индексов {before_time * 1000:8.2f} мс  "
+                f"с индексами {after_time * 1000:8.2f} мс  "
+                f"x{before_time / after_time:.1f}"
+            )
+            report.append(
+                f"== {name}\n-- без индексов\n{before_plan}\n"
+                f"-- с индексами\n{after_plan}\n"
+            )
+
+        if options["output"]:
+            options["output"].write_text("\n".join(report), encoding="utf-8")
+            self.stdout.write(f"Планы запросов сохранены в {options['output']}")
+        elif options["verbosity"] > 1:
+            self.stdout.write("\n".join(report))
+
+    @staticmethod
+    def run_cases(cases: dict, repeat: int) -> dict[str, tuple[float, str]]:
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Product._meta.db_table}")  # noqa: SLF001
+        return {
+            name: (
+                measure(lambda build=build: list(build()[:PAGE_SIZE]), repeat),
+                build()[:PAGE_SIZE].explain(),
+            )
+            for name, build in cases.items()
+        }
+
+    @staticmethod
+    def drop_indexes() -> None:
+        quote = connection.ops.quote_name
+        product_table = Product._meta.db_table  # noqa: SLF001
+        with connection.cursor() as cursor:
+            for model in (Product, Promotion):
+                for index in model._meta.indexes:  # noqa: SLF001
+                    cursor.execute(f"DROP INDEX {quote(index.name)}")
+            cursor.execute(
+                f"CREATE INDEX {quote('bench_product_category_id')} "
+                f"ON {quote(product_table)} ({quote('category_id')})"
+            )
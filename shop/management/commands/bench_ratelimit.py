@@ -0,0 +1,81 @@
+"""
+Накладные расходы RateLimitMiddleware на запросы изменения корзины.
+
+Лимит задается заведомо большим, чтобы запросы не отклонялись и замер
+показывал только стоимость проверки. Хранилище корзин токенов - то, что
+настроено в окружении: Redis для django-redis, иначе память процесса.
+
+Пример:
+    python manage.py bench_ratelimit --requests 500
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test import override_settings
+from django.urls import reverse
+
+from shop.management.commands._bench import create_catalog
+from shop.management.commands._bench import measure
+from shop.management.commands._bench import rollback
+from shop.models import Product
+from shop.ratelimit import RateLimiter
+
+ROUTE = "shop:add_to_basket"
+
+
+class Command(BaseCommand):
+    help = "Бенчмарк накладных расходов ограничения частоты запросов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--host", default="localhost")
+
+    def handle(self, *args, **options):
+        requests = options["requests"]
+        limits = {False: {}, True: {ROUTE: (10**9, 1)}}
+
+        limiter = RateLimiter()
+        backend = "память процесса" if limiter.script is None else "Redis"
+        hit = measure(
+            lambda: [
+                limiter.hit("shop:ratelimit:bench", 10**9, 1) for _ in range(requests)
+            ],
+            options["repeat"],
+        )
+        self.stdout.write(
+            f"RateLimiter.hit ({backend}): {hit / requests * 10**6:.1f} мкс на вызов"
+        )
+
+        with rollback():
+            create_catalog(10)
+            user = get_user_model().objects.create_user(username="bench")
+            url = reverse(ROUTE, args=[Product.objects.first().pk])
+
+            clients = {}
+            for enabled, rate_limits in limits.items():
+                # Цепочка middleware собирается при первом запросе клиента
+                with override_settings(RATE_LIMITS=rate_limits):
+                    clients[enabled] = Client(SERVER_NAME=options["host"])
+                    clients[enabled].force_login(user)
+                    clients[enabled].post(url)
+
+            # Замеры с лимитом и без чередуются, чтобы уравнять условия
+            results = dict.fromkeys(clients, float("inf"))
+            for _ in range(options["repeat"]):
+                for enabled, client in clients.items():
+                    seconds = measure(
+                        lambda client=client: [
+                            client.post(url) for _ in range(requests)
+                        ],
+                        1,
+                    )
+                    results[enabled] = min(results[enabled], seconds)
+
+        disabled, enabled = results[False], results[True]
+        self.stdout.write(
+            f"{ROUTE:<24} без лимита {disabled / requests * 1000:7.3f} мс  "
+            f"с лимитом {enabled / requests * 1000:7.3f} мс  "
+            f"накладные расходы {(enabled / disabled - 1) * 100:+.2f}%"
+        )
@@ -0,0 +1,77 @@
+"""
+Сравнение CamelCaseJSONRenderer и CamelCaseORJSONRenderer на ответе
+ProductSerializer, а также размера ответа после gzip и brotli.
+
+Пример:
+    python manage.py bench_renderers --products 1000 --repeat 5
+"""
+
+import json
+
+import brotli
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.utils.text import compress_string
+from djangorestframework_camel_case.render import CamelCaseJSONRenderer
+
+from shop.management.commands._bench import create_catalog
+from shop.management.commands._bench import measure
+from shop.management.commands._bench import rollback
+from shop.models import Product
+from shop.renderers import CamelCaseORJSONRenderer
+from shop.serializers import ProductSerializer
+
+
+class Command(BaseCommand):
+    help = "Бенчмарк рендеринга JSON и сжатия ответа каталога"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with rollback():
+            create_catalog(options["products"])
+            products = Product.objects.filter(
+                title__startswith="Товар "
+            ).prefetch_related(
+                "images", "tags", "promotions", "promotion_products__promotion"
+            )
+            data = {"items": ProductSerializer(products, many=True).data}
+
+        renderers = (CamelCaseJSONRenderer(), CamelCaseORJSONRenderer())
+        outputs = [renderer.render(data) for renderer in renderers]
+        if json.loads(outputs[0]) != json.loads(outputs[1]):
+            msg = "Результаты рендереров отличаются"
+            raise CommandError(msg)
+
+        baseline = None
+        for renderer in renderers:
+            seconds = measure(lambda r=renderer: r.render(data), options["repeat"])
+            baseline = baseline or seconds
+            self.stdout.write(
+                f"{type(renderer).__name__:<26} {seconds * 1000:8.1f} мс  "
+                f"x{baseline / seconds:.1f}"
+            )
+
+        content = outputs[1]
+        quality = settings.COMPRESSION_BROTLI_QUALITY
+        sizes = {
+            "без сжатия": (len(content), 0),
+            "gzip": (
+                len(compress_string(content)),
+                measure(lambda: compress_string(content), options["repeat"]),
+            ),
+            f"brotli q={quality}": (
+                len(brotli.compress(content, quality=quality)),
+                measure(
+                    lambda: brotli.compress(content, quality=quality),
+                    options["repeat"],
+                ),
+            ),
+        }
+        for name, (size, seconds) in sizes.items():
+            self.stdout.write(
+                f"{name:<26} {size / 1024:8.1f} КБ  {seconds * 1000:.1f} мс"
+            )
@@ -0,0 +1,55 @@
+"""
+Сравнение скорости ProductSerializer и быстрого ProductListSerializer.
+
+Пример:
+    python manage.py bench_serializers --products 1000 --repeat 5
+"""
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from shop.management.commands._bench import create_catalog
+from shop.management.commands._bench import measure
+from shop.management.commands._bench import rollback
+from shop.models import Product
+from shop.serializers import ProductListSerializer
+from shop.serializers import ProductSerializer
+
+
+class Command(BaseCommand):
+    help = "Бенчмарк сериализации списка товаров"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with rollback():
+            create_catalog(options["products"])
+            products = list(
+                Product.objects.filter(title__startswith="Товар ")
+                .select_related("category")
+                .prefetch_related(
+                    "images", "tags", "promotions", "promotion_products__promotion"
+                )
+            )
+
+            full = ProductSerializer(products, many=True).data
+            fast = ProductListSerializer(products, many=True).data
+            if [dict(item) for item in full] != fast:
+                msg = "Ответы ProductSerializer и ProductListSerializer отличаются"
+                raise CommandError(msg)
+
+            results = {
+                serializer.__name__: measure(
+                    lambda serializer=serializer: serializer(products, many=True).data,
+                    options["repeat"],
+                )
+                for serializer in (ProductSerializer, ProductListSerializer)
+            }
+
+        baseline = results["ProductSerializer"]
+        for name, seconds in results.items():
+            self.stdout.write(
+                f"{name:<24} {seconds * 1000:8.1f} мс  x{baseline / seconds:.1f}"
+            )
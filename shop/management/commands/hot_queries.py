@@ -0,0 +1,76 @@
+"""
+Отчет о самых частых и самых затратных комбинациях фильтров каталога.
+
+Числа запросов - по выборке доли HOT_QUERIES_SAMPLE_RATE, а не полные.
+
+Примеры:
+    python manage.py hot_queries
+    python manage.py hot_queries --order seconds --hours 24
+    python manage.py hot_queries --by shape
+    python manage.py hot_queries --urls > warm_urls.txt
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from shop.hotqueries import aggregate
+from shop.hotqueries import hot_urls
+from shop.hotqueries import shape
+from shop.hotqueries import top_queries
+
+
+class Command(BaseCommand):
+    help = "Ранжирует комбинации фильтров каталога по частоте и суммарному времени"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours", type=int, default=settings.HOT_QUERIES_WINDOW_HOURS
+        )
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument(
+            "--order",
+            choices=["count", "seconds"],
+            default="count",
+            help="count - по числу запросов, seconds - по суммарному времени",
+        )
+        parser.add_argument(
+            "--by",
+            choices=["combination", "shape"],
+            default="combination",
+            help="shape - группировать только по именам параметров (для индексов)",
+        )
+        parser.add_argument(
+            "--urls",
+            action="store_true",
+            help="Вывести адреса для warm_caches --urls вместо таблицы",
+        )
+
+    def handle(self, *args, **options):
+        if options["urls"]:
+            for url in hot_urls(options["limit"]):
+                self.stdout.write(url)
+            return
+
+        queries = top_queries(options["hours"], options["order"])
+        if options["by"] == "shape":
+            queries = sorted(
+                aggregate(
+                    (shape(query.combination), query.count, query.seconds, "")
+                    for query in queries
+                ).values(),
+                key=lambda query: getattr(query, options["order"]),
+                reverse=True,
+            )
+
+        self.stdout.write(
+            f"Выборка {settings.HOT_QUERIES_SAMPLE_RATE:.0%} запросов "
+            f"за {options['hours']} ч, комбинаций: {len(queries)}"
+        )
+        self.stdout.write(
+            f"{'Запросов':>9} {'Всего, с':>9} {'Среднее, мс':>12}  Параметры"
+        )
+        for query in queries[: options["limit"]]:
+            self.stdout.write(
+                f"{query.count:>9} {query.seconds:>9.2f} "
+                f"{query.average * 1000:>12.1f}  {query.combination or '-'}"
+            )
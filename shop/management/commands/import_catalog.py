@@ -0,0 +1,380 @@
+"""
+Массовый импорт каталога товаров из CSV или JSONL.
+
+Поддерживаемые поля записи:
+    article      - артикул товара (ключ для upsert, обязательное поле)
+    title        - название товара
+    category     - путь категории, например "Электроника/Телефоны"
+    price        - цена (пустое значение не меняет цену товара)
+    count        - количество на складе (как price)
+    description  - описание
+    tags         - теги (список в JSONL или строка через "|" в CSV)
+    images       - пути до изображений относительно MEDIA_ROOT (как tags)
+
+Примеры:
+    python manage.py import_catalog catalog.csv
+    python manage.py import_catalog catalog.jsonl --batch-size 5000
+"""
+
+import csv
+import json
+import time
+from collections import defaultdict
+from decimal import ROUND_HALF_UP
+from decimal import Decimal
+from decimal import InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.db.backends.base.operations import BaseDatabaseOperations
+
+from shop.cache import bump_version
+from shop.models import Category
+from shop.models import ImageProduct
+from shop.models import Product
+from shop.models import PromotionProduct
+from shop.models import Tag
+from shop.pricing import refresh_price_with_discount
+from shop.tasks import warm_caches
+
+DEFAULT_BATCH_SIZE = 2000
+LIST_SEPARATOR = "|"
+PRODUCT_UPDATE_FIELDS = [
+    "category",
+    "title",
+    "price",
+    "count",
+    "description",
+    "updated_at",
+]
+# Поля, которые можно не указывать: тогда они не перезаписываются
+OPTIONAL_FIELDS = ("price", "count")
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+# Диапазон PositiveSmallIntegerField как в PostgreSQL, SQLite его не проверяет
+_, MAX_COUNT = BaseDatabaseOperations.integer_field_ranges[
+    Product._meta.get_field("count").get_internal_type()  # noqa: SLF001
+]
+PRICE_FIELD = Product._meta.get_field("price")  # noqa: SLF001
+PRICE_STEP = Decimal(1).scaleb(-PRICE_FIELD.decimal_places)
+PRICE_LIMIT = Decimal(10) ** (PRICE_FIELD.max_digits - PRICE_FIELD.decimal_places)
+
+
+def split_list(value) -> list[str]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(LIST_SEPARATOR)
+    return [item.strip() for item in value if str(item).strip()]
+
+
+def is_blank(value) -> bool:
+    return value is None or not str(value).strip()
+
+
+def check_price(lineno: int, price: Decimal) -> Decimal:
+    """Цена, округленная до точности поля Product.price"""
+    if not price.is_finite() or price < 0:
+        msg = f"Строка {lineno}: некорректная цена"
+        raise CommandError(msg)
+    # min() не дает quantize выйти за точность контекста на больших числах
+    price = min(price, PRICE_LIMIT).quantize(PRICE_STEP, rounding=ROUND_HALF_UP)
+    if price >= PRICE_LIMIT:
+        msg = f"Строка {lineno}: цена должна быть меньше {PRICE_LIMIT}"
+        raise CommandError(msg)
+    return price
+
+
+def merge_records(records: list[dict]) -> list[dict]:
+    """
+    Последняя запись с одинаковым артикулом в пачке побеждает,
+    пропущенные в ней цена и количество берутся из предыдущих
+    """
+    merged: dict[str, dict] = {}
+    for record in records:
+        previous = merged.get(record["article"])
+        if previous is not None:
+            for field in OPTIONAL_FIELDS:
+                if record[field] is None:
+                    record[field] = previous[field]
+        merged[record["article"]] = record
+    return list(merged.values())
+
+
+class CategoryResolver:
+    """
+    Сопоставляет пути категорий с деревом MPTT в памяти.
+    Недостающие категории создаются пачками по уровням вложенности,
+    поля дерева пересчитываются один раз через rebuild() в конце импорта.
+    """
+
+    def __init__(self, separator: str):
+        self.separator = separator
+        self.created = 0
+        self.paths: dict[tuple[str, ...], int] = {}
+
+        nodes = {
+            node["id"]: node
+            for node in Category.objects.values("id", "title", "parent_id")
+        }
+        for node_id in nodes:
+            path = []
+            current = nodes.get(node_id)
+            while current is not None:
+                path.append(current["title"])
+                current = nodes.get(current["parent_id"])
+            self.paths.setdefault(tuple(reversed(path)), node_id)
+
+    def normalize(self, raw_path: str) -> tuple[str, ...]:
+        return tuple(
+            part.strip() for part in raw_path.split(self.separator) if part.strip()
+        )
+
+    def resolve(self, raw_paths) -> None:
+        missing = set()
+        for raw_path in raw_paths:
+            path = self.normalize(raw_path)
+            for depth in range(1, len(path) + 1):
+                if path[:depth] not in self.paths:
+                    missing.add(path[:depth])
+
+        for depth in sorted({len(path) for path in missing}):
+            level = sorted(path for path in missing if len(path) == depth)
+            created = Category.objects.bulk_create(
+                [
+                    Category(
+                        title=path[-1],
+                        parent_id=self.paths.get(path[:-1]),
+                        lft=0,
+                        rght=0,
+                        tree_id=0,
+                        level=0,
+                    )
+                    for path in level
+                ]
+            )
+            for path, category in zip(level, created, strict=True):
+                self.paths[path] = category.id
+            self.created += len(created)
+
+    def __getitem__(self, raw_path: str) -> int:
+        return self.paths[self.normalize(raw_path)]
+
+
+class TagResolver:
+    """Кэш тегов по названию, недостающие теги создаются пачкой"""
+
+    def __init__(self):
+        self.created = 0
+        self.ids: dict[str, int] = {}
+        for tag_id, name in Tag.objects.values_list("id", "name").order_by("-id"):
+            self.ids[name] = tag_id
+
+    def resolve(self, names) -> None:
+        missing = sorted(set(names) - self.ids.keys())
+        if not missing:
+            return
+        created = Tag.objects.bulk_create([Tag(name=name) for name in missing])
+        for tag in created:
+            self.ids[tag.name] = tag.id
+        self.created += len(created)
+
+    def __getitem__(self, name: str) -> int:
+        return self.ids[name]
+
+
+class Command(BaseCommand):
+    help = "Массовый импорт товаров, категорий, тегов и изображений из CSV/JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=Path, help="Путь до файла с каталогом")
+        parser.add_argument(
+            "--format",
+            choices=sorted(set(FORMATS.values())),
+            help="Формат файла (по умолчанию определяется по расширению)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Размер пачки записей (по умолчанию {DEFAULT_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--category-separator",
+            default="/",
+            help='Разделитель уровней в пути категории (по умолчанию "/")',
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not path.exists():
+            msg = f"Файл {path} не найден"
+            raise CommandError(msg)
+
+        fmt = options["format"] or FORMATS.get(path.suffix.lower())
+        if fmt is None:
+            msg = "Не удалось определить формат файла, укажите --format"
+            raise CommandError(msg)
+
+        started = time.perf_counter()
+        total = 0
+        with transaction.atomic():
+            self.categories = CategoryResolver(options["category_separator"])
+            self.tags = TagResolver()
+
+            records = (self.parse_record(n, row) for n, row in self.read(path, fmt))
+            while batch := list(islice(records, options["batch_size"])):
+                self.import_batch(batch)
+                total += len(batch)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"Обработано записей: {total}")
+
+            if self.categories.created:
+                Category.objects.rebuild()
+
+            # bulk_create не отправляет сигналы, версии обновляются явно
+            transaction.on_commit(lambda: bump_version("categories", "products"))
+            transaction.on_commit(warm_caches.delay)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Импортировано товаров: {total}, "
+                f"новых категорий: {self.categories.created}, "
+                f"новых тегов: {self.tags.created} "
+                f"за {time.perf_counter() - started:.1f} с"
+            )
+        )
+
+    @staticmethod
+    def read(path: Path, fmt: str):
+        with path.open(encoding="utf-8-sig", newline="") as file:
+            if fmt == "csv":
+                yield from enumerate(csv.DictReader(file), start=2)
+                return
+            for lineno, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield lineno, json.loads(line)
+                except json.JSONDecodeError as exc:
+                    msg = f"Строка {lineno}: некорректный JSON ({exc})"
+                    raise CommandError(msg) from exc
+
+    @staticmethod
+    def parse_record(lineno: int, row: dict) -> dict:
+        article = str(row.get("article") or "").strip()
+        title = str(row.get("title") or "").strip()
+        category = str(row.get("category") or "").strip()
+        if not article or not title or not category:
+            msg = f"Строка {lineno}: поля article, title и category обязательны"
+            raise CommandError(msg)
+
+        # Пустые цена и количество не меняют сохраненные значения товара
+        price = row.get("price")
+        count = row.get("count")
+        try:
+            price = None if is_blank(price) else Decimal(str(price))
+            count = None if is_blank(count) else int(count)
+        except (InvalidOperation, ValueError) as exc:
+            msg = f"Строка {lineno}: некорректная цена или количество"
+            raise CommandError(msg) from exc
+        if count is not None and count < 0:
+            msg = f"Строка {lineno}: количество не может быть отрицательным"
+            raise CommandError(msg)
+        # Границы полей проверяются до вставки: иначе ошибка базы
+        # отменила бы весь импорт без указания строки
+        if count is not None and count > MAX_COUNT:
+            msg = f"Строка {lineno}: количество больше {MAX_COUNT}"
+            raise CommandError(msg)
+        if price is not None:
+            price = check_price(lineno, price)
+
+        return {
+            "article": article,
+            "title": title,
+            "category": category,
+            "price": price,
+            "count": count,
+            "description": str(row.get("description") or ""),
+            "tags": split_list(row.get("tags")),
+            "images": split_list(row.get("images")),
+        }
+
+    def import_batch(self, records: list[dict]) -> None:
+        records = merge_records(records)
+
+        self.categories.resolve(record["category"] for record in records)
+        self.tags.resolve(tag for record in records for tag in record["tags"])
+
+        # Незаданные поля не попадают в update_fields, поэтому записи
+        # группируются по набору заданных полей. Новые товары без цены
+        # и количества создаются с нулями
+        groups: dict[tuple[str, ...], list[dict]] = defaultdict(list)
+        for record in records:
+            missing = tuple(field for field in OPTIONAL_FIELDS if record[field] is None)
+            groups[missing].append(record)
+        products = []
+        for missing, group in groups.items():
+            products += Product.objects.bulk_create(
+                [
+                    Product(
+                        article=record["article"],
+                        category_id=self.categories[record["category"]],
+                        title=record["title"],
+                        price=record["price"] or 0,
+                        count=record["count"] or 0,
+                        description=record["description"],
+                    )
+                    for record in group
+                ],
+                update_conflicts=True,
+                unique_fields=["article"],
+                update_fields=[
+                    field for field in PRODUCT_UPDATE_FIELDS if field not in missing
+                ],
+            )
+        product_ids = {product.article: product.pk for product in products}
+        if None in product_ids.values():
+            # Бэкенд не вернул первичные ключи при upsert
+            product_ids = dict(
+                Product.objects.filter(article__in=product_ids).values_list(
+                    "article", "id"
+                )
+            )
+
+        refresh_price_with_discount(
+            PromotionProduct.objects.filter(product_id__in=product_ids.values())
+        )
+
+        tag_through = Tag.products.through
+        tag_through.objects.bulk_create(
+            [
+                tag_through(
+                    tag_id=self.tags[tag], product_id=product_ids[record["article"]]
+                )
+                for record in records
+                for tag in record["tags"]
+            ],
+            ignore_conflicts=True,
+        )
+
+        existing_images = set(
+            ImageProduct.objects.filter(
+                product_id__in=product_ids.values()
+            ).values_list("product_id", "src")
+        )
+        new_images = []
+        for record in records:
+            product_id = product_ids[record["article"]]
+            for src in record["images"]:
+                if (product_id, src) not in existing_images:
+                    existing_images.add((product_id, src))
+                    new_images.append(
+                        ImageProduct(
+                            product_id=product_id, src=src, alt=record["title"]
+                        )
+                    )
+        ImageProduct.objects.bulk_create(new_images)
@@ -0,0 +1,55 @@
+"""
+Профилирование работающих воркеров.
+
+Примеры:
+    python manage.py start_profiling --seconds 60
+    python manage.py start_profiling --token admin
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from shop.profiling import HEADER
+from shop.profiling import make_token
+from shop.profiling import start_worker_profiling
+
+
+class Command(BaseCommand):
+    help = "Включает профилирование воркеров или выдает токен для X-Shop-Profile"
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument(
+            "--seconds", type=int, help="Профилировать все воркеры N секунд"
+        )
+        group.add_argument(
+            "--token", metavar="USERNAME", help="Выдать токен сотруднику USERNAME"
+        )
+
+    def handle(self, *args, **options):
+        if not settings.PROFILING_ENABLED:
+            msg = "Профайлер отключен, включите PROFILING_ENABLED"
+            raise CommandError(msg)
+
+        if options["token"]:
+            user = (
+                get_user_model()
+                .objects.filter(username=options["token"], is_staff=True)
+                .first()
+            )
+            if user is None:
+                msg = f"Сотрудник {options['token']} не найден"
+                raise CommandError(msg)
+            self.stdout.write(f"{HEADER}: {make_token(user.pk)}")
+            return
+
+        seconds = min(options["seconds"], settings.PROFILING_MAX_SECONDS)
+        start_worker_profiling(seconds)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Профилирование включено на {seconds} с, "
+                f"профили сохраняются в {settings.PROFILING_DIR}"
+            )
+        )
@@ -0,0 +1,73 @@
+"""
+Прогрев кэшей каталога (ответы API и фрагменты страниц категорий).
+
+Запускается после деплоя из compose/production/django/start и задачей
+shop.tasks.warm_caches после импорта каталога.
+
+Примеры:
+    python manage.py warm_caches
+    python manage.py warm_caches --urls warm_urls.txt --workers 8
+    python manage.py warm_caches --access-log /var/log/nginx/access.log --top 100
+"""
+
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from shop.warming import default_urls
+from shop.warming import read_urls
+from shop.warming import top_urls
+from shop.warming import warm
+
+
+class Command(BaseCommand):
+    help = "Прогревает кэши каталога и выводит время ответов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--urls", type=Path, help="Файл с адресами, по одному на строку"
+        )
+        parser.add_argument(
+            "--access-log",
+            type=Path,
+            action="append",
+            default=[],
+            help="Журнал доступа для выбора самых частых запросов (можно повторять)",
+        )
+        parser.add_argument("--top", type=int, default=settings.CACHE_WARMING_TOP)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--host", default="", help="Хост для ссылок в ответах")
+
+    def handle(self, *args, **options):
+        for path in filter(None, [options["urls"], *options["access_log"]]):
+            if not path.exists():
+                msg = f"Файл {path} не найден"
+                raise CommandError(msg)
+
+        urls = read_urls(options["urls"]) if options["urls"] else default_urls()
+        for path in options["access_log"]:
+            with path.open(errors="replace") as log:
+                urls += top_urls(log, options["top"])
+
+        started = time.perf_counter()
+        results = warm(urls, workers=options["workers"], host=options["host"])
+        failed = 0
+        for result in results:
+            ok = result.status < 400  # noqa: PLR2004
+            failed += not ok
+            style = self.style.SUCCESS if ok else self.style.ERROR
+            self.stdout.write(
+                f"{style(str(result.status))} {result.seconds * 1000:8.1f} мс  "
+                f"{result.url}"
+            )
+
+        summary = (
+            f"Прогрето адресов: {len(results) - failed} из {len(results)} "
+            f"за {time.perf_counter() - started:.1f} с"
+        )
+        self.stdout.write(
+            self.style.ERROR(summary) if failed else self.style.SUCCESS(summary)
+        )
@@ -0,0 +1,58 @@
+import re
+
+import brotli
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+RE_ACCEPTS_BR = re.compile(r"\bbr\b")
+RE_ACCEPTS_GZIP = re.compile(r"\bgzip\b")
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответов API в brotli или gzip.
+
+    Сжимаются только ответы по адресам из COMPRESSION_URLS_REGEX размером
+    от COMPRESSION_MIN_SIZE байт. Сильный ETag становится слабым, так как
+    сжатое представление отличается от исходного побайтно.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.urls_regex = re.compile(settings.COMPRESSION_URLS_REGEX)
+        self.min_size = settings.COMPRESSION_MIN_SIZE
+        self.brotli_quality = settings.COMPRESSION_BROTLI_QUALITY
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if (
+            response.streaming
+            or response.has_header("Content-Encoding")
+            or len(response.content) < self.min_size
+            or not self.urls_regex.match(request.path_info)
+        ):
+            return response
+
+        patch_vary_headers(response, ["Accept-Encoding"])
+        accept_encoding = request.headers.get("accept-encoding", "")
+        if RE_ACCEPTS_BR.search(accept_encoding):
+            encoding = "br"
+            content = brotli.compress(response.content, quality=self.brotli_quality)
+        elif RE_ACCEPTS_GZIP.search(accept_encoding):
+            encoding = "gzip"
+            content = compress_string(response.content)
+        else:
+            return response
+
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response["Content-Length"] = str(len(content))
+        response["Content-Encoding"] = encoding
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0014_add_related_name_in_promotion_product'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='article',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='Артикул'),
+        ),
+    ]
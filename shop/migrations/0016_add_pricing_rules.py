@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:25
+
+import django.db.models.deletion
+from decimal import ROUND_HALF_UP
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def recompute_prices(apps, schema_editor):
+    """
+    Пересчитывает price_with_discount по правилам акции. Цены, введенные
+    вручную, отличить нельзя: прежний save() сохранял и цену без скидки
+    (до начала акции), и цену по старой цене товара. Перенос отличающихся
+    цен в price_override навсегда отменил бы скидку таких товаров,
+    поэтому ручные цены задаются заново через price_override.
+    """
+    PromotionProduct = apps.get_model('shop', 'PromotionProduct')
+    changed = []
+    for item in PromotionProduct.objects.select_related('product', 'promotion'):
+        price = item.product.price
+        if item.promotion.discount_percent:
+            price -= price * Decimal(item.promotion.discount_percent) / Decimal(100)
+        price = price.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        if item.price_with_discount != price:
+            item.price_with_discount = price
+            changed.append(item)
+    PromotionProduct.objects.bulk_update(changed, ['price_with_discount'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0015_add_article_to_product'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='promotion_product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_items', to='shop.promotionproduct', verbose_name='Товар в акции'),
+        ),
+        migrations.AddField(
+            model_name='promotion',
+            name='fixed_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Фиксированная цена'),
+        ),
+        migrations.AddField(
+            model_name='promotion',
+            name='is_stackable',
+            field=models.BooleanField(default=False, verbose_name='Суммируется с другими акциями'),
+        ),
+        migrations.AddField(
+            model_name='promotionproduct',
+            name='price_override',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Цена в акции (задана вручную)'),
+        ),
+        migrations.RunPython(recompute_prices, migrations.RunPython.noop),
+    ]
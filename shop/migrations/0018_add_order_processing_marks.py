@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0017_add_product_and_promotion_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='notified_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Отправлено уведомление'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Обработан'),
+        ),
+    ]
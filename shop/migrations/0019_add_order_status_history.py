@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0018_add_order_processing_marks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('оформлен', 'Created'), ('оплачен', 'Paid'), ('завершен', 'Completed'), ('отменен', 'Cancelled')], max_length=16, verbose_name='Предыдущий статус')),
+                ('to_status', models.CharField(choices=[('оформлен', 'Created'), ('оплачен', 'Paid'), ('завершен', 'Completed'), ('отменен', 'Cancelled')], max_length=16, verbose_name='Новый статус')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Изменено')),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Изменил')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_history', to='shop.order', verbose_name='Заказ')),
+            ],
+            options={
+                'verbose_name': 'Смена статуса заказа',
+                'verbose_name_plural': 'История статусов заказов',
+                'ordering': ('changed_at', 'id'),
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Обычное поле нельзя изменить на GeneratedField, поэтому available
+    # пересоздается вместе с индексами, которые на него ссылаются
+
+    dependencies = [
+        ('shop', '0020_add_order_status_created_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_cat_avail_price_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_avail_price_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_avail_title_idx',
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='available',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='available',
+            field=models.GeneratedField(db_persist=True, expression=models.Q(('count__gt', 0)), output_field=models.BooleanField(), verbose_name='Доступно к продаже'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'available', 'price'], name='product_cat_avail_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('available', True)), fields=['price'], name='product_avail_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('available', True)), fields=['title'], name='product_avail_title_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0021_generate_product_available'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='promotionproduct',
+            index=models.Index(fields=['promotion', 'id'], name='promotion_product_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:19
+
+from django.db import migrations, models
+
+
+def fill_stock_taken(apps, schema_editor):
+    """
+    Для уже обработанных заказов сколько списано неизвестно, считается,
+    что списано все заказанное - как возвращала отмена до этой миграции
+    """
+    OrderItem = apps.get_model('shop', 'OrderItem')
+    OrderItem.objects.filter(order__processed_at__isnull=False).update(
+        stock_taken=models.F('count')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0022_add_promotion_product_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='stock_taken',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Списано со склада'),
+        ),
+        migrations.RunPython(fill_stock_taken, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,7 @@ from decimal import Decimal
 
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db import transaction
 from django.db.models.query import QuerySet
 from django.utils import timezone
 from mptt.models import MPTTModel
@@ -151,6 +152,15 @@ class Product(IDMixin, TimestampMixin, ShortDescriptionMixin, models.Model):
         on_delete=models.CASCADE,
         related_name="products",
         verbose_name="Категория",
+        # Поиск по категории покрывает составной индекс product_cat_avail_price_idx
+        db_index=False,
+    )
+    article = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name="Артикул",
     )
     price = models.DecimalField(
         blank=True,
@@ -172,8 +182,11 @@ class Product(IDMixin, TimestampMixin, ShortDescriptionMixin, models.Model):
         blank=True,
         verbose_name="Описание",
     )
-    available = models.BooleanField(
-        default=True,
+    # Вычисляется БД при любом изменении count, в том числе через update()
+    available = models.GeneratedField(
+        expression=models.Q(count__gt=0),
+        output_field=models.BooleanField(),
+        db_persist=True,
         verbose_name="Доступно к продаже",
     )
     quantity_sold = models.SmallIntegerField(
@@ -185,28 +198,43 @@ class Product(IDMixin, TimestampMixin, ShortDescriptionMixin, models.Model):
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
         ordering = ["title"]
+        indexes = [
+            # Каталог категории с фильтрами available и диапазоном цены
+            models.Index(
+                fields=["category", "available", "price"],
+                name="product_cat_avail_price_idx",
+            ),
+            # Витрина: только доступные товары по цене или по названию
+            models.Index(
+                fields=["price"],
+                condition=models.Q(available=True),
+                name="product_avail_price_idx",
+            ),
+            models.Index(
+                fields=["title"],
+                condition=models.Q(available=True),
+                name="product_avail_title_idx",
+            ),
+            # Сортировка по умолчанию
+            models.Index(fields=["title"], name="product_title_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.price} Руб."
 
     def save(self, *args, **kwargs):
-        self.available = self.count > 0
         super().save(*args, **kwargs)
+        # После UPDATE значение available перечитывается из БД при обращении
+        self.__dict__.pop("available", None)
 
     @property
     def get_price_with_promotions(self):
         """
         Возвращает цену с учётом активных акций.
         """
-        price = self.price
-        promotions = self.promotions.all()
-        if promotions:
-            prices_with_discount = [
-                promo.apply_price_with_discount(price)
-                for promo in self.promotions.all()
-            ]
-            price = min(prices_with_discount)
-        return price
+        from shop.pricing import PricingEngine  # noqa: PLC0415
+
+        return PricingEngine().quote(self).price
 
     def get_tags_list(self):
         if self.tags is not None:
@@ -272,6 +300,39 @@ class Tag(IDMixin, TimestampMixin, models.Model):
         return self.name
 
 
+# Остаток продаж по акции, если лимит не задан
+UNLIMITED_SALE = 999
+
+
+class PromotionProductQuerySet(models.QuerySet):
+    def listing(self):
+        """
+        Словари для списка товаров акции: поля товара, его первое изображение
+        с описанием и остаток продаж available_for_sale, посчитанный базой данных
+        """
+        first_image = ImageProduct.objects.filter(
+            product=models.OuterRef("product_id")
+        ).order_by("pk")
+        return self.values(
+            "id",
+            "product_id",
+            "price_with_discount",
+            title=models.F("product__title"),
+            price=models.F("product__price"),
+            available=models.F("product__available"),
+            image=models.Subquery(first_image.values("src")[:1]),
+            image_alt=models.Subquery(first_image.values("alt")[:1]),
+            available_for_sale=models.Case(
+                models.When(
+                    models.Q(limit__isnull=True) | models.Q(limit=0),
+                    then=models.Value(UNLIMITED_SALE),
+                ),
+                default=models.F("limit") - models.F("quantity_sold"),
+                output_field=models.IntegerField(),
+            ),
+        )
+
+
 class PromotionProduct(IDMixin, TimestampMixin, models.Model):
     promotion = models.ForeignKey(
         "Promotion",
@@ -295,6 +356,13 @@ class PromotionProduct(IDMixin, TimestampMixin, models.Model):
         default=0,
         verbose_name="Всего продано по акции",
     )
+    price_override = models.DecimalField(
+        verbose_name="Цена в акции (задана вручную)",
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+    )
     price_with_discount = models.DecimalField(
         verbose_name="Цена в акции",
         max_digits=10,
@@ -303,25 +371,32 @@ class PromotionProduct(IDMixin, TimestampMixin, models.Model):
         blank=True,
     )
 
+    objects = PromotionProductQuerySet.as_manager()
+
     class Meta:
         unique_together = ("promotion", "product")
         verbose_name = "Товар в акции"
         verbose_name_plural = "Товары в акции"
+        indexes = [
+            # Постраничный вывод товаров акции по ключу (shop.pagination)
+            models.Index(
+                fields=["promotion", "id"], name="promotion_product_keyset_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.product} в {self.promotion}"
 
     def save(self, *args, **kwargs):
-        if self.price_with_discount in [None, ""]:
-            self.price_with_discount = self.promotion.apply_price_with_discount(
-                self.product.price
-            )
+        from shop.pricing import line_price  # noqa: PLC0415
+
+        self.price_with_discount = line_price(self.product.price, self.promotion, self)
         super().save(*args, **kwargs)
 
     @property
     def available_for_sale(self):
         return (
-            999  # Продажа не ограничена
+            UNLIMITED_SALE
             if self.limit in [None, 0]
             else self.limit - self.quantity_sold
         )
@@ -347,6 +422,17 @@ class Promotion(IDMixin, TimestampMixin, ShortDescriptionMixin, models.Model):
         null=True,
         blank=True,
     )
+    fixed_price = models.DecimalField(
+        verbose_name="Фиксированная цена",
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+    )
+    is_stackable = models.BooleanField(
+        "Суммируется с другими акциями",
+        default=False,
+    )
     start_date = models.DateTimeField(verbose_name="Дата начала")
     end_date = models.DateTimeField(verbose_name="Дата окончания")
     is_active = models.BooleanField("Активна", default=True)
@@ -356,6 +442,13 @@ class Promotion(IDMixin, TimestampMixin, ShortDescriptionMixin, models.Model):
     class Meta:
         verbose_name = "Акция"
         verbose_name_plural = "Акции"
+        indexes = [
+            # Выборка активных акций в PromotionQuerySet.active()
+            models.Index(
+                fields=["is_active", "start_date", "end_date"],
+                name="promotion_active_dates_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -368,12 +461,11 @@ class Promotion(IDMixin, TimestampMixin, ShortDescriptionMixin, models.Model):
         """
         Возвращает цену со скидкой, если акция активна и условия выполнены.
         """
+        from shop.pricing import line_price  # noqa: PLC0415
+
         if not self.is_valid():
             return price
-        if self.discount_percent:
-            discount = (price * Decimal(self.discount_percent)) / Decimal(100)
-            return price - discount
-        return price
+        return line_price(price, self)
 
 
 class Basket(IDMixin, TimestampMixin, models.Model, TotalCostMixin):
@@ -441,6 +533,78 @@ class OrderStatus(models.TextChoices):
     CANCELLED = "отменен"
 
 
+# Допустимые переходы между статусами заказа
+ORDER_TRANSITIONS = {
+    OrderStatus.CREATED: {OrderStatus.PAID, OrderStatus.CANCELLED},
+    OrderStatus.PAID: {OrderStatus.COMPLETED, OrderStatus.CANCELLED},
+    OrderStatus.COMPLETED: set(),
+    OrderStatus.CANCELLED: set(),
+}
+
+
+class InvalidTransitionError(ValueError):
+    pass
+
+
+def transition_sources(status: OrderStatus) -> list[OrderStatus]:
+    """Статусы, из которых разрешен переход в status"""
+    return [
+        source for source, targets in ORDER_TRANSITIONS.items() if status in targets
+    ]
+
+
+class OrderQuerySet(models.QuerySet):
+    def transition(self, status: OrderStatus, user=None) -> int:
+        """
+        Переводит заказы выборки в status одним UPDATE и записывает историю.
+        Заказы, для которых переход недопустим, пропускаются.
+        Возвращает число измененных заказов.
+        """
+        sources = transition_sources(status)
+        with transaction.atomic(using=self.db):
+            # Блокировка строк гарантирует, что UPDATE изменит ровно эти заказы
+            changed = list(
+                self.filter(status__in=sources)
+                .select_for_update()
+                .values_list("id", "status", "processed_at")
+                .order_by()
+            )
+            if not changed:
+                return 0
+            now = timezone.now()
+            # Только заблокированные заказы: повтор подзапроса захватил бы
+            # и заказы, подошедшие под условие после блокировки, без истории
+            self.model.objects.filter(
+                id__in=[order_id for order_id, _, _ in changed],
+                status__in=sources,
+            ).update(status=status, updated_at=now)
+            OrderStatusHistory.objects.bulk_create(
+                [
+                    OrderStatusHistory(
+                        order_id=order_id,
+                        from_status=source,
+                        to_status=status,
+                        changed_by=user,
+                        changed_at=now,
+                    )
+                    for order_id, source, _ in changed
+                ],
+                batch_size=1000,
+            )
+            if status == OrderStatus.CANCELLED:
+                from shop.stock import restock_orders  # noqa: PLC0415
+
+                # Остатки списаны только у обработанных заказов
+                restock_orders(
+                    [order_id for order_id, _, processed_at in changed if processed_at]
+                )
+        return len(changed)
+
+    def cancel(self, user=None) -> int:
+        """Отменяет заказы выборки с возвратом остатков на склад"""
+        return self.transition(OrderStatus.CANCELLED, user=user)
+
+
 class Order(IDMixin, TimestampMixin, models.Model, TotalCostMixin):
     user = models.ForeignKey(
         User,
@@ -455,26 +619,55 @@ class Order(IDMixin, TimestampMixin, models.Model, TotalCostMixin):
         default=OrderStatus.CREATED,
         verbose_name="Статус заказа",
     )
+    processed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Обработан",
+    )
+    notified_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Отправлено уведомление",
+    )
+
+    objects = OrderQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
+        indexes = [
+            # Поиск неоплаченных заказов с истекшим сроком
+            models.Index(
+                fields=["status", "created_at"], name="order_status_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"Пользователь {self.user} / Заказ ID - {self.id} "
 
-    def set_status(self, status: OrderStatus) -> None:
+    def can_transition(self, status: OrderStatus) -> bool:
+        return status in ORDER_TRANSITIONS[self.status]
+
+    def set_status(self, status: OrderStatus, user=None) -> None:
+        if not self.can_transition(status):
+            msg = f"Недопустимый переход заказа из «{self.status}» в «{status}»"
+            raise InvalidTransitionError(msg)
+        # Переход применяется только если статус не изменился параллельно
+        if not Order.objects.filter(pk=self.pk, status=self.status).transition(
+            status, user=user
+        ):
+            msg = f"Статус заказа {self.pk} изменился, обновите страницу"
+            raise InvalidTransitionError(msg)
         self.status = status
-        self.save()
 
-    def mark_paid(self):
-        self.set_status(OrderStatus.PAID)
+    def mark_paid(self, user=None):
+        self.set_status(OrderStatus.PAID, user=user)
 
-    def mark_completed(self):
-        self.set_status(OrderStatus.COMPLETED)
+    def mark_completed(self, user=None):
+        self.set_status(OrderStatus.COMPLETED, user=user)
 
-    def mark_cancelled(self):
-        self.set_status(OrderStatus.CANCELLED)
+    def mark_cancelled(self, user=None):
+        self.set_status(OrderStatus.CANCELLED, user=user)
 
 
 class OrderItem(IDMixin, TimestampMixin, models.Model, TotalPriceMixin):
@@ -494,6 +687,11 @@ class OrderItem(IDMixin, TimestampMixin, models.Model, TotalPriceMixin):
         default=1,
         verbose_name="Количество",
     )
+    # Списано со склада при обработке, не больше остатка; возвращается при отмене
+    stock_taken = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Списано со склада",
+    )
     price = models.DecimalField(
         max_digits=10,
         decimal_places=2,
@@ -501,6 +699,14 @@ class OrderItem(IDMixin, TimestampMixin, models.Model, TotalPriceMixin):
         null=False,
         verbose_name="Цена",
     )
+    promotion_product = models.ForeignKey(
+        PromotionProduct,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="order_items",
+        verbose_name="Товар в акции",
+    )
 
     class Meta:
         unique_together = ("order", "product")
@@ -514,3 +720,41 @@ class OrderItem(IDMixin, TimestampMixin, models.Model, TotalPriceMixin):
         if self.price in [None, ""]:
             self.price = self.product.get_price_with_promotions
         super().save(*args, **kwargs)
+
+
+class OrderStatusHistory(models.Model):
+    """История смены статусов заказа, записывается OrderQuerySet.transition()"""
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name="status_history",
+        verbose_name="Заказ",
+    )
+    from_status = models.CharField(
+        max_length=16,
+        choices=OrderStatus,
+        verbose_name="Предыдущий статус",
+    )
+    to_status = models.CharField(
+        max_length=16,
+        choices=OrderStatus,
+        verbose_name="Новый статус",
+    )
+    changed_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Изменил",
+    )
+    changed_at = models.DateTimeField(default=timezone.now, verbose_name="Изменено")
+
+    class Meta:
+        ordering = ("changed_at", "id")
+        verbose_name = "Смена статуса заказа"
+        verbose_name_plural = "История статусов заказов"
+
+    def __str__(self):
+        return f"Заказ {self.order_id}: {self.from_status} → {self.to_status}"
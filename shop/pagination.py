@@ -0,0 +1,89 @@
+"""
+Постраничный вывод по ключу (keyset) для длинных списков.
+
+Страница выбирается условием по возрастающему ключу вместо OFFSET,
+а общее число строк не считается, поэтому любая страница обходится так же
+дешево, как первая. Соседние страницы открываются параметрами запроса
+after (строки после ключа) и before (строки до ключа); номеров страниц нет.
+
+Ключи в ссылках подписаны (next_cursor, previous_cursor), и parse_key
+принимает только выданные сервером значения: иначе произвольные ключи
+создавали бы неограниченное число записей в кэше страниц.
+"""
+
+from typing import NamedTuple
+
+from django.core.signing import BadSignature
+from django.core.signing import Signer
+from django.db.models import QuerySet
+
+signer = Signer(salt="shop.pagination")
+
+
+def sign_key(key: int | None) -> str | None:
+    return None if key is None else signer.sign(str(key))
+
+
+def parse_key(value: str | None) -> int | None:
+    """Ключ из параметра запроса, ValueError - если подпись неверна"""
+    if not value:
+        return None
+    try:
+        return int(signer.unsign(value))
+    except BadSignature as exc:
+        raise ValueError(value) from exc
+
+
+class KeysetPage(NamedTuple):
+    items: list[dict]
+    # Значение after для следующей страницы
+    next_key: int | None
+    # Значение before для предыдущей страницы
+    previous_key: int | None
+
+    @property
+    def has_other_pages(self) -> bool:
+        return self.next_key is not None or self.previous_key is not None
+
+    @property
+    def next_cursor(self) -> str | None:
+        return sign_key(self.next_key)
+
+    @property
+    def previous_cursor(self) -> str | None:
+        return sign_key(self.previous_key)
+
+
+def keyset_page(
+    queryset: QuerySet,
+    per_page: int,
+    after: int | None = None,
+    before: int | None = None,
+    key: str = "id",
+) -> KeysetPage:
+    """
+    Страница выборки queryset.values(), в которую входит поле key.
+    Если заданы оба параметра, используется after.
+    """
+    backwards = after is None and before is not None
+    if backwards:
+        queryset = queryset.filter(**{f"{key}__lt": before}).order_by(f"-{key}")
+    else:
+        if after is not None:
+            queryset = queryset.filter(**{f"{key}__gt": after})
+        queryset = queryset.order_by(key)
+
+    # Лишняя строка показывает, есть ли страница дальше в направлении выборки
+    rows = list(queryset[: per_page + 1])
+    more = len(rows) > per_page
+    items = rows[:per_page]
+    if backwards:
+        items.reverse()
+
+    first = items[0][key] if items else None
+    last = items[-1][key] if items else None
+    if backwards:
+        return KeysetPage(items, last, first if more else None)
+    return KeysetPage(
+        items, last if more else None, first if after is not None else None
+    )
@@ -0,0 +1,221 @@
+"""
+Расчет цен товаров с учетом акций.
+
+Активные акции компилируются в таблицу правил {id товара: [правила]}.
+Правило одного из видов:
+    override - цена товара в акции, заданная вручную (PromotionProduct.price_override)
+    fixed    - фиксированная цена по акции (Promotion.fixed_price)
+    percent  - скидка в процентах (Promotion.discount_percent)
+Правила с исчерпанным лимитом продаж в таблицу не попадают.
+
+Из несуммируемых правил выбирается самое выгодное, суммируемые правила
+применяются поверх него. Таблица для любого числа товаров строится одним
+запросом, после чего цены считаются за один проход без обращений к базе.
+"""
+
+from decimal import ROUND_HALF_UP
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.utils import timezone
+
+from shop.models import Product
+from shop.models import Promotion
+from shop.models import PromotionProduct
+
+CENTS = Decimal("0.01")
+HUNDRED = Decimal(100)
+ZERO = Decimal(0)
+
+OVERRIDE = "override"
+FIXED = "fixed"
+PERCENT = "percent"
+
+
+class Rule(NamedTuple):
+    promotion_product_id: int
+    kind: str
+    value: Decimal
+    stackable: bool
+
+    def apply(self, price: Decimal) -> Decimal:
+        if self.kind == PERCENT:
+            return price - price * self.value / HUNDRED
+        return min(price, self.value)
+
+
+class PriceQuote(NamedTuple):
+    price: Decimal
+    promotion_product_ids: tuple[int, ...] = ()
+
+    @property
+    def promotion_product_id(self) -> int | None:
+        """Основная акция, по которой продается товар"""
+        return self.promotion_product_ids[0] if self.promotion_product_ids else None
+
+
+def quantize(price: Decimal) -> Decimal:
+    return max(price, ZERO).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def make_rule(  # noqa: PLR0913
+    promotion_product_id: int,
+    price_override: Decimal | None,
+    limit: int | None,
+    quantity_sold: int,
+    fixed_price: Decimal | None,
+    discount_percent: int | None,
+    is_stackable: bool,  # noqa: FBT001
+) -> Rule | None:
+    if limit and quantity_sold >= limit:
+        return None
+    if price_override is not None:
+        return Rule(promotion_product_id, OVERRIDE, price_override, is_stackable)
+    if fixed_price is not None:
+        return Rule(promotion_product_id, FIXED, fixed_price, is_stackable)
+    if discount_percent:
+        return Rule(
+            promotion_product_id, PERCENT, Decimal(discount_percent), is_stackable
+        )
+    return None
+
+
+def line_price(
+    price: Decimal,
+    promotion: Promotion,
+    promotion_product: PromotionProduct | None = None,
+) -> Decimal:
+    """Цена товара по одной акции без учета ее срока действия и лимита"""
+    rule = make_rule(
+        promotion_product.id if promotion_product else 0,
+        promotion_product.price_override if promotion_product else None,
+        None,
+        0,
+        promotion.fixed_price,
+        promotion.discount_percent,
+        promotion.is_stackable,
+    )
+    return quantize(rule.apply(price) if rule else price)
+
+
+def evaluate(price: Decimal, rules: list[Rule]) -> PriceQuote:
+    best_price, best_id = price, None
+    for rule in rules:
+        if not rule.stackable:
+            candidate = rule.apply(price)
+            if candidate < best_price:
+                best_price, best_id = candidate, rule.promotion_product_id
+
+    applied = [best_id] if best_id is not None else []
+    # Фиксированные цены раньше процентных скидок, чтобы скидка не терялась
+    for rule in sorted(
+        (rule for rule in rules if rule.stackable), key=lambda r: r.kind == PERCENT
+    ):
+        candidate = rule.apply(best_price)
+        if candidate < best_price:
+            best_price = candidate
+            applied.append(rule.promotion_product_id)
+
+    return PriceQuote(quantize(best_price), tuple(applied))
+
+
+class PricingEngine:
+    """
+    Расчет цен на момент now. Для товаров с prefetch_related
+    ("promotion_products__promotion") правила берутся из загруженных данных,
+    для остальных - одним запросом на все товары.
+    """
+
+    def __init__(self, now=None):
+        self.now = now or timezone.now()
+
+    def is_valid(self, promotion: Promotion) -> bool:
+        return (
+            promotion.is_active
+            and promotion.start_date <= self.now <= promotion.end_date
+        )
+
+    def rules_for_lines(self, promotion_products) -> list[Rule]:
+        rules = []
+        for promotion_product in promotion_products:
+            promotion = promotion_product.promotion
+            if not self.is_valid(promotion):
+                continue
+            rule = make_rule(
+                promotion_product.id,
+                promotion_product.price_override,
+                promotion_product.limit,
+                promotion_product.quantity_sold,
+                promotion.fixed_price,
+                promotion.discount_percent,
+                promotion.is_stackable,
+            )
+            if rule is not None:
+                rules.append(rule)
+        return rules
+
+    def load_rules(self, product_ids) -> dict[int, list[Rule]]:
+        rows = PromotionProduct.objects.filter(
+            product_id__in=product_ids,
+            promotion__is_active=True,
+            promotion__start_date__lte=self.now,
+            promotion__end_date__gte=self.now,
+        ).values_list(
+            "product_id",
+            "id",
+            "price_override",
+            "limit",
+            "quantity_sold",
+            "promotion__fixed_price",
+            "promotion__discount_percent",
+            "promotion__is_stackable",
+        )
+        table: dict[int, list[Rule]] = {}
+        for product_id, *row in rows:
+            rule = make_rule(*row)
+            if rule is not None:
+                table.setdefault(product_id, []).append(rule)
+        return table
+
+    def quote_many(self, products) -> dict[int, PriceQuote]:
+        """Возвращает {id товара: PriceQuote}"""
+        products = list(products)
+        table: dict[int, list[Rule]] = {}
+        missing = []
+        for product in products:
+            prefetched = getattr(product, "_prefetched_objects_cache", {})
+            if "promotion_products" in prefetched:
+                table[product.pk] = self.rules_for_lines(
+                    prefetched["promotion_products"]
+                )
+            else:
+                missing.append(product.pk)
+        if missing:
+            table.update(self.load_rules(missing))
+
+        return {
+            product.pk: evaluate(product.price, table.get(product.pk, []))
+            for product in products
+        }
+
+    def quote(self, product: Product) -> PriceQuote:
+        return self.quote_many([product])[product.pk]
+
+
+def refresh_price_with_discount(queryset) -> int:
+    """
+    Пересчитывает сохраненные цены товаров в акциях после изменения
+    цены товара или условий акции. Возвращает число обновленных записей.
+    """
+    changed = []
+    for promotion_product in queryset.select_related("product", "promotion"):
+        price = line_price(
+            promotion_product.product.price,
+            promotion_product.promotion,
+            promotion_product,
+        )
+        if promotion_product.price_with_discount != price:
+            promotion_product.price_with_discount = price
+            changed.append(promotion_product)
+    PromotionProduct.objects.bulk_update(changed, ["price_with_discount"])
+    return len(changed)
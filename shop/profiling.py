@@ -0,0 +1,223 @@
+"""
+Семплирующий профайлер для работающих воркеров.
+
+Профайлер периодически снимает стеки потоков через sys._current_frames()
+и сохраняет их в PROFILING_DIR в свернутом формате (collapsed stacks),
+который понимают flamegraph.pl, speedscope и inferno.
+
+Включается только при PROFILING_ENABLED и двумя способами:
+    - для одного запроса: заголовок X-Shop-Profile с подписанным токеном,
+      токен выдается персоналу через ProfilingView или команду start_profiling;
+      для задачи Celery токен передается в заголовке задачи shop_profile;
+    - для всего воркера на N секунд: start_worker_profiling() записывает
+      срок в кэш, каждый процесс веб-сервера (WSGI и ASGI) и Celery
+      проверяет его не чаще раза в PROFILING_POLL_INTERVAL секунд.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from celery.signals import task_postrun
+from celery.signals import task_prerun
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+from django.utils.text import slugify
+
+HEADER = "X-Shop-Profile"
+TASK_HEADER = "shop_profile"
+TOKEN_SALT = "shop.profiling"  # noqa: S105
+UNTIL_KEY = "shop:profiling:until"
+SITE_PACKAGES = "site-packages" + os.sep
+
+_labels: dict = {}
+
+
+def frame_label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        if filename.startswith(str(settings.BASE_DIR)):
+            filename = os.path.relpath(filename, settings.BASE_DIR)
+        elif SITE_PACKAGES in filename:
+            filename = filename.rsplit(SITE_PACKAGES, 1)[1]
+        label = _labels[code] = f"{code.co_qualname} ({filename}:{code.co_firstlineno})"
+    return label
+
+
+def collapse(frame) -> str:
+    """Стек кадра в строку вида "внешняя;...;внутренняя" """
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class Sampler(threading.Thread):
+    """
+    Снимает стеки потоков thread_ids (или всех потоков процесса) до вызова
+    stop() или истечения duration секунд, затем сохраняет результат в файл.
+    """
+
+    def __init__(
+        self,
+        label: str,
+        thread_ids: set[int] | None = None,
+        duration: float | None = None,
+    ):
+        super().__init__(name="shop-profiler", daemon=True)
+        self.label = label
+        self.thread_ids = thread_ids
+        self.deadline = time.monotonic() + duration if duration else None
+        self.interval = settings.PROFILING_INTERVAL
+        self.stacks: Counter[str] = Counter()
+        self.stopped = threading.Event()
+        self.path: Path | None = None
+
+    def run(self):
+        # Первый снимок сразу, чтобы короткий запрос тоже попал в профиль
+        self.sample()
+        while not self.stopped.wait(self.interval):
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                break
+            self.sample()
+        self.path = self.dump()
+
+    def sample(self) -> None:
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():  # noqa: SLF001
+            if ident == own or (self.thread_ids and ident not in self.thread_ids):
+                continue
+            self.stacks[collapse(frame)] += 1
+
+    def stop(self) -> Path | None:
+        self.stopped.set()
+        self.join()
+        return self.path
+
+    def dump(self) -> Path | None:
+        if not self.stacks:
+            return None
+        directory = Path(settings.PROFILING_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        timestamp = timezone.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = directory / f"{timestamp}-{os.getpid()}-{slugify(self.label)}.folded"
+        path.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in self.stacks.items()),
+            encoding="utf-8",
+        )
+        return path
+
+
+def recent_profiles(limit: int = 20) -> list[Path]:
+    directory = Path(settings.PROFILING_DIR)
+    if not directory.exists():
+        return []
+    return sorted(directory.glob("*.folded"), reverse=True)[:limit]
+
+
+def make_token(user_id: int) -> str:
+    """Подписанный токен для заголовка X-Shop-Profile"""
+    return signing.dumps({"user": user_id}, salt=TOKEN_SALT)
+
+
+def check_token(token: str | None) -> bool:
+    if not token:
+        return False
+    try:
+        signing.loads(token, salt=TOKEN_SALT, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def start_worker_profiling(seconds: int) -> float:
+    """Включает профилирование всех воркеров на seconds секунд"""
+    until = time.time() + seconds
+    cache.set(UNTIL_KEY, until, seconds)
+    return until
+
+
+class WorkerProfiling:
+    """Профилирование процесса целиком по сроку из кэша"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked_at = 0.0
+        self.sampler: Sampler | None = None
+
+    def poll(self, label: str) -> None:
+        now = time.monotonic()
+        if now - self.checked_at < settings.PROFILING_POLL_INTERVAL:
+            return
+        with self.lock:
+            if now - self.checked_at < settings.PROFILING_POLL_INTERVAL:
+                return
+            self.checked_at = now
+            if self.sampler is not None and self.sampler.is_alive():
+                return
+            until = cache.get(UNTIL_KEY)
+            if until is None or until <= time.time():
+                return
+            self.sampler = Sampler(label, duration=until - time.time())
+            self.sampler.start()
+
+
+worker_profiling = WorkerProfiling()
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование запросов по заголовку X-Shop-Profile
+    и включение профилирования всего воркера.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        worker_profiling.poll("web")
+        if not check_token(request.headers.get(HEADER)):
+            return self.get_response(request)
+
+        sampler = Sampler(
+            f"request-{request.path_info}", thread_ids={threading.get_ident()}
+        )
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            path = sampler.stop()
+        if path is not None:
+            response[HEADER] = path.name
+        return response
+
+
+_task_samplers: dict[str, Sampler] = {}
+
+
+@task_prerun.connect
+def start_task_profiling(sender=None, task_id=None, task=None, **kwargs):
+    if not settings.PROFILING_ENABLED:
+        return
+    worker_profiling.poll("celery")
+    if check_token(task.request.get(TASK_HEADER)):
+        sampler = Sampler(f"task-{task.name}", thread_ids={threading.get_ident()})
+        _task_samplers[task_id] = sampler
+        sampler.start()
+
+
+@task_postrun.connect
+def stop_task_profiling(sender=None, task_id=None, **kwargs):
+    sampler = _task_samplers.pop(task_id, None)
+    if sampler is not None:
+        sampler.stop()
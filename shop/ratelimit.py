@@ -0,0 +1,169 @@
+"""
+Ограничение частоты запросов по алгоритму token bucket.
+
+Лимиты задаются в RATE_LIMITS по именам маршрутов (view_name из shop/urls.py):
+    RATE_LIMITS = {"shop:add_to_basket": (30, 60)}
+где 30 - емкость корзины токенов (допустимый всплеск запросов), а 60 - время
+в секундах, за которое пустая корзина заполняется полностью.
+
+Ключом служит пользователь, для анонимных - сессия или IP-адрес
+(за прокси - из X-Forwarded-For, см. client_ip). Состояние
+хранится в Redis (кэш django-redis) и обновляется атомарно Lua-скриптом.
+Если кэш не Redis или Redis недоступен, используется корзина в памяти процесса.
+"""
+
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+KEY = "shop:ratelimit:{}:{}"
+
+# KEYS[1] - ключ корзины; ARGV - емкость, скорость пополнения в токенах/с
+BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry_after)
+"""
+
+
+class LocalTokenBuckets:
+    """Корзины токенов в памяти процесса"""
+
+    # Полностью заполненные корзины удаляются, когда их становится больше
+    max_size = 10000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # ключ -> (токены, время обновления, время заполнения корзины)
+        self.buckets: dict[str, tuple[float, float, float]] = {}
+
+    def hit(self, key: str, capacity: int, rate: float) -> float:
+        now = time.monotonic()
+        with self.lock:
+            tokens, ts, _ = self.buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - ts) * rate)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rate
+            self.buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if len(self.buckets) > self.max_size:
+                self.buckets = {
+                    name: bucket
+                    for name, bucket in self.buckets.items()
+                    if bucket[2] > now
+                }
+        return retry_after
+
+    def clear(self) -> None:
+        with self.lock:
+            self.buckets.clear()
+
+
+local_buckets = LocalTokenBuckets()
+
+
+class RateLimiter:
+    def __init__(self):
+        try:
+            client = get_redis_connection("default")
+        except NotImplementedError:
+            # Кэш по умолчанию не django-redis
+            self.script = None
+        else:
+            self.script = client.register_script(BUCKET_SCRIPT)
+
+    def hit(self, key: str, capacity: int, period: float) -> float:
+        """
+        Забирает токен из корзины key.
+        Возвращает 0, если запрос разрешен, иначе - секунды до появления токена.
+        """
+        rate = capacity / period
+        if self.script is not None:
+            try:
+                return float(self.script(keys=[key], args=[capacity, rate]))
+            except RedisError:
+                pass
+        return local_buckets.hit(key, capacity, rate)
+
+
+def client_ip(request) -> str | None:
+    """
+    Адрес клиента с учетом RATE_LIMIT_PROXY_HOPS доверенных прокси.
+    Каждый прокси дописывает адрес своего собеседника в конец X-Forwarded-For,
+    поэтому адреса левее - от клиента и им верить нельзя.
+    """
+    hops = settings.RATE_LIMIT_PROXY_HOPS
+    if hops:
+        forwarded = [
+            address.strip()
+            for address in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")
+            if address.strip()
+        ]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.META.get("REMOTE_ADDR")
+
+
+def client_key(request) -> str:
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    if request.session.session_key:
+        return f"session:{request.session.session_key}"
+    return f"ip:{client_ip(request)}"
+
+
+class RateLimitMiddleware:
+    """
+    Возвращает 429 с заголовком Retry-After при превышении лимита маршрута.
+    Должен стоять после SessionMiddleware и AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        if not settings.RATE_LIMITS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.limits = settings.RATE_LIMITS
+        self.limiter = RateLimiter()
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_name = request.resolver_match.view_name
+        limit = self.limits.get(view_name)
+        if limit is None:
+            return None
+        capacity, period = limit
+        retry_after = self.limiter.hit(
+            KEY.format(view_name, client_key(request)), capacity, period
+        )
+        if not retry_after:
+            return None
+        response = JsonResponse(
+            {"success": False, "message": "Слишком много запросов, повторите позже"},
+            status=429,
+        )
+        response["Retry-After"] = str(math.ceil(retry_after))
+        return response
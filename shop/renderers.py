@@ -0,0 +1,119 @@
+import contextlib
+import decimal
+from functools import lru_cache
+
+import orjson
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from django.utils.http import parse_header_parameters
+from djangorestframework_camel_case.settings import api_settings
+from djangorestframework_camel_case.util import camelize
+from djangorestframework_camel_case.util import camelize_re
+from djangorestframework_camel_case.util import underscore_to_camel
+from djangorestframework_camel_case.util import underscoreize
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def orjson_default(obj):
+    """
+    Типы, которые orjson не сериализует сам.
+    Поведение совпадает с rest_framework.utils.encoders.JSONEncoder.
+    """
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, decimal.Decimal):
+        # Сериализаторы DRF по умолчанию сами приводят Decimal к строке
+        return float(obj)
+    if isinstance(obj, QuerySet):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, "__iter__"):
+        return list(obj)
+    raise TypeError
+
+
+@lru_cache(maxsize=2048)
+def camelize_key(key: str) -> str:
+    return camelize_re.sub(underscore_to_camel, key)
+
+
+def fast_camelize(data):
+    """
+    Быстрый аналог djangorestframework_camel_case.util.camelize без опций
+    ignore_fields/ignore_keys: ключи конвертируются один раз и кэшируются.
+    """
+    if isinstance(data, dict):
+        return {
+            (camelize_key(key) if isinstance(key, str) else key): fast_camelize(value)
+            for key, value in data.items()
+        }
+    if isinstance(data, list | tuple):
+        return [fast_camelize(item) for item in data]
+    if isinstance(data, Promise):
+        return force_str(data)
+    return data
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Рендерер JSON на orjson, совместимый по формату с JSONRenderer из DRF"""
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def get_indent(self, accepted_media_type, renderer_context) -> bool:
+        # orjson поддерживает только отступ в 2 пробела
+        if accepted_media_type:
+            _, params = parse_header_parameters(accepted_media_type)
+            with contextlib.suppress(KeyError, ValueError):
+                return int(params["indent"]) > 0
+        return bool(renderer_context.get("indent"))
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        options = ORJSON_OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+
+        content = orjson.dumps(data, default=orjson_default, option=options)
+        # Как и JSONRenderer, экранируем разделители строк для совместимости с JS
+        return content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+
+class CamelCaseORJSONRenderer(ORJSONRenderer):
+    def render(self, data, *args, **kwargs):
+        options = api_settings.JSON_UNDERSCOREIZE
+        if options.get("ignore_fields") or options.get("ignore_keys"):
+            data = camelize(data, **options)
+        else:
+            data = fast_camelize(data)
+        return super().render(data, *args, **kwargs)
+
+
+class ORJSONParser(BaseParser):
+    media_type = "application/json"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            msg = f"JSON parse error - {exc}"
+            raise ParseError(msg) from exc
+
+
+class CamelCaseORJSONParser(ORJSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        return underscoreize(
+            super().parse(stream, media_type, parser_context),
+            **api_settings.JSON_UNDERSCOREIZE,
+        )
@@ -1,8 +1,15 @@
+from decimal import ROUND_HALF_EVEN
+from decimal import Decimal
+from functools import cached_property
+
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from rest_framework import pagination
 from rest_framework import serializers
 from rest_framework.response import Response
 
+from shop.filters import camel_to_snake
+from shop.instrumentation import TimedListSerializer
 from shop.models import Basket
 from shop.models import BasketItem
 from shop.models import Category
@@ -14,8 +21,72 @@ from shop.models import Product
 from shop.models import Promotion
 from shop.models import PromotionProduct
 from shop.models import Tag
+from shop.pricing import PricingEngine
+from shop.pricing import evaluate
 
 User = get_user_model()
+CENTS = Decimal("0.01")
+
+
+def split_param(value: str | None) -> set[str]:
+    if not value:
+        return set()
+    return {camel_to_snake(item.strip()) for item in value.split(",") if item.strip()}
+
+
+def format_decimal(value: Decimal | None) -> str | None:
+    """Форматирует Decimal так же, как DecimalField(decimal_places=2) из DRF"""
+    if value is None:
+        return None
+    return f"{value.quantize(CENTS, rounding=ROUND_HALF_EVEN):f}"
+
+
+def format_datetime(value) -> str | None:
+    """Форматирует дату так же, как DateTimeField из DRF"""
+    if value is None:
+        return None
+    value = timezone.localtime(value).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+class SparseFieldsetMixin:
+    """
+    Выборка полей через параметры запроса:
+        ?fields=id,title,price - вернуть только перечисленные поля
+        ?expand=images,promotions - добавить к выборке вложенные поля
+    Без параметра fields сериализатор возвращает все поля. Параметры
+    относятся только к корневому сериализатору (или элементам корневого
+    списка): вложенные сериализаторы, например товар в позиции заказа,
+    всегда возвращают все поля.
+    """
+
+    fields_param = "fields"
+    expand_param = "expand"
+
+    @cached_property
+    def requested_fields(self) -> set[str] | None:
+        if self.parent is not None and self.parent is not self.root:
+            return None
+        request = self.context.get("request")
+        if request is None:
+            return None
+        params = getattr(request, "query_params", request.GET)
+        requested = split_param(params.get(self.fields_param))
+        if not requested:
+            return None
+        return requested | split_param(params.get(self.expand_param))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.requested_fields is None:
+            return fields
+        return {
+            name: field
+            for name, field in fields.items()
+            if name in self.requested_fields
+        }
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -57,6 +128,9 @@ class RecursiveCategorySerializer(serializers.Serializer):
     subcategories = serializers.SerializerMethodField(required=False)
     image = ImageCategorySerializer(read_only=True, required=False)
 
+    class Meta:
+        list_serializer_class = TimedListSerializer
+
     def get_subcategories(self, obj):
         serializer = RecursiveCategorySerializer(obj["subcategories"], many=True)
         return serializer.data
@@ -84,10 +158,13 @@ class PromotionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Promotion
+        list_serializer_class = TimedListSerializer
         fields = [
             "id",
             "title",
             "discount_percent",
+            "fixed_price",
+            "is_stackable",
             "description",
             "short_description",
             "start_date",
@@ -126,8 +203,8 @@ class PromotionProductSerializer(serializers.ModelSerializer):
         }
 
 
-class ProductSerializer(serializers.ModelSerializer):
-    available = serializers.BooleanField()
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    available = serializers.BooleanField(read_only=True)
     images = ImageProductSerializer(read_only=True, many=True)
     tags = TagSerializer(read_only=True, many=True)
     price_with_promotions = serializers.DecimalField(
@@ -142,6 +219,7 @@ class ProductSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Product
+        list_serializer_class = TimedListSerializer
         fields = [
             "id",
             "title",
@@ -158,6 +236,87 @@ class ProductSerializer(serializers.ModelSerializer):
         ]
 
 
+class ProductListSerializer(SparseFieldsetMixin, serializers.BaseSerializer):
+    """
+    Быстрая сериализация списка товаров в обход механизма полей DRF.
+    Возвращает тот же ответ, что и ProductSerializer, и ожидает queryset
+    с prefetch_related("images", "tags", "promotion_products__promotion").
+    """
+
+    class Meta:
+        list_serializer_class = TimedListSerializer
+
+    @cached_property
+    def pricing(self):
+        return PricingEngine()
+
+    def include(self, name: str) -> bool:
+        return self.requested_fields is None or name in self.requested_fields
+
+    def to_representation(self, instance):
+        price = instance.price
+        promotion_products = instance.promotion_products.all()
+        include_promotions = self.include("promotions")
+        promotions = []
+
+        for promotion_product in promotion_products if include_promotions else ():
+            promo = promotion_product.promotion
+            promotions.append(
+                {
+                    "id": promotion_product.id,
+                    "limit": promotion_product.limit,
+                    "quantity_sold": promotion_product.quantity_sold,
+                    "price_with_discount": format_decimal(
+                        promotion_product.price_with_discount
+                    ),
+                    "available_for_sale": bool(promotion_product.available_for_sale),
+                    "promotion": {
+                        "id": promo.id,
+                        "title": promo.title,
+                        "discount_percent": promo.discount_percent,
+                        "fixed_price": format_decimal(promo.fixed_price),
+                        "is_stackable": promo.is_stackable,
+                        "description": promo.description,
+                        "short_description": promo.get_short_description(),
+                        "start_date": format_datetime(promo.start_date),
+                        "end_date": format_datetime(promo.end_date),
+                        "is_active": promo.is_active,
+                        "is_valid": self.pricing.is_valid(promo),
+                    },
+                }
+            )
+
+        data = {
+            "id": instance.id,
+            "title": instance.title,
+            "price": format_decimal(price),
+            "count": instance.count,
+            "description": instance.description,
+            "short_description": instance.get_short_description(),
+            "available": instance.available,
+            "quantity_sold": instance.quantity_sold,
+        }
+        if self.include("price_with_promotions"):
+            data["price_with_promotions"] = format_decimal(
+                evaluate(price, self.pricing.rules_for_lines(promotion_products)).price
+            )
+        if self.include("images"):
+            data["images"] = [
+                {"src": image.src.url, "alt": image.alt}
+                for image in instance.images.all()
+            ]
+        if self.include("tags"):
+            data["tags"] = [
+                {"id": tag.id, "name": tag.name} for tag in instance.tags.all()
+            ]
+        if include_promotions:
+            data["promotions"] = promotions
+
+        if self.requested_fields is not None:
+            return {key: value for key, value in data.items() if self.include(key)}
+        return data
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
 
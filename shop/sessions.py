@@ -0,0 +1,175 @@
+"""
+Сессии с хранением в кэше (Redis) и записью в базу только для пользователей.
+
+Анонимные сессии живут только в кэше. Сессии пользователей дополнительно
+записываются в базу, чтобы вход переживал очистку кэша, но лишь когда
+меняются данные вне корзины (вход, смена пользователя) или когда копию
+в базе пора продлить. Поэтому изменения корзины к базе не обращаются;
+после потери кэша корзина пользователя восстанавливается из последней
+записанной копии.
+
+Подключение:
+    SESSION_ENGINE = "shop.sessions"
+    SESSION_SERIALIZER = "shop.sessions.SessionSerializer"
+"""
+
+import hashlib
+import logging
+import time
+
+import orjson
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.base import CreateError
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.utils import timezone
+
+logger = logging.getLogger("django.contrib.sessions")
+
+# Отметка о копии в базе: [ключ сессии, отпечаток данных вне корзины,
+# время записи]. Ключ нужен, потому что cycle_key() переносит данные
+# в сессию с новым ключом, для которого строки в базе еще нет
+PERSISTED_KEY = "_persisted"
+
+# Попыток подобрать свободный ключ новой сессии. Совпадение случайных
+# ключей практически невозможно, поэтому отказ означает недоступный кэш
+CREATE_ATTEMPTS = 10
+
+
+class SessionSerializer:
+    """
+    Компактная сериализация сессии: orjson вместо json, а корзина хранится
+    списком [id товара, количество, цена] вместо словаря словарей.
+    Читает и данные, записанные стандартным JSONSerializer.
+    """
+
+    def dumps(self, obj) -> bytes:
+        basket = obj.get(settings.BASKET_SESSION_ID)
+        if basket:
+            obj = {
+                **obj,
+                settings.BASKET_SESSION_ID: [
+                    [int(pid), item["count"], item["price"]]
+                    for pid, item in basket.items()
+                ],
+            }
+        return orjson.dumps(obj)
+
+    def loads(self, data: bytes):
+        obj = orjson.loads(data)
+        basket = obj.get(settings.BASKET_SESSION_ID)
+        if isinstance(basket, list):
+            obj[settings.BASKET_SESSION_ID] = {
+                str(pid): {"count": count, "price": price}
+                for pid, count, price in basket
+            }
+        return obj
+
+
+def durable_digest(session: dict) -> str:
+    """Отпечаток данных сессии без корзины и служебной отметки"""
+    durable = {
+        key: value
+        for key, value in session.items()
+        if key != PERSISTED_KEY and not key.startswith(settings.BASKET_SESSION_ID)
+    }
+    return hashlib.blake2b(
+        orjson.dumps(durable, option=orjson.OPT_SORT_KEYS), digest_size=16
+    ).hexdigest()
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = "shop:session:"
+
+    def load(self):
+        try:
+            data = self._cache.get(self.cache_key)
+        except Exception:  # noqa: BLE001
+            # Как в cached_db: некорректный ключ сбрасывает сессию
+            data = None
+        if data is not None:
+            return self.serializer().loads(data)
+
+        row = self._get_session_from_db()
+        if row is None:
+            return {}
+        session = self.decode(row.session_data)
+        # Строка в базе есть, но могла быть записана другим движком
+        session.setdefault(PERSISTED_KEY, [self.session_key, None, 0])
+        self._cache.set(
+            self.cache_key,
+            self.serializer().dumps(session),
+            self.get_expiry_age(expiry=row.expire_date),
+        )
+        return session
+
+    def exists(self, session_key):
+        # Коллизия нового ключа с сессией, которая есть только в базе,
+        # практически невозможна, а проверка по базе стоила бы запроса
+        return bool(session_key) and (self.cache_key_prefix + session_key) in (
+            self._cache
+        )
+
+    def needs_persist(self, session: dict) -> bool:
+        """Нужно ли записать сессию пользователя в базу"""
+        persisted = session.get(PERSISTED_KEY)
+        if persisted is None or persisted[0] != self.session_key:
+            return True
+        _, digest, persisted_at = persisted
+        # Копию в базе продлеваем заранее, чтобы ее не удалила очистка
+        return (
+            digest != durable_digest(session)
+            or time.time() - persisted_at > self.get_expiry_age() / 2
+        )
+
+    def create(self):
+        # DBStore.create повторяет попытки бесконечно, а cache.add() при
+        # недоступном Redis (IGNORE_EXCEPTIONS) всегда возвращает None
+        for _ in range(CREATE_ATTEMPTS):
+            self._session_key = self._get_new_session_key()
+            try:
+                self.save(must_create=True)
+            except CreateError:
+                continue
+            self.modified = True
+            return
+        msg = "Unable to create a new session key, the cache is likely unavailable"
+        raise RuntimeError(msg)
+
+    def save(self, must_create=False):  # noqa: FBT002
+        if self.session_key is None:
+            return self.create()
+        session = self._get_session(no_load=must_create)
+        if session.get(SESSION_KEY) and self.needs_persist(session):
+            persisted = session.get(PERSISTED_KEY)
+            row_exists = persisted is not None and persisted[0] == self.session_key
+            # Отметка пишется в обход __setitem__, сессия уже помечена измененной
+            session[PERSISTED_KEY] = [
+                self.session_key,
+                durable_digest(session),
+                int(time.time()),
+            ]
+            DBStore.save(self, must_create=must_create or not row_exists)
+            must_create = False
+
+        data = self.serializer().dumps(session)
+        if must_create:
+            if not self._cache.add(self.cache_key, data, self.get_expiry_age()):
+                raise CreateError
+            return None
+        try:
+            self._cache.set(self.cache_key, data, self.get_expiry_age())
+        except Exception:
+            logger.exception("Error saving to cache (%s)", self._cache)
+        return None
+
+    @classmethod
+    def clear_expired(cls) -> int:
+        """Удаляет просроченные сессии из базы, в кэше они истекают сами"""
+        deleted, _ = (
+            cls.get_model_class()
+            .objects.filter(expire_date__lt=timezone.now())
+            .delete()
+        )
+        return deleted
@@ -0,0 +1,55 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+
+from shop.cache import bump_version
+from shop.models import Category
+from shop.models import ImageCategory
+from shop.models import ImageProduct
+from shop.models import Product
+from shop.models import Promotion
+from shop.models import PromotionProduct
+from shop.models import Tag
+from shop.pricing import refresh_price_with_discount
+
+MODEL_RESOURCES = {
+    Category: ("categories", "products"),
+    ImageCategory: ("categories",),
+    Product: ("products",),
+    ImageProduct: ("products",),
+    Tag: ("products",),
+    Tag.products.through: ("products",),
+    Promotion: ("promotions", "products"),
+    PromotionProduct: ("promotions", "products"),
+}
+
+
+def bump_resources(sender, **kwargs):
+    """Увеличивает версии ресурсов после коммита транзакции"""
+    transaction.on_commit(partial(bump_version, *MODEL_RESOURCES[sender]))
+
+
+for model in MODEL_RESOURCES:
+    if model is Tag.products.through:
+        m2m_changed.connect(bump_resources, sender=model)
+    else:
+        post_save.connect(bump_resources, sender=model)
+        post_delete.connect(bump_resources, sender=model)
+
+
+def refresh_promotion_prices(sender, instance, update_fields=None, **kwargs):
+    """Пересчитывает цены в акциях при изменении цены товара или условий акции"""
+    if sender is Product:
+        if update_fields is not None and "price" not in update_fields:
+            return
+        queryset = PromotionProduct.objects.filter(product=instance)
+    else:
+        queryset = PromotionProduct.objects.filter(promotion=instance)
+    refresh_price_with_discount(queryset)
+
+
+post_save.connect(refresh_promotion_prices, sender=Product)
+post_save.connect(refresh_promotion_prices, sender=Promotion)
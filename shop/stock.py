@@ -0,0 +1,68 @@
+"""
+Возврат остатков отмененных заказов.
+
+Позиции всех заказов группируются по товарам и товарам в акциях, после чего
+для каждой таблицы выполняется один UPDATE с CASE по первичному ключу.
+Доступность товара (Product.available) пересчитывает сама БД.
+"""
+
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Case
+from django.db.models import F
+from django.db.models import IntegerField
+from django.db.models import Sum
+from django.db.models import Value
+from django.db.models import When
+from django.db.models.functions import Greatest
+
+from shop.cache import bump_version
+from shop.models import OrderItem
+from shop.models import Product
+from shop.models import PromotionProduct
+
+
+def grouped(totals: dict[int, int]) -> Case:
+    """CASE id WHEN ... THEN количество END для UPDATE по нескольким строкам"""
+    return Case(
+        *[When(pk=pk, then=Value(count)) for pk, count in totals.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def restock_orders(order_ids: list[int]) -> None:
+    """
+    Возвращает на склад позиции заказов order_ids и уменьшает счетчики продаж.
+    Вызывается из OrderQuerySet.transition() при отмене обработанных заказов.
+    """
+    if not order_ids:
+        return
+    items = OrderItem.objects.filter(order_id__in=order_ids).order_by()
+    # На склад возвращается списанное (stock_taken), продажи уменьшаются
+    # на заказанное количество
+    products = list(
+        items.values_list("product_id").annotate(
+            returned=Sum("stock_taken"), sold=Sum("count")
+        )
+    )
+    promotion_products = dict(
+        items.filter(promotion_product__isnull=False)
+        .values_list("promotion_product_id")
+        .annotate(total=Sum("count"))
+    )
+
+    if products:
+        returned = {pk: count for pk, count, _ in products}
+        sold = {pk: count for pk, _, count in products}
+        Product.objects.filter(pk__in=sold).update(
+            count=F("count") + grouped(returned),
+            quantity_sold=Greatest(F("quantity_sold") - grouped(sold), 0),
+        )
+    if promotion_products:
+        PromotionProduct.objects.filter(pk__in=promotion_products).update(
+            quantity_sold=Greatest(F("quantity_sold") - grouped(promotion_products), 0)
+        )
+    # update() не отправляет сигналы, версии каталога обновляются явно
+    transaction.on_commit(partial(bump_version, "products", "promotions"))
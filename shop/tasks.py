@@ -0,0 +1,166 @@
+"""
+Фоновая обработка заказов, отмена неоплаченных заказов и очистка сессий
+по расписанию, прогрев кэшей каталога.
+
+Задачи запускаются после коммита транзакции создания заказа и идемпотентны:
+повторный запуск для того же заказа (ретрай, повторная доставка сообщения
+брокером) ничего не меняет благодаря отметкам processed_at и notified_at.
+"""
+
+from datetime import timedelta
+from functools import partial
+from importlib import import_module
+from smtplib import SMTPException
+
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import OperationalError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from shop.cache import bump_version
+from shop.models import Order
+from shop.models import OrderItem
+from shop.models import OrderStatus
+from shop.models import Product
+from shop.models import PromotionProduct
+from shop.warming import default_urls
+from shop.warming import warm
+
+RETRY_POLICY = {
+    "retry_backoff": True,
+    "retry_backoff_max": 10 * 60,
+    "retry_jitter": True,
+    "max_retries": 5,
+}
+
+
+def dispatch_order_processing(order_id: int) -> None:
+    """Ставит обработку заказа в очередь после коммита текущей транзакции"""
+    transaction.on_commit(partial(process_order.delay, order_id))
+
+
+@shared_task(autoretry_for=(OperationalError,), acks_late=True, **RETRY_POLICY)
+def process_order(order_id: int) -> bool:
+    """
+    Списывает остатки товаров и увеличивает счетчики продаж.
+    Возвращает False, если заказ уже был обработан или отменен до обработки.
+    """
+    with transaction.atomic():
+        order = (
+            Order.objects.select_for_update()
+            .filter(pk=order_id, processed_at__isnull=True)
+            .exclude(status=OrderStatus.CANCELLED)
+            .first()
+        )
+        if order is None:
+            return False
+
+        items = list(order.items.all())
+        stock = dict(
+            Product.objects.select_for_update()
+            .filter(pk__in=[item.product_id for item in items])
+            .order_by("pk")
+            .values_list("pk", "count")
+        )
+        for item in items:
+            # Остаток не уходит в минус; при отмене вернется ровно списанное
+            item.stock_taken = min(item.count, stock[item.product_id])
+            Product.objects.filter(pk=item.product_id).update(
+                count=F("count") - item.stock_taken,
+                quantity_sold=F("quantity_sold") + item.count,
+            )
+            if item.promotion_product_id:
+                PromotionProduct.objects.filter(pk=item.promotion_product_id).update(
+                    quantity_sold=F("quantity_sold") + item.count
+                )
+        OrderItem.objects.bulk_update(items, ["stock_taken"])
+
+        order.processed_at = timezone.now()
+        order.save(update_fields=["processed_at"])
+
+        # update() не отправляет сигналы, версии каталога обновляются явно
+        transaction.on_commit(partial(bump_version, "products", "promotions"))
+        transaction.on_commit(partial(send_order_confirmation.delay, order_id))
+    return True
+
+
+@shared_task(autoretry_for=(SMTPException, OSError), **RETRY_POLICY)
+def send_order_confirmation(order_id: int) -> bool:
+    """Отправляет покупателю письмо о заказе один раз"""
+    with transaction.atomic():
+        order = (
+            Order.objects.select_for_update()
+            .select_related("user")
+            .filter(pk=order_id, notified_at__isnull=True)
+            .first()
+        )
+        if order is None:
+            return False
+        if order.user.email:
+            items = order.items.select_related("product")
+            lines = "\n".join(
+                f"{item.product.title} x {item.count} - {item.price} руб."
+                for item in items
+            )
+            send_mail(
+                subject=f"Заказ #{order.id} оформлен",
+                message=f"{lines}\n\nИтого: {order.total_cost()} руб.",
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                recipient_list=[order.user.email],
+            )
+        order.notified_at = timezone.now()
+        order.save(update_fields=["notified_at"])
+    return True
+
+
+@shared_task(autoretry_for=(OperationalError,), **RETRY_POLICY)
+def cancel_expired_orders() -> int:
+    """
+    Отменяет заказы, не оплаченные за ORDER_PAYMENT_TTL секунд, и возвращает
+    их остатки на склад. Заказы обрабатываются пачками в отдельных транзакциях;
+    строки, заблокированные другим воркером или обработкой заказа,
+    пропускаются (SKIP LOCKED) и будут отменены при следующем запуске.
+    Возвращает число отмененных заказов.
+    """
+    deadline = timezone.now() - timedelta(seconds=settings.ORDER_PAYMENT_TTL)
+    batch_size = settings.ORDER_SWEEP_BATCH_SIZE
+    cancelled = 0
+    for _ in range(settings.ORDER_SWEEP_MAX_BATCHES):
+        with transaction.atomic():
+            order_ids = list(
+                Order.objects.filter(
+                    status=OrderStatus.CREATED, created_at__lt=deadline
+                )
+                .select_for_update(skip_locked=True)
+                .order_by("created_at")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if order_ids:
+                cancelled += Order.objects.filter(pk__in=order_ids).cancel()
+        if len(order_ids) < batch_size:
+            break
+    return cancelled
+
+
+@shared_task(autoretry_for=(OperationalError,), **RETRY_POLICY)
+def clear_expired_sessions() -> int:
+    """
+    Удаляет просроченные сессии из хранилища SESSION_ENGINE, как команда
+    clearsessions. Возвращает число удаленных записей, если хранилище его
+    сообщает.
+    """
+    engine = import_module(settings.SESSION_ENGINE)
+    return engine.SessionStore.clear_expired() or 0
+
+
+@shared_task
+def warm_caches(urls: list[str] | None = None) -> int:
+    """
+    Прогревает кэши каталога, например после импорта.
+    Возвращает число адресов, ответивших без ошибки.
+    """
+    results = warm(urls or default_urls())
+    return sum(result.status < 400 for result in results)  # noqa: PLR2004
@@ -0,0 +1,40 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+from factory import Faker
+from factory import LazyFunction
+from factory import Sequence
+from factory import SubFactory
+from factory.django import DjangoModelFactory
+
+from shop.models import Category
+from shop.models import Product
+from shop.models import Promotion
+
+
+class CategoryFactory(DjangoModelFactory[Category]):
+    title = Sequence(lambda n: f"Категория {n}")
+
+    class Meta:
+        model = Category
+
+
+class ProductFactory(DjangoModelFactory[Product]):
+    category = SubFactory(CategoryFactory)
+    title = Sequence(lambda n: f"Товар {n}")
+    description = Faker("sentence")
+    price = Decimal("100.00")
+    count = 10
+
+    class Meta:
+        model = Product
+
+
+class PromotionFactory(DjangoModelFactory[Promotion]):
+    title = Sequence(lambda n: f"Акция {n}")
+    start_date = LazyFunction(lambda: timezone.now() - timedelta(days=1))
+    end_date = LazyFunction(lambda: timezone.now() + timedelta(days=1))
+
+    class Meta:
+        model = Promotion
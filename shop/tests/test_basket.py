@@ -0,0 +1,180 @@
+import json
+from decimal import Decimal
+
+import pytest
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache import cache
+from django.urls import reverse
+
+from shop.basket import SessionBasket
+from shop.cache import get_resource_state
+from shop.tests.factories import ProductFactory
+from shop.tests.factories import PromotionFactory
+from shop.views import UpdateBasketItemView
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def update_item(rf, user):
+    session = SessionStore()
+
+    def update_item(product_id, count):
+        request = rf.post(
+            reverse("shop:update_basket_item", args=[product_id]), {"count": count}
+        )
+        request.user, request.session = user, session
+        response = UpdateBasketItemView.as_view()(request, item_id=product_id)
+        return json.loads(response.content), SessionBasket(request)
+
+    return update_item
+
+
+def test_update_uses_cached_offer(update_item, django_assert_num_queries):
+    product = ProductFactory(price=Decimal("40.00"))
+    update_item(product.pk, 1)
+
+    with django_assert_num_queries(0):
+        data, basket = update_item(product.pk, 3)
+
+    assert data["total_price"] == "120.00"
+    assert (data["basket_count"], data["total_cost"]) == (3, "120.00")
+    assert basket.basket == {str(product.pk): {"count": 3, "price": "40.00"}}
+
+
+def test_update_to_zero_removes_item(update_item):
+    kept, removed = ProductFactory(price=Decimal("10.00")), ProductFactory()
+    update_item(kept.pk, 2)
+    update_item(removed.pk, 1)
+
+    data, basket = update_item(removed.pk, 0)
+
+    assert data["removed"] is True
+    assert str(removed.pk) not in basket.basket
+    assert (data["basket_count"], data["total_cost"]) == (2, "20.00")
+
+
+def test_totals_follow_mutations(rf):
+    request = rf.get("/")
+    request.session = SessionStore()
+    basket = SessionBasket(request)
+    first, second = ProductFactory(price=Decimal("9.99")), ProductFactory()
+
+    basket.add(first, count=2)
+    basket.add(second)
+    basket.add(first)
+    basket.remove(second.pk)
+    totals = (basket.totals["count"], basket.totals["total"])
+    basket.recount()
+
+    assert totals == (basket.totals["count"], basket.totals["total"])
+    assert (len(basket), basket.get_total_price()) == (3, Decimal("29.97"))
+
+
+def test_batch_applies_operations_with_one_lookup(
+    client, user, django_assert_num_queries
+):
+    client.force_login(user)
+    first, second, gone = (
+        ProductFactory(price=Decimal("5.00")),
+        ProductFactory(price=Decimal("7.50")),
+        ProductFactory(),
+    )
+    url = reverse("shop:basket_batch")
+    client.post(
+        url,
+        {"operations": [{"op": "add", "product_id": gone.pk}]},
+        content_type="application/json",
+    )
+    operations = [
+        {"op": "add", "product_id": first.pk, "count": 2},
+        {"op": "update", "product_id": second.pk, "count": 4},
+        {"op": "add", "product_id": first.pk},
+        {"op": "remove", "product_id": gone.pk},
+    ]
+
+    # Пользователь, товары, правила акций и SAVEPOINT/RELEASE ATOMIC_REQUESTS:
+    # сессия читается и записывается только в кэш
+    with django_assert_num_queries(5):
+        data = client.post(
+            url, {"operations": operations}, content_type="application/json"
+        ).json()
+
+    assert data["items"] == [
+        {"product_id": first.pk, "removed": False, "count": 3, "total_price": "15.00"},
+        {"product_id": second.pk, "removed": False, "count": 4, "total_price": "30.00"},
+        {"product_id": gone.pk, "removed": True, "count": 0, "total_price": "0"},
+    ]
+    assert (data["basket_count"], data["total_cost"]) == (7, "45.00")
+
+
+def test_batch_is_rejected_as_a_whole(client, user):
+    client.force_login(user)
+    product = ProductFactory(count=0)
+
+    response = client.post(
+        reverse("shop:basket_batch"),
+        {
+            "operations": [
+                {"op": "add", "product_id": ProductFactory().pk},
+                {"op": "add", "product_id": product.pk},
+            ]
+        },
+        content_type="application/json",
+    )
+
+    assert response.status_code == 400  # noqa: PLR2004
+    assert "недоступен" in response.json()["message"]
+    assert client.get(reverse("shop:basket")).context["basket"]["basket_count"] == 0
+
+
+def test_lines_drop_stale_items_and_use_promotions(rf, django_assert_num_queries):
+    request = rf.get("/")
+    request.session = SessionStore()
+    basket = SessionBasket(request)
+    product, deleted = ProductFactory(price=Decimal("100.00")), ProductFactory()
+    basket.add(product, count=2)
+    basket.add(deleted)
+    deleted.delete()
+    PromotionFactory(discount_percent=10).promotion_products.create(product=product)
+
+    get_resource_state("products", "promotions")
+
+    # Товары с категориями, изображения, правила акций
+    with django_assert_num_queries(3):
+        lines = basket.get_lines()
+    with django_assert_num_queries(0):
+        assert SessionBasket(request).get_lines() == lines
+
+    assert [(line.pk, line.price, line.total_price) for line in lines] == [
+        (product.pk, Decimal("90.00"), Decimal("180.00"))
+    ]
+    assert list(basket.basket) == [str(product.pk)]
+    assert (len(basket), basket.get_total_price()) == (2, Decimal("180.00"))
+
+
+def test_lines_keep_totals_consistent(rf):
+    request = rf.get("/")
+    request.session = SessionStore()
+    basket = SessionBasket(request)
+    product, deleted = ProductFactory(price=Decimal("100.00")), ProductFactory()
+    basket.add(product, count=3)
+    basket.add(deleted, count=2)
+    deleted.delete()
+    PromotionFactory(discount_percent=10).promotion_products.create(product=product)
+    version = basket.totals["version"]
+
+    basket.get_lines()
+    totals = (basket.totals["count"], basket.totals["total"])
+    basket.recount()
+
+    # Чтение корзины удалило строку и обновило цену, итоги совпадают с пересчетом
+    assert basket.totals["version"] != version
+    assert request.session.modified
+    assert totals == (basket.totals["count"], basket.totals["total"])
+    assert totals == (3, "270.00")
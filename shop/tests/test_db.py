@@ -0,0 +1,134 @@
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.urls import resolve
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from shop.cache import MODIFIED_KEY
+from shop.cache import VERSION_KEY
+from shop.cache import bump_version
+from shop.db import PIN_COOKIE
+from shop.db import ReplicaPinMiddleware
+from shop.db import atomic_databases
+from shop.db import read_from_replica
+from shop.models import Category
+from shop.models import Product
+from shop.tests.factories import ProductFactory
+
+pytestmark = pytest.mark.django_db(databases=["default", "replica"])
+
+
+@pytest.fixture(autouse=True)
+def _replica(settings):
+    settings.REPLICA_DATABASE = "replica"
+    settings.REPLICA_PIN_SECONDS = 60
+    # Ресурсы давно не менялись, иначе чтение закрепится за основной базой
+    cache.clear()
+    cache.set_many(
+        {
+            key.format(resource): 1
+            for resource in ("categories", "products", "promotions")
+            for key in (VERSION_KEY, MODIFIED_KEY)
+        },
+        None,
+    )
+
+
+@pytest.fixture
+def products():
+    """Разные товары в основной базе и в реплике"""
+    ProductFactory(title="primary-product")
+    product = ProductFactory.build(title="replica-product")
+    product.category.save(using="replica")
+    product.save(using="replica")
+
+
+def product_list(client) -> str:
+    return client.get(reverse("shop:product_list")).content.decode()
+
+
+def catalog_titles(client) -> list[str]:
+    response = client.get(reverse("shop:api_catalog"))
+    return [item["title"] for item in response.json()["items"]]
+
+
+@pytest.mark.usefixtures("products")
+def test_catalog_reads_from_replica(user):
+    client = APIClient()
+    client.force_authenticate(user)
+
+    assert catalog_titles(client) == ["replica-product"]
+
+
+@pytest.mark.usefixtures("products")
+def test_session_sticks_to_primary_after_write(client, user):
+    user.save(using="replica")
+    client.force_login(user)
+    assert "replica-product" in product_list(client)
+
+    response = client.post(reverse("shop:category_create"), {"title": "Новая"})
+
+    assert PIN_COOKIE in response.cookies
+    assert "primary-product" in product_list(client)
+
+
+@pytest.mark.usefixtures("products")
+def test_recently_modified_resources_are_read_from_primary(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    bump_version("products")
+
+    assert catalog_titles(client) == ["primary-product"]
+
+
+def test_objects_read_from_replica_are_saved_to_primary(rf):
+    product = ProductFactory(title="old")
+    # bulk_create копирует категорию без пересчета дерева MPTT
+    Category.objects.using("replica").bulk_create([product.category])
+    product.save(using="replica")
+
+    def view(request):
+        read_from_replica()
+        replica_product = Product.objects.get(pk=product.pk)
+        read_from = replica_product._state.db  # noqa: SLF001
+        replica_product.title = "new"
+        replica_product.save()
+        return HttpResponse(read_from)
+
+    response = ReplicaPinMiddleware(view)(rf.get("/"))
+
+    assert response.content == b"replica"
+    assert PIN_COOKIE in response.cookies
+    assert Product.objects.get(pk=product.pk).title == "new"
+    assert Product.objects.using("replica").get(pk=product.pk).title == "old"
+
+
+def test_read_only_views_skip_atomic_requests():
+    assert atomic_databases(resolve(reverse("shop:api_catalog")).func) == []
+    assert atomic_databases(resolve(reverse("shop:product_list")).func) == []
+    assert atomic_databases(resolve(reverse("shop:basket")).func) == []
+    assert atomic_databases(resolve(reverse("shop:order_list")).func) == []
+    assert atomic_databases(resolve(reverse("shop:order_detail", args=[1])).func) == []
+    assert atomic_databases(resolve(reverse("shop:category_create")).func) == [
+        "default"
+    ]
+
+
+def test_atomic_views_command():
+    stdout = StringIO()
+
+    call_command(
+        "atomic_views", "--namespace", "shop", stdout=stdout, stderr=StringIO()
+    )
+
+    names = [line.split()[2] for line in stdout.getvalue().splitlines()]
+    assert "shop:category_create" in names
+    assert "shop:create_order" not in names
+    assert "shop:order_list" not in names
+    assert "shop:order_detail" not in names
+    assert "shop:category_list" not in names
+    assert "shop:api_catalog" not in names
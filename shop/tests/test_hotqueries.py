@@ -0,0 +1,84 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.http import QueryDict
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from shop.hotqueries import get_store
+from shop.hotqueries import hot_urls
+from shop.hotqueries import normalize
+from shop.hotqueries import top_queries
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def api_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture(autouse=True)
+def _file_store(settings, tmp_path):
+    settings.HOT_QUERIES_DIR = tmp_path
+    settings.HOT_QUERIES_SAMPLE_RATE = 1
+    get_store.cache_clear()
+    yield
+    get_store.cache_clear()
+
+
+def test_normalize():
+    params = QueryDict(
+        "sort=price,title&sortType=des&minPrice=10&categoryId=3&page=2"
+        "&title=phone&unknown=1"
+    )
+
+    assert normalize(params) == "category_id=3&min_price=10&sort=-price,-title&title=*"
+
+
+def test_catalog_queries_are_ranked(api_client):
+    url = reverse("shop:api_catalog")
+    for query in [
+        "page=1&categoryId=1",
+        "categoryId=1",
+        "categoryId=1",
+        "minPrice=5",
+        "minPrice=5",
+        "title=x",
+    ]:
+        api_client.get(f"{url}?{query}")
+
+    queries = top_queries()
+
+    assert [(query.combination, query.count) for query in queries] == [
+        ("category_id=1", 3),
+        ("min_price=5", 2),
+        ("title=*", 1),
+    ]
+    assert queries[0].seconds > 0
+    assert hot_urls(10) == [f"{url}?categoryId=1", f"{url}?minPrice=5"]
+
+
+def test_nothing_is_recorded_without_sampling(api_client, settings):
+    settings.HOT_QUERIES_SAMPLE_RATE = 0
+    api_client.get(reverse("shop:api_catalog"), {"categoryId": 1})
+
+    assert top_queries() == []
+
+
+def test_report_groups_by_shape(api_client):
+    url = reverse("shop:api_catalog")
+    for query in ["categoryId=1", "categoryId=2", "minPrice=5"]:
+        api_client.get(f"{url}?{query}")
+    stdout = StringIO()
+
+    call_command("hot_queries", "--by", "shape", stdout=stdout)
+
+    rows = stdout.getvalue().splitlines()[2:]
+    assert [row.split()[0] + " " + row.split()[-1] for row in rows] == [
+        "2 category_id",
+        "1 min_price",
+    ]
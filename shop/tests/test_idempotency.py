@@ -0,0 +1,82 @@
+import json
+
+import pytest
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache import cache
+from django.urls import resolve
+from django.urls import reverse
+
+from shop.basket import SessionBasket
+from shop.db import atomic_databases
+from shop.idempotency import HEADER
+from shop.idempotency import PENDING
+from shop.idempotency import REPLAYED_HEADER
+from shop.idempotency import cache_key
+from shop.models import Order
+from shop.tests.factories import ProductFactory
+from shop.views import CreateOrderView
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def _eager_celery(settings):
+    settings.CELERY_TASK_ALWAYS_EAGER = True
+    cache.clear()
+
+
+@pytest.fixture
+def session():
+    return SessionStore()
+
+
+@pytest.fixture
+def create_order(rf, user, session):
+    def create_order(key=None, data=None):
+        headers = {HEADER: key} if key else {}
+        request = rf.post(reverse("shop:create_order"), data or {}, headers=headers)
+        request.user = user
+        request.session = session
+        return request, CreateOrderView.as_view()(request)
+
+    return create_order
+
+
+def test_repeated_key_replays_order(create_order, session, rf, user):
+    request = rf.get("/")
+    request.user, request.session = user, session
+    SessionBasket(request).add(ProductFactory(count=5), count=2)
+
+    _, first = create_order("checkout-1")
+    # Корзина уже очищена, но повтор не выполняет представление заново
+    _, second = create_order("checkout-1")
+
+    assert Order.objects.count() == 1
+    assert json.loads(first.content)["success"]
+    assert second.content == first.content
+    assert second[REPLAYED_HEADER] == "true"
+    assert REPLAYED_HEADER not in first
+
+
+def test_key_reused_with_other_body(create_order):
+    create_order("checkout-2", {"comment": "первый"})
+
+    _, response = create_order("checkout-2", {"comment": "второй"})
+
+    assert response.status_code == 422  # noqa: PLR2004
+
+
+def test_request_in_flight(create_order, settings):
+    settings.IDEMPOTENCY_WAIT_TIMEOUT = 0
+    request, _ = create_order()
+    cache.set(cache_key(request, "checkout-3"), {"state": PENDING, "fingerprint": ""})
+
+    _, response = create_order("checkout-3")
+
+    assert response.status_code == 409  # noqa: PLR2004
+    assert not Order.objects.exists()
+
+
+def test_order_view_runs_outside_atomic_requests():
+    # Иначе транзакция mixin - лишь точка сохранения, и ответ кэшируется до коммита
+    assert atomic_databases(resolve(reverse("shop:create_order")).func) == []
@@ -0,0 +1,99 @@
+import json
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from shop.models import Category
+from shop.models import ImageProduct
+from shop.models import Product
+from shop.tests.factories import CategoryFactory
+from shop.tests.factories import ProductFactory
+
+pytestmark = pytest.mark.django_db
+
+CSV_HEADER = "article,title,category,price,count,description,tags,images\n"
+
+
+def test_import_csv_creates_tree_and_products(tmp_path):
+    path = tmp_path / "catalog.csv"
+    path.write_text(
+        CSV_HEADER
+        + "A-1,Телефон,Электроника/Телефоны,100.50,3,Описание,new|hit,a.jpg\n"
+        + "A-2,Ноутбук,Электроника/Ноутбуки,200,0,,hit,\n",
+        encoding="utf-8",
+    )
+
+    call_command("import_catalog", str(path))
+
+    root = Category.objects.get(title="Электроника", parent=None)
+    assert sorted(c.title for c in root.get_children()) == ["Ноутбуки", "Телефоны"]
+    assert root.get_descendant_count() == 2  # noqa: PLR2004
+
+    phone = Product.objects.get(article="A-1")
+    assert phone.category.title == "Телефоны"
+    assert phone.price == Decimal("100.50")
+    assert phone.available
+    assert sorted(tag.name for tag in phone.tags.all()) == ["hit", "new"]
+    assert ImageProduct.objects.filter(product=phone, src="a.jpg").exists()
+    assert not Product.objects.get(article="A-2").available
+
+
+def test_import_jsonl_upserts_by_article(tmp_path):
+    category = CategoryFactory(title="Книги")
+    path = tmp_path / "catalog.jsonl"
+    rows = [
+        {"article": "B-1", "title": "Книга", "category": "Книги", "price": "10"},
+        {"article": "B-1", "title": "Книга 2", "category": "Книги", "count": 5},
+    ]
+    path.write_text("\n".join(json.dumps(row) for row in rows), encoding="utf-8")
+
+    call_command("import_catalog", str(path))
+    call_command("import_catalog", str(path))
+
+    product = Product.objects.get(article="B-1")
+    assert product.title == "Книга 2"
+    assert product.count == 5  # noqa: PLR2004
+    assert product.category == category
+    assert Category.objects.count() == 1
+
+
+def test_import_rejects_row_without_article(tmp_path):
+    path = tmp_path / "catalog.csv"
+    path.write_text(CSV_HEADER + ",Без артикула,Книги,1,1,,,\n", encoding="utf-8")
+
+    with pytest.raises(CommandError):
+        call_command("import_catalog", str(path))
+
+
+@pytest.mark.parametrize(
+    ("count", "price"), [("40000", "1"), ("1", "1000000"), ("1", "NaN")]
+)
+def test_import_rejects_out_of_range_row(tmp_path, count, price):
+    path = tmp_path / "catalog.csv"
+    path.write_text(
+        CSV_HEADER + f"A-1,Книга,Книги,1,1,,,\nA-2,Книга 2,Книги,{price},{count},,,\n",
+        encoding="utf-8",
+    )
+
+    with pytest.raises(CommandError, match="Строка 3"):
+        call_command("import_catalog", str(path))
+    assert not Product.objects.exists()
+
+
+def test_import_keeps_price_and_count_missing_from_row(tmp_path):
+    ProductFactory(article="C-1", price=Decimal("99.90"), count=7)
+    path = tmp_path / "catalog.csv"
+    path.write_text(
+        CSV_HEADER + "C-1,Новое название,Книги,,,,,\nC-2,Новинка,Книги,5,,,,\n",
+        encoding="utf-8",
+    )
+
+    call_command("import_catalog", str(path))
+
+    product = Product.objects.get(article="C-1")
+    assert product.title == "Новое название"
+    assert product.price == Decimal("99.90")
+    assert product.count == 7  # noqa: PLR2004
+    assert Product.objects.filter(article="C-2", price=5, count=0).exists()
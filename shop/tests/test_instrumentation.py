@@ -0,0 +1,108 @@
+from http import HTTPStatus
+
+import pytest
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from shop.instrumentation import export_pools
+from shop.instrumentation import registry
+from shop.tests.factories import ProductFactory
+
+pytestmark = pytest.mark.django_db
+
+
+TOKEN = "metrics-token"  # noqa: S105
+
+
+@pytest.fixture(autouse=True)
+def _token(settings):
+    settings.INSTRUMENTATION_TOKEN = TOKEN
+    settings.INSTRUMENTATION_SERVER_TIMING = True
+
+
+@pytest.fixture
+def client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {TOKEN}")
+    return client
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    registry.reset()
+    yield
+    registry.reset()
+
+
+def test_server_timing_header(client):
+    ProductFactory.create_batch(3)
+
+    response = client.get(reverse("shop:api_catalog"))
+
+    assert response.status_code == HTTPStatus.OK
+    timing = dict(
+        part.strip().split(";", 1) for part in response["Server-Timing"].split(",")
+    )
+    assert set(timing) == {"total", "db", "cache", "serializer", "template"}
+    assert "queries" in timing["db"]
+
+
+def test_metrics_are_exported_per_view(client):
+    # Ответ из кэша предыдущих тестов обошелся бы без SQL-запросов
+    cache.clear()
+    client.get(reverse("shop:api_catalog"))
+    client.get(reverse("shop:api_catalog"))
+
+    response = client.get(reverse("shop:metrics"))
+
+    assert response.status_code == HTTPStatus.OK
+    body = response.content.decode()
+    assert 'shop_view_duration_seconds_count{view="shop:api_catalog"} 2' in body
+    assert 'shop_view_sql_queries_total{view="shop:api_catalog"} 0' not in body
+    assert (
+        'shop_view_cache_requests_total{view="shop:api_catalog",result="hit"}' in body
+    )
+
+
+def test_metrics_are_forbidden_without_token(user):
+    client = APIClient()
+    client.force_authenticate(user)
+
+    response = client.get(reverse("shop:metrics"))
+    wrong = client.get(reverse("shop:metrics"), HTTP_AUTHORIZATION="Bearer x")
+
+    assert response.status_code == HTTPStatus.FORBIDDEN
+    assert wrong.status_code == HTTPStatus.FORBIDDEN
+    # Запрос с локального адреса прокси не получает доступ
+    assert "Server-Timing" not in response
+
+
+def test_connections_are_counted(client):
+    client.get(reverse("shop:api_catalog"))
+    connection = connections["default"]
+    connection_created.send(sender=type(connection), connection=connection)
+
+    body = client.get(reverse("shop:metrics")).content.decode()
+
+    assert 'shop_db_connects_total{database="default"} 1' in body
+
+
+class FakePool:
+    def get_stats(self):
+        return {"pool_size": 3, "requests_num": 7, "requests_wait_ms": 1500}
+
+
+def test_pool_stats_are_exported(monkeypatch):
+    assert export_pools() == ""
+    monkeypatch.setattr(connections["default"], "pool", FakePool(), raising=False)
+
+    body = export_pools()
+
+    assert 'shop_db_pool_size{database="default"} 3' in body
+    assert 'shop_db_pool_checkouts_total{database="default"} 7' in body
+    assert 'shop_db_pool_wait_seconds_total{database="default"} 1.5' in body
+    assert 'shop_db_pool_timeouts_total{database="default"} 0' in body
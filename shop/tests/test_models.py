@@ -0,0 +1,25 @@
+import pytest
+from django.db.models import F
+
+from shop.models import Product
+from shop.tests.factories import ProductFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def test_available_follows_bulk_updates():
+    product = ProductFactory(count=2)
+    assert product.available
+
+    Product.objects.filter(pk=product.pk).update(count=F("count") - 2)
+    assert not Product.objects.get(pk=product.pk).available
+    assert Product.objects.filter(available=True).count() == 0
+
+
+def test_available_reloaded_after_save():
+    product = ProductFactory(count=1)
+
+    product.count = 0
+    product.save(update_fields=["count"])
+
+    assert product.available is False
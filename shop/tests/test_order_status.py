@@ -0,0 +1,70 @@
+import pytest
+from django.urls import reverse
+
+from shop.models import InvalidTransitionError
+from shop.models import Order
+from shop.models import OrderStatus
+from shop.models import OrderStatusHistory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def orders(user):
+    return [Order.objects.create(user=user) for _ in range(3)]
+
+
+def test_bulk_transition_skips_illegal_moves(orders, user, django_assert_num_queries):
+    Order.objects.filter(pk=orders[0].pk).update(status=OrderStatus.COMPLETED)
+
+    # SELECT ... FOR UPDATE, UPDATE, INSERT истории, SAVEPOINT и RELEASE
+    with django_assert_num_queries(5):
+        changed = Order.objects.all().transition(OrderStatus.PAID, user=user)
+
+    assert changed == 2  # noqa: PLR2004
+    assert list(Order.objects.order_by("id").values_list("status", flat=True)) == [
+        OrderStatus.COMPLETED,
+        OrderStatus.PAID,
+        OrderStatus.PAID,
+    ]
+    assert set(
+        OrderStatusHistory.objects.values_list(
+            "order_id", "from_status", "to_status", "changed_by"
+        )
+    ) == {
+        (order.pk, OrderStatus.CREATED, OrderStatus.PAID, user.pk)
+        for order in orders[1:]
+    }
+
+
+def test_set_status_validates_transition(orders):
+    order = orders[0]
+    order.mark_paid()
+    order.mark_completed()
+
+    with pytest.raises(InvalidTransitionError):
+        order.mark_cancelled()
+    assert list(order.status_history.values_list("to_status", flat=True)) == [
+        OrderStatus.PAID,
+        OrderStatus.COMPLETED,
+    ]
+
+
+def test_set_status_on_stale_instance(orders):
+    stale = Order.objects.get(pk=orders[0].pk)
+    orders[0].mark_cancelled()
+
+    with pytest.raises(InvalidTransitionError):
+        stale.mark_paid()
+    assert Order.objects.get(pk=stale.pk).status == OrderStatus.CANCELLED
+
+
+def test_admin_action(admin_client, orders):
+    response = admin_client.post(
+        reverse("admin:shop_order_changelist"),
+        {"action": "mark_cancelled", "_selected_action": [o.pk for o in orders]},
+    )
+
+    assert response.status_code == 302  # noqa: PLR2004
+    assert not Order.objects.exclude(status=OrderStatus.CANCELLED).exists()
+    assert OrderStatusHistory.objects.count() == len(orders)
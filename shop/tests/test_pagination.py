@@ -0,0 +1,80 @@
+from decimal import Decimal
+from http import HTTPStatus
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from shop.models import ImageProduct
+from shop.models import PromotionProduct
+from shop.pagination import keyset_page
+from shop.tests.factories import ProductFactory
+from shop.tests.factories import PromotionFactory
+from shop.views import PromotionDetailView
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def promotion():
+    promotion = PromotionFactory(discount_percent=10)
+    for limit in [None, 3, 0, 5, 1]:
+        PromotionProduct.objects.create(
+            promotion=promotion, product=ProductFactory(), limit=limit
+        )
+    return promotion
+
+
+def test_pages_follow_keys_in_both_directions(promotion):
+    queryset = promotion.promotion_products.listing()
+    ids = list(queryset.order_by("id").values_list("id", flat=True))
+
+    first = keyset_page(queryset, 2)
+    second = keyset_page(queryset, 2, after=first.next_key)
+    last = keyset_page(queryset, 2, after=second.next_key)
+    back = keyset_page(queryset, 2, before=last.previous_key)
+
+    assert [item["id"] for item in first.items] == ids[:2]
+    assert first.previous_key is None
+    assert [item["id"] for item in second.items] == ids[2:4]
+    assert [item["id"] for item in last.items] == ids[4:]
+    assert last.next_key is None
+    assert back == second
+
+
+def test_listing_annotates_sale_state(promotion):
+    items = list(promotion.promotion_products.listing().order_by("id"))
+
+    assert [item["available_for_sale"] for item in items] == [999, 3, 999, 5, 1]
+    assert {item["price_with_discount"] for item in items} == {Decimal("90.00")}
+
+
+def test_promotion_page_is_cached(client, promotion):
+    cache.clear()
+    url = reverse("shop:promotion_detail", args=[promotion.pk])
+
+    response = client.get(url)
+    with CaptureQueriesContext(connection) as queries:
+        cached = client.get(url)
+
+    items = response.context["products"].items
+    assert items[0]["title"] in cached.content.decode()
+    assert not any("price_with_discount" in q["sql"] for q in queries)
+
+
+def test_promotion_pages_accept_only_served_keys(client, promotion, monkeypatch):
+    monkeypatch.setattr(PromotionDetailView, "products_per_page", 2)
+    cache.clear()
+    line = promotion.promotion_products.order_by("id").first()
+    ImageProduct.objects.create(product=line.product, src="a.jpg", alt="Фото")
+    url = reverse("shop:promotion_detail", args=[promotion.pk])
+
+    first = client.get(url).context["products"]
+    second = client.get(url, {"after": first.next_cursor}).context["products"]
+    forged = client.get(url, {"after": str(first.next_key)})
+
+    assert first.items[0]["image_alt"] == "Фото"
+    assert second.items[0]["id"] > first.items[-1]["id"]
+    assert forged.status_code == HTTPStatus.NOT_FOUND
@@ -0,0 +1,99 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+
+from shop.models import Product
+from shop.models import PromotionProduct
+from shop.pricing import PricingEngine
+from shop.tests.factories import ProductFactory
+from shop.tests.factories import PromotionFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def add(promotion, product, **kwargs):
+    return PromotionProduct.objects.create(
+        promotion=promotion, product=product, **kwargs
+    )
+
+
+def test_best_exclusive_rule_wins():
+    product = ProductFactory(price=Decimal("200.00"))
+    add(PromotionFactory(discount_percent=10), product)
+    best = add(PromotionFactory(fixed_price=Decimal("150.00")), product)
+
+    quote = PricingEngine().quote(product)
+
+    assert quote.price == Decimal("150.00")
+    assert quote.promotion_product_id == best.id
+
+
+def test_stackable_rules_apply_on_top():
+    product = ProductFactory(price=Decimal("200.00"))
+    override = add(
+        PromotionFactory(discount_percent=5), product, price_override=Decimal("180")
+    )
+    stackable = add(PromotionFactory(discount_percent=10, is_stackable=True), product)
+
+    quote = PricingEngine().quote(product)
+
+    assert quote.price == Decimal("162.00")
+    assert quote.promotion_product_ids == (override.id, stackable.id)
+
+
+def test_inactive_and_exhausted_rules_are_skipped():
+    product = ProductFactory(price=Decimal("100.00"))
+    add(PromotionFactory(discount_percent=50, is_active=False), product)
+    add(
+        PromotionFactory(
+            discount_percent=40, end_date=timezone.now() - timedelta(hours=1)
+        ),
+        product,
+    )
+    add(PromotionFactory(discount_percent=30), product, limit=2, quantity_sold=2)
+
+    assert PricingEngine().quote(product).price == Decimal("100.00")
+
+
+def test_quote_many_uses_single_query(django_assert_num_queries):
+    promotion = PromotionFactory(discount_percent=25)
+    products = ProductFactory.create_batch(50, price=Decimal("10.00"))
+    for product in products[::2]:
+        add(promotion, product)
+
+    with django_assert_num_queries(1):
+        quotes = PricingEngine().quote_many(products)
+
+    assert quotes[products[0].pk].price == Decimal("7.50")
+    assert quotes[products[1].pk].price == Decimal("10.00")
+
+
+def test_prefetched_rules_match_loaded_rules(django_assert_num_queries):
+    product = ProductFactory(price=Decimal("99.99"))
+    add(PromotionFactory(discount_percent=15), product)
+    add(PromotionFactory(discount_percent=3, is_stackable=True), product)
+    prefetched = list(Product.objects.prefetch_related("promotion_products__promotion"))
+
+    engine = PricingEngine()
+    expected = engine.quote(product)
+    with django_assert_num_queries(0):
+        assert engine.quote_many(prefetched)[product.pk] == expected
+
+
+def test_price_with_discount_is_refreshed():
+    product = ProductFactory(price=Decimal("100.00"))
+    promotion = PromotionFactory(discount_percent=10)
+    line = add(promotion, product)
+    assert line.price_with_discount == Decimal("90.00")
+
+    product.price = Decimal("50.00")
+    product.save()
+    line.refresh_from_db()
+    assert line.price_with_discount == Decimal("45.00")
+
+    promotion.fixed_price = Decimal("30.00")
+    promotion.save()
+    line.refresh_from_db()
+    assert line.price_with_discount == Decimal("30.00")
@@ -0,0 +1,98 @@
+import json
+import threading
+import time
+from http import HTTPStatus
+
+import pytest
+from django.core.exceptions import PermissionDenied
+from django.test import Client
+from django.urls import resolve
+from django.urls import reverse
+
+from shop.profiling import HEADER
+from shop.profiling import Sampler
+from shop.profiling import check_token
+from shop.profiling import make_token
+from shop.profiling import start_worker_profiling
+from shop.profiling import worker_profiling
+
+
+@pytest.fixture
+def profiling(settings, tmp_path):
+    settings.PROFILING_ENABLED = True
+    settings.PROFILING_DIR = str(tmp_path)
+    settings.PROFILING_INTERVAL = 0.001
+    return tmp_path
+
+
+def busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampler_writes_collapsed_stacks(profiling):
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,))
+    worker.start()
+    sampler = Sampler("test", thread_ids={worker.ident})
+    sampler.start()
+    time.sleep(0.05)
+    path = sampler.stop()
+    stop.set()
+    worker.join()
+
+    lines = path.read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert "busy_loop (shop/tests/test_profiling.py:" in stack
+    assert int(count) > 0
+
+
+@pytest.mark.django_db
+def test_request_with_signed_header_is_profiled(profiling):
+    client = Client()
+
+    plain = client.get(reverse("shop:start_page"))
+    profiled = client.get(reverse("shop:start_page"), headers={HEADER: make_token(1)})
+    forged = client.get(reverse("shop:start_page"), headers={HEADER: "1"})
+
+    assert HEADER not in plain
+    assert HEADER not in forged
+    assert list(profiling.iterdir()) == [profiling / profiled[HEADER]]
+    assert "ProfilingMiddleware.__call__" in profiled_stacks(profiling)
+
+
+def profiled_stacks(directory) -> str:
+    return "".join(path.read_text() for path in directory.iterdir())
+
+
+@pytest.mark.django_db
+def test_worker_profiling_runs_for_given_time(profiling, settings):
+    settings.PROFILING_POLL_INTERVAL = 0
+    start_worker_profiling(1)
+
+    worker_profiling.poll("test")
+    sampler = worker_profiling.sampler
+    assert sampler is not None
+    assert sampler.is_alive()
+    sampler.join(timeout=5)
+
+    assert not sampler.is_alive()
+    assert sampler.path is not None
+    assert sampler.path.parent == profiling
+
+
+@pytest.mark.django_db
+def test_profiling_view_is_staff_only(profiling, rf, user):
+    url = reverse("shop:profiling")
+    view = resolve(url).func
+    request = rf.get(url)
+    request.user = user
+
+    with pytest.raises(PermissionDenied):
+        view(request)
+
+    user.is_staff = True
+    response = view(request)
+    assert response.status_code == HTTPStatus.OK
+    assert check_token(json.loads(response.content)["token"])
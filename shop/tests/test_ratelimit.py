@@ -0,0 +1,64 @@
+from http import HTTPStatus
+
+import pytest
+from django.test import Client
+from django.urls import reverse
+
+from shop import ratelimit
+from shop.ratelimit import LocalTokenBuckets
+from shop.ratelimit import local_buckets
+from shop.tests.factories import ProductFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def _clear_buckets():
+    local_buckets.clear()
+    yield
+    local_buckets.clear()
+
+
+def test_basket_mutations_are_limited(client, user, settings):
+    settings.RATE_LIMITS = {"shop:add_to_basket": (2, 60)}
+    client.force_login(user)
+    url = reverse("shop:add_to_basket", args=[ProductFactory().pk])
+
+    statuses = [client.post(url).status_code for _ in range(3)]
+    response = client.post(url)
+
+    assert statuses == [HTTPStatus.OK, HTTPStatus.OK, HTTPStatus.TOO_MANY_REQUESTS]
+    assert response["Retry-After"] == "30"
+    # Другие маршруты и пользователи не затронуты
+    assert client.get(reverse("shop:basket")).status_code == HTTPStatus.OK
+    client.logout()
+    assert client.post(url).status_code == HTTPStatus.OK
+
+
+def test_anonymous_clients_are_told_apart_behind_proxy(settings):
+    settings.RATE_LIMITS = {"shop:add_to_basket": (1, 60)}
+    settings.RATE_LIMIT_PROXY_HOPS = 1
+    url = reverse("shop:add_to_basket", args=[ProductFactory().pk])
+
+    def post(forwarded_for):
+        # Новый клиент без сессии, как первый визит
+        return Client().post(
+            url, REMOTE_ADDR="10.0.0.2", HTTP_X_FORWARDED_FOR=forwarded_for
+        )
+
+    assert post("203.0.113.1").status_code == HTTPStatus.OK
+    assert post("203.0.113.1").status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert post("203.0.113.2").status_code == HTTPStatus.OK
+    # Подделанный клиентом адрес левее добавленного прокси не учитывается
+    assert post("203.0.113.2, 203.0.113.1").status_code == HTTPStatus.TOO_MANY_REQUESTS
+
+
+def test_bucket_refills(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now)
+    buckets = LocalTokenBuckets()
+
+    assert buckets.hit("key", 1, 0.5) == 0
+    assert buckets.hit("key", 1, 0.5) == 2  # noqa: PLR2004
+    now += 2
+    assert buckets.hit("key", 1, 0.5) == 0
@@ -0,0 +1,35 @@
+import io
+import json
+from datetime import UTC
+from datetime import datetime
+from decimal import Decimal
+
+from djangorestframework_camel_case.parser import CamelCaseJSONParser
+from djangorestframework_camel_case.render import CamelCaseJSONRenderer
+
+from shop.renderers import CamelCaseORJSONParser
+from shop.renderers import CamelCaseORJSONRenderer
+
+
+def test_orjson_renderer_matches_json_renderer():
+    data = {
+        "price_with_promotions": Decimal("10.50"),
+        "start_date": datetime(2025, 1, 1, 12, tzinfo=UTC),
+        "items": [{"short_description": "строка "}],
+        1: None,
+    }
+
+    expected = CamelCaseJSONRenderer().render(data)
+    content = CamelCaseORJSONRenderer().render(data)
+
+    assert json.loads(content) == json.loads(expected)
+    assert b"\\u2028" in content
+
+
+def test_orjson_parser_underscoreizes_keys():
+    body = b'{"productId": 1, "items": [{"countValue": 2}]}'
+
+    data = CamelCaseORJSONParser().parse(io.BytesIO(body))
+
+    assert data == CamelCaseJSONParser().parse(io.BytesIO(body))
+    assert data == {"product_id": 1, "items": [{"count_value": 2}]}
@@ -0,0 +1,86 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from shop import serializers
+from shop.models import OrderItem
+from shop.models import Product
+from shop.models import Promotion
+from shop.models import PromotionProduct
+from shop.serializers import OrderItemSerializer
+from shop.serializers import ProductListSerializer
+from shop.serializers import ProductSerializer
+from shop.tests.factories import ProductFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def products():
+    now = timezone.now()
+    promotion = Promotion.objects.create(
+        title="Акция",
+        discount_percent=15,
+        start_date=now - timedelta(days=1),
+        end_date=now + timedelta(days=1),
+    )
+    product = ProductFactory(price=Decimal("99.99"))
+    ProductFactory()
+    PromotionProduct.objects.create(promotion=promotion, product=product, limit=3)
+    return Product.objects.prefetch_related(
+        "images", "tags", "promotions", "promotion_products__promotion"
+    )
+
+
+def test_fast_serializer_matches_model_serializer(products):
+    full = ProductSerializer(products, many=True).data
+    fast = ProductListSerializer(products, many=True).data
+
+    assert [dict(item) for item in full] == fast
+    assert fast[0]["price_with_promotions"] == "84.99"
+
+
+@pytest.mark.parametrize("serializer_class", [ProductSerializer, ProductListSerializer])
+def test_sparse_fieldsets(products, serializer_class):
+    request = APIRequestFactory().get(
+        "/", {"fields": "id,priceWithPromotions", "expand": "tags"}
+    )
+    request.query_params = request.GET
+
+    data = serializer_class(products, many=True, context={"request": request}).data
+
+    assert set(data[0]) == {"id", "price_with_promotions", "tags"}
+
+
+def fields_request(fields: str):
+    request = APIRequestFactory().get("/", {"fields": fields})
+    request.query_params = request.GET
+    return request
+
+
+def test_sparse_fieldsets_skip_nested_serializers(products):
+    items = [
+        OrderItem(product=product, count=1, price=Decimal(1)) for product in products
+    ]
+
+    data = OrderItemSerializer(
+        items, many=True, context={"request": fields_request("id,count")}
+    ).data
+
+    assert set(data[0]["product"]) == set(ProductSerializer.Meta.fields)
+
+
+def test_fast_serializer_skips_unrequested_price(products, monkeypatch):
+    def evaluate(*args):
+        raise AssertionError
+
+    monkeypatch.setattr(serializers, "evaluate", evaluate)
+
+    data = ProductListSerializer(
+        products, many=True, context={"request": fields_request("id,title")}
+    ).data
+
+    assert set(data[0]) == {"id", "title"}
@@ -0,0 +1,101 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.sessions import CREATE_ATTEMPTS
+from shop.sessions import SessionSerializer
+from shop.sessions import SessionStore
+from shop.tasks import clear_expired_sessions
+from shop.tests.factories import ProductFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+
+
+def session_queries(queries):
+    return [query["sql"] for query in queries if "django_session" in query["sql"]]
+
+
+def test_serializer_packs_basket():
+    session = {
+        "basket": {"7": {"count": 2, "price": "9.99"}},
+        "basket_totals": {"count": 2, "total": "19.98", "version": "v"},
+    }
+    data = SessionSerializer().dumps(session)
+
+    assert b'"basket":[[7,2,"9.99"]]' in data
+    assert SessionSerializer().loads(data) == session
+
+
+def test_anonymous_session_stays_in_cache(client):
+    url = reverse("shop:add_to_basket", args=[ProductFactory().pk])
+
+    with CaptureQueriesContext(connection) as queries:
+        client.post(url)
+        client.post(url)
+
+    assert session_queries(queries) == []
+    assert not Session.objects.exists()
+    assert client.get(reverse("shop:basket")).context["basket"]["basket_count"] == 2  # noqa: PLR2004
+
+
+def test_user_session_is_written_through_on_login_only(client, user):
+    client.force_login(user)
+    session_key = client.session.session_key
+    url = reverse("shop:add_to_basket", args=[ProductFactory(price=Decimal(5)).pk])
+
+    with CaptureQueriesContext(connection) as queries:
+        client.post(url)
+
+    assert session_queries(queries) == []
+    assert Session.objects.filter(session_key=session_key).exists()
+
+    # После потери кэша пользователь остается авторизованным
+    cache.clear()
+    response = client.get(reverse("shop:basket"))
+
+    assert response.context["user"] == user
+
+
+def test_user_session_copy_is_refreshed(user):
+    session = SessionStore()
+    session["_auth_user_id"] = str(user.pk)
+    session.save()
+    written = Session.objects.get().expire_date
+    session["_persisted"][2] -= session.get_expiry_age()
+    session["basket"] = {}
+    session.save()
+
+    assert Session.objects.get().expire_date > written
+
+
+def test_clear_expired_sessions(user):
+    session = SessionStore()
+    session["_auth_user_id"] = str(user.pk)
+    session.save()
+    Session.objects.update(expire_date=timezone.now() - timedelta(seconds=1))
+
+    assert clear_expired_sessions() == 1
+    assert not Session.objects.exists()
+
+
+def test_create_gives_up_when_cache_is_unavailable(monkeypatch):
+    session = SessionStore()
+    attempts = []
+    # Так ведет себя django-redis с IGNORE_EXCEPTIONS при недоступном Redis
+    monkeypatch.setattr(session._cache, "add", lambda *args: attempts.append(args))  # noqa: SLF001
+
+    with pytest.raises(RuntimeError):
+        session.create()
+    assert len(attempts) == CREATE_ATTEMPTS
@@ -0,0 +1,75 @@
+import pytest
+
+from shop.models import Order
+from shop.models import OrderItem
+from shop.models import OrderStatus
+from shop.models import PromotionProduct
+from shop.tasks import process_order
+from shop.tests.factories import ProductFactory
+from shop.tests.factories import PromotionFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def _eager_celery(settings):
+    settings.CELERY_TASK_ALWAYS_EAGER = True
+
+
+@pytest.fixture
+def products():
+    return [ProductFactory(count=2), ProductFactory(count=10)]
+
+
+@pytest.fixture
+def line(products):
+    return PromotionFactory(discount_percent=10).promotion_products.create(
+        product=products[0]
+    )
+
+
+def make_orders(user, products, line, number):
+    orders = []
+    for _ in range(number):
+        order = Order.objects.create(user=user)
+        OrderItem.objects.create(
+            order=order, product=products[0], count=1, price=90, promotion_product=line
+        )
+        OrderItem.objects.create(order=order, product=products[1], count=3)
+        orders.append(order)
+    return orders
+
+
+def test_cancel_restocks_processed_orders(
+    user, products, line, django_assert_num_queries
+):
+    orders = make_orders(user, products, line, 2)
+    for order in orders:
+        process_order(order.id)
+    products[0].refresh_from_db()
+    assert (products[0].count, products[0].available) == (0, False)
+
+    # Позиции агрегируются, по одному UPDATE на таблицу
+    with django_assert_num_queries(9):
+        cancelled = Order.objects.filter(pk__in=[o.pk for o in orders]).cancel()
+
+    assert cancelled == len(orders)
+    for product, count in zip(products, (2, 10), strict=True):
+        product.refresh_from_db()
+        assert (product.count, product.quantity_sold, product.available) == (
+            count,
+            0,
+            True,
+        )
+    assert PromotionProduct.objects.get().quantity_sold == 0
+
+
+def test_cancel_before_processing(user, products, line):
+    order = make_orders(user, products, line, 1)[0]
+
+    order.mark_cancelled()
+
+    assert process_order(order.id) is False
+    products[0].refresh_from_db()
+    assert (products[0].count, products[0].quantity_sold) == (2, 0)
+    assert Order.objects.get().status == OrderStatus.CANCELLED
@@ -0,0 +1,122 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.contrib.sessions.backends.cache import SessionStore
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.basket import SessionBasket
+from shop.models import Order
+from shop.models import OrderItem
+from shop.models import OrderStatus
+from shop.models import PromotionProduct
+from shop.tasks import cancel_expired_orders
+from shop.tasks import process_order
+from shop.tasks import send_order_confirmation
+from shop.tests.factories import ProductFactory
+from shop.tests.factories import PromotionFactory
+from shop.views import CreateOrderView
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def _eager_celery(settings):
+    settings.CELERY_TASK_ALWAYS_EAGER = True
+
+
+@pytest.fixture
+def order(user):
+    order = Order.objects.create(user=user)
+    product = ProductFactory(count=3)
+    line = PromotionFactory(discount_percent=10).promotion_products.create(
+        product=product
+    )
+    OrderItem.objects.create(
+        order=order, product=product, count=2, price=90, promotion_product=line
+    )
+    OrderItem.objects.create(order=order, product=ProductFactory(count=1), count=5)
+    return order
+
+
+def test_process_order_is_idempotent(order):
+    assert process_order(order.id) is True
+    assert process_order(order.id) is False
+
+    first, second = order.items.select_related("product", "promotion_product")
+    first.product.refresh_from_db()
+    second.product.refresh_from_db()
+    assert (first.product.count, first.product.quantity_sold) == (1, 2)
+    assert first.product.available
+    assert PromotionProduct.objects.get().quantity_sold == 2  # noqa: PLR2004
+    # Остаток не уходит в минус, товар снимается с продажи
+    assert (second.product.count, second.product.available) == (0, False)
+    order.refresh_from_db()
+    assert order.processed_at is not None
+
+
+def test_confirmation_is_sent_once(order, mailoutbox):
+    send_order_confirmation(order.id)
+    send_order_confirmation(order.id)
+
+    assert len(mailoutbox) == 1
+    assert f"Заказ #{order.id}" in mailoutbox[0].subject
+
+
+def test_create_order_dispatches_processing_after_commit(
+    rf, user, mailoutbox, django_capture_on_commit_callbacks
+):
+    product = ProductFactory(price=Decimal("50.00"), count=4)
+    request = rf.post(reverse("shop:create_order"))
+    request.user = user
+    request.session = SessionStore()
+    SessionBasket(request).add(product, count=3)
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        response = CreateOrderView.as_view()(request)
+
+    order = Order.objects.get(user=user)
+    assert response.status_code == 200  # noqa: PLR2004
+    assert callbacks
+    assert order.processed_at is not None
+    assert order.items.get().price == Decimal("50.00")
+    product.refresh_from_db()
+    assert product.count == 1
+    assert len(mailoutbox) == 1
+
+
+def test_cancel_expired_orders(order, user, settings):
+    settings.ORDER_SWEEP_BATCH_SIZE = 1
+    settings.ORDER_SWEEP_MAX_BATCHES = 2
+    process_order(order.id)
+    expired = [order, Order.objects.create(user=user), Order.objects.create(user=user)]
+    Order.objects.filter(pk__in=[o.pk for o in expired]).update(
+        created_at=timezone.now() - timedelta(seconds=settings.ORDER_PAYMENT_TTL + 1)
+    )
+    fresh = Order.objects.create(user=user)
+
+    # За один запуск отменяется не больше ORDER_SWEEP_MAX_BATCHES пачек
+    assert cancel_expired_orders() == 2  # noqa: PLR2004
+    assert cancel_expired_orders() == 1
+
+    assert set(
+        Order.objects.filter(status=OrderStatus.CANCELLED).values_list("pk", flat=True)
+    ) == {o.pk for o in expired}
+    fresh.refresh_from_db()
+    assert fresh.status == OrderStatus.CREATED
+    product = order.items.order_by("id").first().product
+    product.refresh_from_db()
+    assert (product.count, product.quantity_sold) == (3, 0)
+
+
+def test_cancel_returns_only_taken_stock(order):
+    process_order(order.id)
+
+    Order.objects.filter(pk=order.pk).cancel()
+
+    short = order.items.get(count=5)
+    short.product.refresh_from_db()
+    # Со склада ушла 1 единица из 5 заказанных, столько же и вернулось
+    assert (short.stock_taken, short.product.count) == (1, 1)
+    assert short.product.quantity_sold == 0
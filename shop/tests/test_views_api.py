@@ -0,0 +1,62 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from shop.tests.factories import ProductFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def api_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.mark.parametrize(
+    "url_name", ["shop:api_catalog", "shop:api_categories", "shop:api_promotions"]
+)
+def test_conditional_get_returns_not_modified(api_client, url_name):
+    url = reverse(url_name)
+    response = api_client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    assert response["ETag"]
+    assert response["Last-Modified"]
+
+    with CaptureQueriesContext(connection) as context:
+        cached = api_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+    assert not [q for q in context.captured_queries if "SELECT" in q["sql"]]
+    assert cached.status_code == HTTPStatus.NOT_MODIFIED
+    assert cached["ETag"] == response["ETag"]
+
+
+def test_etag_changes_after_product_update(
+    api_client, django_capture_on_commit_callbacks
+):
+    url = reverse("shop:api_catalog")
+    etag = api_client.get(url)["ETag"]
+    assert api_client.get(url, {"limit": 1})["ETag"] != etag
+
+    with django_capture_on_commit_callbacks(execute=True):
+        ProductFactory()
+
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert response["ETag"] != etag
+
+
+def test_large_api_response_is_compressed(api_client, settings):
+    settings.COMPRESSION_MIN_SIZE = 0
+    ProductFactory.create_batch(5)
+    url = reverse("shop:api_catalog")
+
+    response = api_client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate, br")
+
+    assert response["Content-Encoding"] == "br"
+    assert response["ETag"].startswith("W/")
+    assert "Accept-Encoding" in response["Vary"]
@@ -0,0 +1,76 @@
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from shop.tests.factories import ProductFactory
+from shop.warming import top_urls
+from shop.warming import warm
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+
+
+def test_top_urls_from_access_log():
+    line = '127.0.0.1 - - [19/Oct/2026:10:00:00 +0000] "{} HTTP/1.1" {} 512 "-"'
+    lines = [
+        *[line.format("GET /shop/api/catalog/?category=2", 200)] * 3,
+        *[line.format("GET /shop/categories/", 304)] * 2,
+        line.format("GET /shop/api/catalog/?page=2", 200),
+        *[line.format("GET /shop/basket/", 200)] * 5,
+        *[line.format("POST /shop/api/catalog/", 200)] * 5,
+        *[line.format("GET /shop/api/catalog/?category=9", 404)] * 5,
+    ]
+
+    assert top_urls(lines, 2) == ["/shop/api/catalog/?category=2", "/shop/categories/"]
+
+
+def test_warm_fills_response_and_fragment_caches(client, user):
+    product = ProductFactory()
+    api_url = reverse("shop:api_catalog")
+    page_url = reverse("shop:category_list")
+
+    results = warm([api_url, page_url, api_url], workers=1, host="testserver")
+
+    assert [(result.url, result.status) for result in results] == [
+        (api_url, HTTPStatus.OK),
+        (page_url, HTTPStatus.OK),
+    ]
+    api_client = APIClient()
+    api_client.force_authenticate(user)
+    with CaptureQueriesContext(connection) as queries:
+        api = api_client.get(api_url)
+        page = client.get(page_url)
+    assert api.json()["items"][0]["title"] == product.title
+    assert product.category.title in page.content.decode()
+    # Счетчики товаров и подкатегорий берутся из фрагмента
+    assert not [q for q in queries if "shop_product" in q["sql"]]
+
+
+def test_warm_caches_command(tmp_path):
+    urls = tmp_path / "urls.txt"
+    urls.write_text(f"# каталог\n{reverse('shop:api_categories')}\n\n/shop/missing/\n")
+    stdout = StringIO()
+
+    call_command(
+        "warm_caches",
+        "--urls",
+        urls,
+        "--workers",
+        "1",
+        "--host",
+        "testserver",
+        stdout=stdout,
+    )
+
+    assert "Прогрето адресов: 1 из 2" in stdout.getvalue()
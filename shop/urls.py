@@ -60,6 +60,7 @@ urlpatterns = [
         views.RemoveFromBasketView.as_view(),
         name="remove_from_basket",
     ),
+    path("basket/batch/", views.BasketBatchView.as_view(), name="basket_batch"),
     # ==================== ORDER URLS ====================
     path("orders/", views.OrderListView.as_view(), name="order_list"),
     path("orders/<int:pk>/", views.OrderDetailView.as_view(), name="order_detail"),
@@ -125,6 +126,9 @@ urlpatterns = [
         views.ImageProductDeleteView.as_view(),
         name="image_product_delete",
     ),
+    # ==================== METRICS ====================
+    path("metrics/", views.MetricsView.as_view(), name="metrics"),
+    path("profiling/", views.ProfilingView.as_view(), name="profiling"),
 ]
 
 
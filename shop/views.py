@@ -1,11 +1,18 @@
+import json
 from decimal import Decimal
 
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import UserPassesTestMixin
 from django.contrib.messages.views import SuccessMessageMixin
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
+from django.db.models import Count
 from django.db.models import Q
+from django.http import Http404
+from django.http import HttpResponse
 from django.http import JsonResponse
-from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
 from django.utils.decorators import method_decorator
 from django.views.decorators.http import require_POST
@@ -17,7 +24,14 @@ from django.views.generic import TemplateView
 from django.views.generic import UpdateView
 from django.views.generic import View
 
+from shop.basket import BasketError
 from shop.basket import SessionBasket
+from shop.basket import get_offer
+from shop.basket import parse_operations
+from shop.cache import get_resource_state
+from shop.db import ReadOnlyMixin
+from shop.db import ReplicaReadMixin
+from shop.db import pin_if_modified_since
 from shop.forms import CategoryForm
 from shop.forms import ImageCategoryForm
 from shop.forms import ImageProductForm
@@ -25,6 +39,11 @@ from shop.forms import ProductForm
 from shop.forms import ProductSearchForm
 from shop.forms import PromotionForm
 from shop.forms import TagForm
+from shop.idempotency import IdempotentViewMixin
+from shop.instrumentation import export_pools
+from shop.instrumentation import is_trusted
+from shop.instrumentation import record_cache
+from shop.instrumentation import registry
 from shop.models import Category
 from shop.models import ImageCategory
 from shop.models import ImageProduct
@@ -33,19 +52,50 @@ from shop.models import OrderItem
 from shop.models import Product
 from shop.models import Promotion
 from shop.models import Tag
+from shop.pagination import KeysetPage
+from shop.pagination import keyset_page
+from shop.pagination import parse_key
+from shop.pricing import PricingEngine
+from shop.profiling import HEADER as PROFILING_HEADER
+from shop.profiling import make_token
+from shop.profiling import recent_profiles
+from shop.profiling import start_worker_profiling
+from shop.tasks import dispatch_order_processing
 
+PROMOTION_PAGE_KEY = "shop:promotion:{}:products:{}:{}:{}"
 
-class StartPageView(TemplateView):
+
+class StartPageView(ReadOnlyMixin, TemplateView):
     template_name = "shop/start_page.html"
 
 
-class CategoryListView(ListView):
+class FragmentCacheMixin:
+    """
+    Передает в шаблон токен версий ресурсов и время хранения для тега
+    {% cache %}: фрагменты, построенные по токену, устаревают при любом
+    изменении ресурсов, и их не нужно удалять явно.
+    """
+
+    fragment_resources: tuple[str, ...] = ()
+
+    def get_context_data(self, **kwargs):
+        # До запросов страницы: фрагмент не должен строиться по отстающей реплике
+        token, last_modified = get_resource_state(*self.fragment_resources)
+        pin_if_modified_since(last_modified)
+        context = super().get_context_data(**kwargs)
+        context["cache_token"] = token
+        context["cache_timeout"] = settings.CATALOG_CACHE_TIMEOUT
+        return context
+
+
+class CategoryListView(ReplicaReadMixin, FragmentCacheMixin, ListView):
     """Список всех категорий с древовидной структурой"""
 
     model = Category
     template_name = "shop/category_list.html"
     context_object_name = "categories"
     paginate_by = 20
+    fragment_resources = ("categories", "products")
 
     def get_queryset(self):
         return Category.objects.filter(parent=None).prefetch_related(
@@ -58,12 +108,13 @@ class CategoryListView(ListView):
         return context
 
 
-class CategoryDetailView(DetailView):
+class CategoryDetailView(ReplicaReadMixin, FragmentCacheMixin, DetailView):
     """Детальная информация о категории с товарами"""
 
     model = Category
     template_name = "shop/category_detail.html"
     context_object_name = "category"
+    fragment_resources = ("categories", "products")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -130,7 +181,7 @@ class CategoryDeleteView(LoginRequiredMixin, SuccessMessageMixin, DeleteView):
         return context
 
 
-class ProductListView(ListView):
+class ProductListView(ReplicaReadMixin, ListView):
     """Список всех товаров с фильтрацией и поиском"""
 
     model = Product
@@ -184,7 +235,7 @@ class ProductListView(ListView):
         return context
 
 
-class ProductDetailView(DetailView):
+class ProductDetailView(ReplicaReadMixin, DetailView):
     """Детальная информация о товаре"""
 
     model = Product
@@ -250,7 +301,7 @@ class ProductDeleteView(LoginRequiredMixin, SuccessMessageMixin, DeleteView):
         return context
 
 
-class BasketView(TemplateView):
+class BasketView(ReadOnlyMixin, TemplateView):
     """Корзина пользователя"""
 
     template_name = "shop/basket.html"
@@ -258,25 +309,11 @@ class BasketView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         basket = SessionBasket(self.request)
-
-        # Превращаем корзину в список элементов для шаблона
-        basket_items = []
-        for item in basket:
-            product = item["product"]
-            basket_items.append(
-                {
-                    "pk": product.pk,
-                    "product": product,
-                    "count": item["count"],
-                    "price": product.price,
-                    "total_price": product.price * item["count"],
-                }
-            )
-
-        context["basket_items"] = basket_items
+        # Цены строк совпадают с ценами при оформлении заказа
+        context["basket_items"] = basket.get_lines()
         context["basket"] = {
-            "total_cost": sum(item["total_price"] for item in basket_items),
-            "basket_count": sum(item["count"] for item in basket_items),
+            "total_cost": basket.get_total_price(),
+            "basket_count": len(basket),
         }
         context["title"] = "Корзина"
         return context
@@ -287,24 +324,23 @@ class AddToBasketView(View):
     """Добавление товара в корзину"""
 
     def post(self, request, product_id):
-        basket = SessionBasket(request)
-        product = get_object_or_404(Product, id=product_id)
+        offer = get_offer(product_id)
+        if offer is None:
+            raise Http404
 
-        if not product.available:
+        if not offer.available:
             return JsonResponse({"success": False, "message": "Товар недоступен"})
 
-        basket.add(product)
-
-        total_cost = sum(
-            Decimal(item["price"]) * item["count"] for item in basket.basket.values()
-        )
+        basket = SessionBasket(request)
+        item = basket.basket.get(str(product_id))
+        basket.set_count(product_id, (item["count"] if item else 0) + 1, offer.price)
 
         return JsonResponse(
             {
                 "success": True,
-                "message": f'Товар "{product.title}" добавлен в корзину',
+                "message": f'Товар "{offer.title}" добавлен в корзину',
                 "basket_count": len(basket),
-                "total_cost": str(total_cost),
+                "total_cost": str(basket.get_total_price()),
             }
         )
 
@@ -314,7 +350,6 @@ class UpdateBasketItemView(View):
     """Обновление количества товара в сессионной корзине"""
 
     def post(self, request, item_id):
-        basket = SessionBasket(request)
         try:
             count = int(request.POST.get("count", 1))
         except ValueError:
@@ -322,29 +357,28 @@ class UpdateBasketItemView(View):
                 {"success": False, "message": "Некорректное количество"}
             )
 
+        basket = SessionBasket(request)
         if count <= 0:
-            basket.remove(item_id, basket.basket.get(str(item_id), {}).get("count", 0))
+            item = basket.set_count(item_id, 0)
         else:
-            product = get_object_or_404(Product, pk=item_id)
-            basket.add(product, count=count, update_count=True)
-
-        product = get_object_or_404(Product, pk=item_id)
-        basket.add(product, count=count, update_count=True)
-
-        item = basket.basket[str(item_id)]
-        total_price = str(Decimal(item["price"]) * item["count"])
-
-        total_cost = sum(
-            Decimal(item["price"]) * item["count"] for item in basket.basket.values()
-        )
-
+            offer = get_offer(item_id)
+            if offer is None:
+                raise Http404
+            if not offer.available:
+                return JsonResponse({"success": False, "message": "Товар недоступен"})
+            item = basket.set_count(item_id, count, offer.price)
+
+        total_price = Decimal(item["price"]) * item["count"] if item else Decimal(0)
         return JsonResponse(
             {
                 "success": True,
-                "message": "Количество обновлено",
-                "total_price": total_price,
+                "message": "Количество обновлено"
+                if item
+                else "Товар удалён из корзины",
+                "removed": item is None,
+                "total_price": str(total_price),
                 "basket_count": len(basket),
-                "total_cost": str(total_cost),
+                "total_cost": str(basket.get_total_price()),
             }
         )
 
@@ -355,23 +389,62 @@ class RemoveFromBasketView(View):
 
     def post(self, request, item_id):
         basket = SessionBasket(request)
-        basket.remove(item_id, basket.basket.get(str(item_id), {}).get("count", 0))
+        basket.set_count(item_id, 0)
 
-        total_cost = sum(
-            Decimal(item["price"]) * item["count"] for item in basket.basket.values()
+        return JsonResponse(
+            {
+                "success": True,
+                "message": "Товар удалён из корзины",
+                "basket_count": len(basket),
+                "total_cost": str(basket.get_total_price()),
+            }
         )
 
+
+@method_decorator(require_POST, name="dispatch")
+class BasketBatchView(View):
+    """
+    Пакетное изменение сессионной корзины.
+    Тело запроса - JSON {"operations": [{"op": ..., "product_id": ..., "count": ...}]}
+    """
+
+    def post(self, request):
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            return JsonResponse(
+                {"success": False, "message": "Некорректный JSON"}, status=400
+            )
+
+        basket = SessionBasket(request)
+        try:
+            lines = basket.apply(parse_operations(payload.get("operations")))
+        except BasketError as error:
+            return JsonResponse({"success": False, "message": str(error)}, status=400)
+
         return JsonResponse(
             {
                 "success": True,
-                "message": "Товар удалён из корзины",
+                "items": [
+                    {
+                        "product_id": product_id,
+                        "removed": item is None,
+                        "count": item["count"] if item else 0,
+                        "total_price": str(
+                            Decimal(item["price"]) * item["count"] if item else 0
+                        ),
+                    }
+                    for product_id, item in lines.items()
+                ],
                 "basket_count": len(basket),
-                "total_cost": str(total_cost),
+                "total_cost": str(basket.get_total_price()),
             }
         )
 
 
-class OrderListView(LoginRequiredMixin, ListView):
+class OrderListView(ReadOnlyMixin, LoginRequiredMixin, ListView):
     """Список заказов пользователя"""
 
     model = Order
@@ -390,7 +463,7 @@ class OrderListView(LoginRequiredMixin, ListView):
         return context
 
 
-class OrderDetailView(LoginRequiredMixin, DetailView):
+class OrderDetailView(ReadOnlyMixin, LoginRequiredMixin, DetailView):
     """Детальная информация о заказе"""
 
     model = Order
@@ -408,8 +481,11 @@ class OrderDetailView(LoginRequiredMixin, DetailView):
         return context
 
 
-class CreateOrderView(LoginRequiredMixin, View):
-    """Создание заказа из сессионной корзины"""
+class CreateOrderView(LoginRequiredMixin, IdempotentViewMixin, View):
+    """
+    Создание заказа из сессионной корзины.
+    Повторная отправка с тем же Idempotency-Key возвращает уже созданный заказ.
+    """
 
     def post(self, request):
         basket = SessionBasket(request)
@@ -420,15 +496,25 @@ class CreateOrderView(LoginRequiredMixin, View):
         # Создаём заказ
         order = Order.objects.create(user=request.user)
 
-        # Добавляем товары из сессии в заказ
-        for item in basket:
-            product = item["product"]
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                count=item["count"],
-                price=product.price,
+        # Добавляем товары из сессии в заказ по актуальным ценам
+        items = list(basket)
+        quotes = PricingEngine().quote_many(item["product"] for item in items)
+        order_items = []
+        for item in items:
+            quote = quotes[item["product"].pk]
+            order_items.append(
+                OrderItem(
+                    order=order,
+                    product=item["product"],
+                    count=item["count"],
+                    price=quote.price,
+                    promotion_product_id=quote.promotion_product_id,
+                )
             )
+        OrderItem.objects.bulk_create(order_items)
+
+        # Остатки, счетчики и уведомления обрабатываются в фоне после коммита
+        dispatch_order_processing(order.id)
 
         # Очищаем сессионную корзину
         basket.clear()
@@ -438,7 +524,7 @@ class CreateOrderView(LoginRequiredMixin, View):
         )
 
 
-class PromotionListView(ListView):
+class PromotionListView(ReplicaReadMixin, ListView):
     """Список активных акций"""
 
     model = Promotion
@@ -455,18 +541,51 @@ class PromotionListView(ListView):
         return context
 
 
-class PromotionDetailView(DetailView):
-    """Детальная информация об акции"""
+class PromotionDetailView(ReplicaReadMixin, FragmentCacheMixin, DetailView):
+    """
+    Детальная информация об акции. Товаров в акции может быть тысячи,
+    поэтому они выводятся страницами по ключу PromotionProduct, и каждая
+    страница кэшируется до изменения акций или товаров.
+    """
 
     model = Promotion
     template_name = "shop/promotion_detail.html"
     context_object_name = "promotion"
+    fragment_resources = ("promotions", "products")
+    products_per_page = 24
 
     def get_queryset(self):
-        return Promotion.objects.prefetch_related("products__images")
+        return Promotion.objects.annotate(products_count=Count("promotion_products"))
+
+    def get_products_page(self, token: str) -> KeysetPage:
+        # Принимаются только подписанные ключи из ссылок страниц, поэтому
+        # число записей в кэше ограничено числом страниц акции
+        try:
+            after = parse_key(self.request.GET.get("after"))
+            before = parse_key(self.request.GET.get("before"))
+        except ValueError as exc:
+            raise Http404 from exc
+        key = PROMOTION_PAGE_KEY.format(
+            self.object.pk, token, after or "", before or ""
+        )
+        page = cache.get(key)
+        record_cache(hits=page is not None, misses=page is None)
+        if page is None:
+            page = keyset_page(
+                self.object.promotion_products.listing(),
+                self.products_per_page,
+                after,
+                before,
+            )
+            storage = ImageProduct._meta.get_field("src").storage  # noqa: SLF001
+            for item in page.items:
+                item["image"] = storage.url(item["image"]) if item["image"] else None
+            cache.set(key, page, settings.CATALOG_CACHE_TIMEOUT)
+        return page
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context["products"] = self.get_products_page(context["cache_token"])
         context["title"] = self.object.title
         return context
 
@@ -515,7 +634,7 @@ class PromotionDeleteView(LoginRequiredMixin, SuccessMessageMixin, DeleteView):
         return context
 
 
-class TagListView(ListView):
+class TagListView(ReplicaReadMixin, ListView):
     """Список всех тегов"""
 
     model = Tag
@@ -529,7 +648,7 @@ class TagListView(ListView):
         return context
 
 
-class TagDetailView(DetailView):
+class TagDetailView(ReplicaReadMixin, DetailView):
     """Детальная информация о теге с товарами"""
 
     model = Tag
@@ -682,3 +801,48 @@ class ImageProductDeleteView(LoginRequiredMixin, SuccessMessageMixin, DeleteView
         context = super().get_context_data(**kwargs)
         context["title"] = f"Удалить изображение: {self.object.product.title}"
         return context
+
+
+class MetricsView(ReadOnlyMixin, View):
+    """Метрики процесса в формате Prometheus для персонала и по токену"""
+
+    def get(self, request):
+        if not is_trusted(request):
+            raise PermissionDenied
+        return HttpResponse(
+            registry.export() + export_pools(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+
+class ProfilingView(UserPassesTestMixin, View):
+    """
+    Управление профайлером для персонала:
+        GET - токен для заголовка X-Shop-Profile и последние профили;
+        POST seconds=N - профилирование всех воркеров на N секунд.
+    """
+
+    def test_func(self):
+        return settings.PROFILING_ENABLED and self.request.user.is_staff
+
+    def get(self, request):
+        return JsonResponse(
+            {
+                "header": PROFILING_HEADER,
+                "token": make_token(request.user.pk),
+                "profiles": [path.name for path in recent_profiles()],
+            }
+        )
+
+    def post(self, request):
+        try:
+            seconds = int(request.POST.get("seconds", 30))
+        except ValueError:
+            return JsonResponse(
+                {"success": False, "message": "Некорректная длительность"}
+            )
+        seconds = max(1, min(seconds, settings.PROFILING_MAX_SECONDS))
+        start_worker_profiling(seconds)
+        return JsonResponse(
+            {"success": True, "message": f"Профилирование включено на {seconds} с"}
+        )
@@ -1,25 +1,117 @@
+import hashlib
+import time
+from http import HTTPStatus
 from typing import Any
 
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.utils.http import quote_etag
 from rest_framework.generics import ListAPIView
 from rest_framework.request import Request
 from rest_framework.response import Response
 
+from shop.cache import get_resource_state
+from shop.db import ReplicaReadMixin
+from shop.db import pin_if_modified_since
 from shop.filters import ProductFilter
 from shop.filters import PromotionFilter
+from shop.hotqueries import record_query
+from shop.instrumentation import record_cache
 from shop.models import Category
 from shop.models import Product
 from shop.models import Promotion
 from shop.serializers import DefaultPagination
+from shop.serializers import ProductListSerializer
 from shop.serializers import ProductSerializer
 from shop.serializers import PromotionSerializer
 from shop.serializers import RecursiveCategorySerializer
 
+RESPONSE_KEY = "shop:response:{}"
 
-class CategoryApiView(ListAPIView):
+
+class ConditionalGetMixin:
+    """
+    Условные GET-запросы к спискам.
+
+    ETag строится по версиям ресурсов etag_resources из кэша и параметрам
+    запроса, Last-Modified - по времени последнего изменения ресурсов.
+    Совпадение If-None-Match возвращает 304 до выполнения запросов к БД.
+
+    При cache_responses отрендеренные JSON-ответы хранятся в кэше по ETag,
+    поэтому повторный запрос без If-None-Match тоже не обращается к БД.
+    """
+
+    etag_resources: tuple[str, ...] = ()
+    cache_responses = False
+
+    def get_etag(self, request: Request, token: str) -> str:
+        params = sorted(request.query_params.lists())
+        renderer = getattr(request.accepted_renderer, "format", "")
+        key = f"{token}|{renderer}|{params}".encode()
+        return quote_etag(hashlib.blake2b(key, digest_size=16).hexdigest())
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        token, last_modified = get_resource_state(*self.etag_resources)
+        pin_if_modified_since(last_modified)
+        etag = self.get_etag(request, token)
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified)
+        )
+        if response is None:
+            response = self.get_cached_response(request, etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            self.cache_response(request, etag, response)
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        patch_vary_headers(response, ["Accept"])
+        return response
+
+    def get_response_cache_key(self, request: Request, etag: str) -> str | None:
+        # Браузерный API показывает пользователя и CSRF-токен, его не кэшируем
+        if not self.cache_responses or request.accepted_renderer.format != "json":
+            return None
+        # Ссылки пагинации абсолютные, поэтому в ключ входит хост
+        key = f"{request.get_host()}|{request.path}|{etag}".encode()
+        return RESPONSE_KEY.format(hashlib.blake2b(key, digest_size=16).hexdigest())
+
+    def get_cached_response(self, request: Request, etag: str) -> HttpResponse | None:
+        key = self.get_response_cache_key(request, etag)
+        if key is None:
+            return None
+        cached = cache.get(key)
+        record_cache(hits=cached is not None, misses=cached is None)
+        if cached is None:
+            return None
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+
+    def cache_response(self, request: Request, etag: str, response: Response) -> None:
+        key = self.get_response_cache_key(request, etag)
+        if key is None or response.status_code != HTTPStatus.OK:
+            return
+        response.add_post_render_callback(
+            lambda rendered: cache.set(
+                key,
+                (rendered.content, rendered["Content-Type"]),
+                settings.CATALOG_CACHE_TIMEOUT,
+            )
+        )
+
+
+class CategoryApiView(ReplicaReadMixin, ConditionalGetMixin, ListAPIView):
     """Список всех категорий с древовидной структурой"""
 
     queryset = Category.objects.all().prefetch_related("image")
     serializer_class = RecursiveCategorySerializer
+    etag_resources = ("categories",)
+    cache_responses = True
 
     def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         queryset = self.get_queryset()
@@ -32,7 +124,7 @@ class CategoryApiView(ListAPIView):
         return Response(serializer.data)
 
 
-class CatalogAPIView(ListAPIView):
+class CatalogAPIView(ReplicaReadMixin, ConditionalGetMixin, ListAPIView):
     """Каталог товаров доступных в магазине"""
 
     queryset = Product.objects.select_related("category").prefetch_related(
@@ -42,10 +134,31 @@ class CatalogAPIView(ListAPIView):
     pagination_class = DefaultPagination
     serializer_class = ProductSerializer
     ordering_fields = ("price",)
+    etag_resources = ("products", "categories", "promotions")
+    cache_responses = True
+
+    def dispatch(self, request, *args, **kwargs):
+        started = time.perf_counter()
+        response = super().dispatch(request, *args, **kwargs)
+        # 304 и ответы из кэша тоже учитываются: это спрос на комбинацию
+        if response.status_code < HTTPStatus.BAD_REQUEST:
+            record_query(request.GET, time.perf_counter() - started)
+        return response
 
+    def get_serializer_class(self):
+        # Схема OpenAPI строится по ProductSerializer, ответы - быстрым сериализатором
+        if getattr(self, "swagger_fake_view", False):
+            return self.serializer_class
+        return ProductListSerializer
 
-class PromotionAPIView(ListAPIView):
+
+class PromotionAPIView(ReplicaReadMixin, ConditionalGetMixin, ListAPIView):
     queryset = Promotion.objects.active()
     filterset_class = PromotionFilter
     serializer_class = PromotionSerializer
     pagination_class = DefaultPagination
+    etag_resources = ("promotions",)
+
+    def get_queryset(self):
+        # active() сравнивает даты с текущим временем, поэтому вызывается на запрос
+        return Promotion.objects.active()
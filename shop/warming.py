@@ -0,0 +1,127 @@
+"""
+Прогрев кэшей каталога после деплоя и импорта.
+
+Адреса берутся из файла (по одному на строку, # - комментарий) или из
+CACHE_WARMING_URLS со страницами корневых категорий и самыми частыми
+комбинациями фильтров каталога (shop.hotqueries), а также из журналов
+доступа: CACHE_WARMING_TOP самых частых GET-запросов к прогреваемым
+маршрутам. Запросы выполняются обработчиком Django без сети, поэтому
+заполняют те же кэши, что и запросы покупателей: ответы API
+(ConditionalGetMixin) и фрагменты шаблонов категорий.
+
+Страницы прогреваются в варианте для анонимных пользователей. API доступен
+только авторизованным, но его ответы от пользователя не зависят, поэтому
+запросы выполняются от имени несохраненного пользователя: force_authenticate
+DRF не создает ни сессию, ни записи в базе.
+"""
+
+import re
+import time
+from collections import Counter
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.urls import Resolver404
+from django.urls import resolve
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from shop.hotqueries import hot_urls
+from shop.models import Category
+
+WARMABLE_VIEWS = frozenset(
+    {
+        "shop:api_categories",
+        "shop:api_catalog",
+        "shop:category_list",
+        "shop:category_detail",
+    }
+)
+WARMING_USERNAME = "cache-warming"
+# Строка запроса в формате журналов nginx и gunicorn: "GET /path HTTP/1.1" 200
+LOG_REQUEST = re.compile(r'"GET (?P<url>\S+) HTTP/[\d.]+" (?P<status>200|304) ')
+
+
+class WarmResult(NamedTuple):
+    url: str
+    status: int
+    seconds: float
+
+
+def is_warmable(url: str) -> bool:
+    try:
+        match = resolve(urlsplit(url).path)
+    except Resolver404:
+        return False
+    return match.view_name in WARMABLE_VIEWS
+
+
+def read_urls(path: Path) -> list[str]:
+    """Адреса из файла, пустые строки и комментарии пропускаются"""
+    lines = (line.strip() for line in path.read_text().splitlines())
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def default_urls() -> list[str]:
+    return [
+        *settings.CACHE_WARMING_URLS,
+        *(
+            reverse("shop:category_detail", args=[pk])
+            for pk in Category.objects.filter(parent=None).values_list("pk", flat=True)
+        ),
+        *hot_urls(settings.CACHE_WARMING_TOP),
+    ]
+
+
+def top_urls(lines: Iterable[str], limit: int) -> list[str]:
+    """Самые частые успешные GET-запросы к прогреваемым маршрутам"""
+    counts = Counter(
+        match["url"] for line in lines if (match := LOG_REQUEST.search(line))
+    )
+    warmable = (url for url, _ in counts.most_common() if is_warmable(url))
+    return [url for url, _ in zip(warmable, range(limit), strict=False)]
+
+
+def default_host() -> str:
+    """Хост для запросов: ссылки пагинации в ответах API абсолютные"""
+    hosts = [
+        host
+        for host in settings.ALLOWED_HOSTS
+        if host != "*" and not host.startswith(".")
+    ]
+    return hosts[0] if hosts else "localhost"
+
+
+def fetch(url: str, host: str) -> WarmResult:
+    client = APIClient(SERVER_NAME=host, raise_request_exception=False)
+    client.force_authenticate(get_user_model()(username=WARMING_USERNAME))
+    started = time.perf_counter()
+    response = client.get(url, secure=True)
+    return WarmResult(url, response.status_code, time.perf_counter() - started)
+
+
+def fetch_in_thread(url: str, host: str) -> WarmResult:
+    try:
+        return fetch(url, host)
+    finally:
+        # Соединения с базой привязаны к потоку пула
+        connections.close_all()
+
+
+def warm(urls: Iterable[str], *, workers: int = 4, host: str = "") -> list[WarmResult]:
+    """
+    Запрашивает адреса в workers потоков (1 - последовательно в текущем)
+    и возвращает статусы ответов и время каждого запроса.
+    """
+    urls = list(dict.fromkeys(urls))
+    host = host or default_host()
+    if workers <= 1:
+        return [fetch(url, host) for url in urls]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(fetch_in_thread, urls, [host] * len(urls)))